@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks dos modelos, integradores e ajustes.
+
+Mede, para cada modelo de modelos_epidemiologicos.py, o tempo de integração
+com odeint e solve_ivp (RK45, LSODA, Radau) em vários horizontes, e o tempo
+de initial_SIRC, ajustar_modelo e fit_virus nas séries de data/out.dat e
+data/out.belem.dat. Reporta tempo (melhor de 'repeticoes'), vazão
+(execuções/s), nfev e pico de memória (tracemalloc, em execução separada).
+
+Os resultados são gravados em benchmarks/resultados/<commit>.json e podem
+ser comparados com uma execução anterior para detectar regressões.
+
+Uso:
+    python benchmarks/bench_modelos.py                    # roda e grava
+    python benchmarks/bench_modelos.py --rapido           # horizonte único
+    python benchmarks/bench_modelos.py --comparar resultados/abc123.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import numpy as np
+from scipy.integrate import odeint, solve_ivp
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.join(RAIZ, 'model'))
+sys.path.insert(1, os.path.join(RAIZ, 'sandbox'))
+
+import modelos_epidemiologicos as model  # noqa: E402
+
+DIR_RESULTADOS = os.path.join(RAIZ, 'benchmarks', 'resultados')
+SERIES = {'PA': os.path.join(RAIZ, 'data', 'out.dat'),
+          'Belem': os.path.join(RAIZ, 'data', 'out.belem.dat')}
+SOLVERS = ['odeint', 'RK45', 'LSODA', 'Radau']
+HORIZONTES = [100, 365, 730]
+
+N = 1e6
+VALORES = {'N': N, 'beta': 0.5, 'alpha': 0.2, 'gamma': 0.1, 'gamma_I': 0.1,
+           'gamma_A': 0.15, 'rho': 0.3, 'kappa': 0.5, 'delta_I': 0.01}
+# modelo: parâmetros na ordem dos args (os compartimentos são as letras do nome)
+MODELOS = {
+    'SIR': ['N', 'beta', 'gamma'],
+    'SEIR': ['N', 'beta', 'alpha', 'gamma'],
+    'SEIAR': ['N', 'beta', 'alpha', 'gamma_I', 'gamma_A', 'rho', 'kappa'],
+    'SEIARD': ['N', 'beta', 'kappa', 'alpha', 'rho', 'gamma_I', 'gamma_A', 'delta_I'],
+    'SIRC': ['N', 'beta', 'gamma'],
+    'SEIRC': ['N', 'beta', 'alpha', 'gamma'],
+    'SEIARC': ['N', 'beta', 'alpha', 'gamma_I', 'gamma_A', 'rho', 'kappa'],
+    'SEIARDC': ['N', 'beta', 'kappa', 'alpha', 'rho', 'gamma_I', 'gamma_A', 'delta_I'],
+}
+
+
+def condicao_inicial(comps):
+    y0 = np.zeros(len(comps))
+    y0[0] = N - 10
+    y0[comps.index('I')] = 10
+    if comps.endswith('C'):
+        y0[-1] = 10
+    return y0
+
+
+def cronometrar(funcao, repeticoes):
+    """
+    Melhor tempo de 'repeticoes' execuções e o retorno da última.
+    """
+    melhor = np.inf
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        saida = funcao()
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor, saida
+
+
+def pico_memoria(funcao):
+    tracemalloc.start()
+    funcao()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pico
+
+
+def _registro(nome, tempo, nfev, pico, **extra):
+    return dict(nome=nome, tempo_s=tempo, vazao_por_s=1.0 / tempo if tempo > 0 else None,
+                nfev=nfev, pico_memoria_bytes=pico, **extra)
+
+
+def bench_modelos(horizontes, repeticoes):
+    registros = []
+    for nome, pnomes in MODELOS.items():
+        f = getattr(model, nome)
+        args = tuple(VALORES[p] for p in pnomes)
+        y0 = condicao_inicial(nome)
+        for dias in horizontes:
+            t = np.linspace(0, dias, dias + 1)
+            for solver in SOLVERS:
+                if solver == 'odeint':
+                    def rodar():
+                        _, info = odeint(f, y0, t, args=args, full_output=True)
+                        return int(info['nfe'][-1])
+                else:
+                    def rodar():
+                        sol = solve_ivp(lambda s, y: f(y, s, *args), (0, dias), y0,
+                                        method=solver, t_eval=t)
+                        return int(sol.nfev)
+                tempo, nfev = cronometrar(rodar, repeticoes)
+                registros.append(_registro(f'{nome}/{solver}/{dias}d', tempo, nfev,
+                                           pico_memoria(rodar), grupo='modelo',
+                                           modelo=nome, solver=solver, dias=dias))
+    return registros
+
+
+def bench_ajustes(repeticoes):
+    from fit_model import ajustar_modelo
+    import fitvirus_python_versao_gpt as fv
+
+    registros = []
+    for regiao, arquivo in SERIES.items():
+        y = np.loadtxt(arquivo, usecols=1)
+
+        tempo, _ = cronometrar(lambda: model.initial_SIRC(y), repeticoes)
+        registros.append(_registro(f'initial_SIRC/{regiao}', tempo, None,
+                                   pico_memoria(lambda: model.initial_SIRC(y)),
+                                   grupo='ajuste'))
+
+        def ajuste():
+            with redirect_stdout(io.StringIO()):
+                return ajustar_modelo(y, verbose=False)[0].nfev
+        tempo, nfev = cronometrar(ajuste, repeticoes)
+        registros.append(_registro(f'ajustar_modelo/{regiao}', tempo, nfev,
+                                   pico_memoria(ajuste), grupo='ajuste'))
+
+        # conta as avaliações do objetivo envolvendo a função do módulo
+        original = fv.objective_gradient
+        contador = {'n': 0}
+
+        def contado(*a):
+            contador['n'] += 1
+            return original(*a)
+
+        def virus():
+            contador['n'] = 0
+            fv.objective_gradient = contado
+            try:
+                with redirect_stdout(io.StringIO()):
+                    fv.fit_virus(lambda: (regiao, y, datetime(2020, 3, 18)), plt=False)
+            finally:
+                fv.objective_gradient = original
+            return contador['n']
+        tempo, nfev = cronometrar(virus, repeticoes)
+        registros.append(_registro(f'fit_virus/{regiao}', tempo, nfev,
+                                   pico_memoria(virus), grupo='ajuste'))
+    return registros
+
+
+def commit_atual():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=RAIZ, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'sem-git'
+
+
+def comparar(atual, arquivo_base, tolerancia):
+    """
+    Imprime a razão de tempo atual/base e devolve as regressões.
+    """
+    with open(arquivo_base) as f:
+        base = {r['nome']: r for r in json.load(f)['registros']}
+    regressoes = []
+    print(f'\n{"benchmark":<36}{"base (ms)":>12}{"atual (ms)":>12}{"razão":>8}')
+    for r in atual['registros']:
+        b = base.get(r['nome'])
+        if b is None:
+            continue
+        razao = r['tempo_s'] / b['tempo_s']
+        marca = ' <-- regressão' if razao > 1 + tolerancia else ''
+        print(f'{r["nome"]:<36}{1e3 * b["tempo_s"]:>12.3f}'
+              f'{1e3 * r["tempo_s"]:>12.3f}{razao:>8.2f}{marca}')
+        if marca:
+            regressoes.append(r['nome'])
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rapido', action='store_true',
+                        help='só o horizonte de 100 dias e 1 repetição')
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--sem-ajustes', action='store_true')
+    parser.add_argument('--comparar', metavar='JSON',
+                        help='resultado anterior para comparação')
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help='aumento relativo de tempo tratado como regressão')
+    parser.add_argument('--nao-salvar', action='store_true')
+    args = parser.parse_args()
+
+    horizontes = HORIZONTES[:1] if args.rapido else HORIZONTES
+    repeticoes = 1 if args.rapido else args.repeticoes
+
+    registros = bench_modelos(horizontes, repeticoes)
+    if not args.sem_ajustes:
+        registros += bench_ajustes(repeticoes)
+
+    resultado = {'commit': commit_atual(), 'data': datetime.now().isoformat(),
+                 'python': platform.python_version(), 'maquina': platform.machine(),
+                 'numpy': np.__version__, 'registros': registros}
+
+    print(f'{"benchmark":<36}{"tempo (ms)":>12}{"nfev":>8}{"pico (kB)":>12}')
+    for r in registros:
+        nfev = '' if r['nfev'] is None else r['nfev']
+        print(f'{r["nome"]:<36}{1e3 * r["tempo_s"]:>12.3f}{nfev:>8}'
+              f'{r["pico_memoria_bytes"] / 1024:>12.1f}')
+
+    if not args.nao_salvar:
+        os.makedirs(DIR_RESULTADOS, exist_ok=True)
+        arquivo = os.path.join(DIR_RESULTADOS, f'{resultado["commit"]}.json')
+        with open(arquivo, 'w') as f:
+            json.dump(resultado, f, indent=1)
+        print(f'\nresultados gravados em {arquivo}')
+
+    if args.comparar:
+        regressoes = comparar(resultado, args.comparar, args.tolerancia)
+        if regressoes:
+            print(f'\n{len(regressoes)} regressões acima de {args.tolerancia:.0%}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
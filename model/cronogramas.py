@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Transmissão variável no tempo: cronogramas beta(t) por degraus ou spline.
+
+Um Cronograma guarda beta(t) como uma tabela de polinômios cúbicos por
+segmento, montada uma única vez:
+
+    beta(t) = c0 + s (c1 + s (c2 + s c3)),   s = t - origem do segmento
+
+Nos degraus (intervenções, lockdowns) só c0 é não nulo; na spline (PCHIP,
+que não cria beta negativo nem oscila entre os nós) os coeficientes vêm do
+interpolador. As quebras são fronteiras de integração: cada segmento é
+integrado separadamente, a partir do estado final do anterior, e recebe
+os coeficientes do seu polinômio como argumentos do lado direito. Assim o
+integrador nunca atravessa uma descontinuidade e não há busca da quebra
+(nem if t > t1) a cada avaliação; com Numba o polinômio é avaliado dentro
+do lado direito compilado.
+
+Os valores (e, opcionalmente, as quebras) são parâmetros ajustáveis:
+ajustar_cronograma() os estima por mínimos quadrados em escala log.
+
+Exemplo:
+    cron = Cronograma([20, 45, 90], [0.45, 0.18, 0.25, 0.32])   # 4 regimes
+    Y = resolver_cronograma('SEIRC', y0, np.arange(180), params, cron)
+    cron_aj, p_aj, res = ajustar_cronograma('SEIRC', y0, t, C_obs, params, cron)
+"""
+import numpy as np
+from scipy.integrate import odeint
+from scipy.interpolate import PchipInterpolator
+from scipy.optimize import least_squares
+
+from modelos_compilados import JIT_DISPONIVEL, jacobiano, rhs
+from modelos_vetorizados import MODELOS_LOTE, args_lote, rkdp_lote, rk4_lote
+
+if JIT_DISPONIVEL:
+    from numba import njit
+
+TIPOS = ('degraus', 'spline')
+
+
+# =============================================================================
+# Cronograma
+# =============================================================================
+
+class Cronograma:
+    """
+    beta(t) por segmentos.
+
+    input:
+    quebras : instantes das mudanças (m,), em dias
+    valores : 'degraus' -> beta em cada regime (m + 1,), antes da 1a quebra,
+              entre quebras e depois da última;
+              'spline'  -> beta em cada quebra (nó) (m,), constante fora
+              do intervalo dos nós.
+              Um array (n, ...) define n cronogramas para integração em lote.
+    tipo    : 'degraus' ou 'spline'
+    """
+
+    def __init__(self, quebras, valores, tipo='degraus'):
+        if tipo not in TIPOS:
+            raise ValueError(f'Tipo de cronograma desconhecido: {tipo}. Disponíveis: {TIPOS}')
+        quebras = np.atleast_1d(np.asarray(quebras, dtype=float))
+        valores = np.asarray(valores, dtype=float)
+        if np.any(np.diff(quebras) <= 0):
+            raise ValueError('As quebras do cronograma devem ser estritamente crescentes')
+        esperado = quebras.size + 1 if tipo == 'degraus' else quebras.size
+        if valores.shape[-1] != esperado:
+            raise ValueError(f'Cronograma {tipo} com {quebras.size} quebras espera '
+                             f'{esperado} valores, recebeu {valores.shape[-1]}')
+        if tipo == 'spline' and quebras.size < 2:
+            raise ValueError('A spline precisa de pelo menos 2 nós')
+        self.quebras = quebras
+        self.valores = valores
+        self.tipo = tipo
+        self.limites = np.concatenate(([-np.inf], quebras, [np.inf]))
+        self.origens = np.concatenate(([quebras[0]], quebras))
+        self.coef = self._coeficientes()
+
+    def _coeficientes(self):
+        # coef (segmentos, 4, *lote), com c0..c3 em potências crescentes de s
+        v = np.moveaxis(np.atleast_1d(self.valores), -1, 0)
+        coef = np.zeros((self.quebras.size + 1, 4) + v.shape[1:])
+        if self.tipo == 'degraus':
+            coef[:, 0] = v
+            return coef
+        c = PchipInterpolator(self.quebras, v, axis=0).c  # (4, m - 1, *lote), grau 3 primeiro
+        coef[1:-1] = np.moveaxis(c[::-1], 0, 1)
+        coef[0, 0] = v[0]
+        coef[-1, 0] = v[-1]
+        return coef
+
+    @property
+    def n_lote(self):
+        """
+        Número de cronogramas (1 se os valores forem 1-D).
+        """
+        return 1 if self.valores.ndim == 1 else self.valores.shape[0]
+
+    def com_valores(self, valores, quebras=None):
+        """
+        Novo cronograma do mesmo tipo com outros valores (e quebras).
+        """
+        return Cronograma(self.quebras if quebras is None else quebras, valores, self.tipo)
+
+    def __call__(self, t):
+        """
+        beta(t) para tempos arbitrários (para gráficos e relatórios; a
+        integração usa os segmentos diretamente).
+        """
+        t = np.asarray(t, dtype=float)
+        k = np.searchsorted(self.quebras, t, side='right')
+        s = t - self.origens[k]
+        c = np.moveaxis(self.coef[k], t.ndim, 0)
+        if self.valores.ndim > 1:
+            s = s[..., None]
+        return c[0] + s * (c[1] + s * (c[2] + s * c[3]))
+
+    def segmentos(self, t_ini, t_fim):
+        """
+        Segmentos que cobrem [t_ini, t_fim]: lista de (a, b, origem, coef).
+        """
+        lista = []
+        for k in range(self.quebras.size + 1):
+            a, b = max(self.limites[k], t_ini), min(self.limites[k + 1], t_fim)
+            if b > a:
+                lista.append((a, b, self.origens[k], self.coef[k]))
+        return lista
+
+    def __repr__(self):
+        return (f'Cronograma({self.tipo}, quebras={self.quebras.tolist()}, '
+                f'valores={np.round(self.valores, 4).tolist()})')
+
+
+# =============================================================================
+# Lados direitos com beta polinomial
+# =============================================================================
+
+def _com_beta(f):
+    # todos os modelos recebem (N, beta, ...): beta vira o polinômio do segmento
+    def g(y, t, N, origem, c0, c1, c2, c3, *resto):
+        s = t - origem
+        return f(y, t, N, c0 + s * (c1 + s * (c2 + s * c3)), *resto)
+    return g
+
+
+_ENVOLVIDOS = {}
+
+
+def _rhs_cronograma(nome):
+    if nome not in _ENVOLVIDOS:
+        f, J = rhs(nome), jacobiano(nome)
+        if JIT_DISPONIVEL:
+            _ENVOLVIDOS[nome] = (njit(_com_beta(f)), njit(_com_beta(J)))
+        else:
+            _ENVOLVIDOS[nome] = (_com_beta(f), _com_beta(J))
+    return _ENVOLVIDOS[nome]
+
+
+def _fatiar(t, a, b):
+    # índices dos tempos de saída em (a, b] (o primeiro segmento inclui a)
+    return np.searchsorted(t, a, side='right'), np.searchsorted(t, b, side='right')
+
+
+# =============================================================================
+# Integração
+# =============================================================================
+
+def resolver_cronograma(nome, y0, t, params, cronograma, **kws):
+    """
+    Integra um modelo com beta(t) dado por um cronograma.
+
+    Cada segmento do cronograma é uma chamada do odeint (com o jacobiano
+    analítico), partindo do estado no fim do segmento anterior.
+
+    input:
+    nome       : 'SIR', 'SEIR', ..., 'SEIARDC'
+    y0         : condição inicial em t[0]
+    t          : tempos de saída (crescentes)
+    params     : dict de parâmetros do modelo (beta, se houver, é ignorado)
+    cronograma : Cronograma com valores 1-D
+    kws        : repassados ao odeint (rtol, atol, ...)
+
+    Output:
+    sol : array (nt, k)
+    """
+    if cronograma.valores.ndim != 1:
+        raise ValueError('resolver_cronograma espera um único cronograma; '
+                         'use resolver_lote_cronograma para valores (n, ...)')
+    f, J = _rhs_cronograma(nome)
+    p = dict(params, beta=0.0)
+    args = [float(v) for v in args_lote(nome, p)]
+    t = np.asarray(t, dtype=float)
+    y = np.asarray(y0, dtype=float)
+    sol = np.empty((t.size, y.size))
+    sol[0] = y
+    for a, b, origem, c in cronograma.segmentos(t[0], t[-1]):
+        i, j = _fatiar(t, a, b)
+        tt = np.concatenate(([a], t[i:j], [b] if j == i or t[j - 1] < b else []))
+        seg_args = (args[0], origem, *c) + tuple(args[2:])
+        ys = odeint(f, y, tt, args=seg_args, Dfun=J, **kws)
+        sol[i:j] = ys[1:1 + j - i]
+        y = ys[-1]
+    return sol
+
+
+def resolver_lote_cronograma(nome, Y0, t, params, cronograma, metodo='rkdp', **kws):
+    """
+    Integra n cenários, cada um com seu cronograma (valores (n, ...)) ou com
+    um cronograma comum, com rkdp_lote/rk4_lote segmento a segmento.
+
+    Output:
+    sol : array (nt, n, k)
+    """
+    f_lote, comps, _ = MODELOS_LOTE[nome]
+    n = max([np.size(v) for v in params.values()] + [cronograma.n_lote])
+    Y = np.asarray(Y0, dtype=float)
+    if Y.ndim == 1:
+        Y = np.tile(Y, (n, 1))
+    p = dict(params, beta=0.0)
+    N, _, *resto = args_lote(nome, p, Y.shape[0])
+    integrador = {'rkdp': rkdp_lote, 'rk4': rk4_lote}.get(metodo)
+    if integrador is None:
+        raise ValueError(f'Método desconhecido: {metodo}')
+
+    def g(Y, t, origem, c0, c1, c2, c3):
+        s = t - origem
+        return f_lote(Y, t, N, c0 + s * (c1 + s * (c2 + s * c3)), *resto)
+
+    t = np.asarray(t, dtype=float)
+    sol = np.empty((t.size,) + Y.shape)
+    sol[0] = Y
+    for a, b, origem, c in cronograma.segmentos(t[0], t[-1]):
+        i, j = _fatiar(t, a, b)
+        tt = np.concatenate(([a], t[i:j], [b] if j == i or t[j - 1] < b else []))
+        ys = integrador(g, Y, tt, (origem, *c), **kws)
+        sol[i:j] = ys[1:1 + j - i]
+        Y = ys[-1]
+    return sol
+
+
+# =============================================================================
+# Ajuste
+# =============================================================================
+
+def ajustar_cronograma(nome, y0, t, observado, params, cronograma, comp='C',
+                       livres=(), limites=None, ajustar_quebras=False,
+                       limites_beta=(1e-3, 5.0), **kws):
+    """
+    Ajusta os valores do cronograma (e opcionalmente as quebras e outros
+    parâmetros) a uma série observada por mínimos quadrados.
+
+    input:
+    nome            : modelo de MODELOS_LOTE
+    y0, t           : condição inicial e tempos das observações
+    observado       : série observada do compartimento comp (NaN é ignorado)
+    params          : dict de parâmetros (valores iniciais dos livres)
+    cronograma      : Cronograma inicial (quebras e chute dos valores)
+    comp            : compartimento comparado (ex. 'C', acumulado de casos)
+    livres          : outros parâmetros ajustados (em escala log)
+    limites         : dict {parametro: (min, max)} dos livres
+    ajustar_quebras : se True as quebras também são ajustadas, entre t[0] e t[-1]
+    limites_beta    : limites dos valores de beta
+    kws             : repassados ao least_squares
+
+    Output:
+    (cronograma ajustado, params ajustados, resultado do least_squares)
+    """
+    limites = limites or {}
+    ic = MODELOS_LOTE[nome][1].index(comp)
+    observado = np.asarray(observado, dtype=float)
+    ok = np.isfinite(observado)
+    escala = max(np.nanmax(np.abs(observado)), 1.0)
+    nv, nq = cronograma.valores.size, cronograma.quebras.size
+
+    x0 = [np.log(cronograma.valores)]
+    lo = [np.full(nv, np.log(limites_beta[0]))]
+    hi = [np.full(nv, np.log(limites_beta[1]))]
+    x0 += [np.log([params[k] for k in livres])]
+    lo += [np.log([limites.get(k, (1e-8, np.inf))[0] for k in livres])]
+    hi += [np.log([limites.get(k, (1e-8, np.inf))[1] for k in livres])]
+    if ajustar_quebras:
+        x0 += [cronograma.quebras]
+        lo += [np.full(nq, t[0])]
+        hi += [np.full(nq, t[-1])]
+    x0, lo, hi = np.concatenate(x0), np.concatenate(lo), np.concatenate(hi)
+    x0 = np.clip(x0, lo, hi)
+
+    def montar(x):
+        cron = cronograma.com_valores(
+            np.exp(x[:nv]), np.sort(x[nv + len(livres):]) if ajustar_quebras else None)
+        p = dict(params, **dict(zip(livres, np.exp(x[nv:nv + len(livres)]))))
+        return cron, p
+
+    def residuos(x):
+        try:
+            cron, p = montar(x)
+        except ValueError:  # quebras coincidentes
+            return np.full(ok.sum(), 1e3)
+        Y = resolver_cronograma(nome, y0, t, p, cron)
+        return (Y[ok, ic] - observado[ok]) / escala
+
+    kws.setdefault('x_scale', 'jac')
+    res = least_squares(residuos, x0, bounds=(lo, hi), **kws)
+    cron, p = montar(res.x)
+    return cron, p, res
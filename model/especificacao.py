@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Especificação declarativa de modelos compartimentados e geração de código.
+
+Um modelo é descrito uma vez (compartimentos, parâmetros, força de infecção,
+fluxos e acumuladores) e daí saem, por geração de código-fonte:
+
+- rhs(y, t, *args)          lado direito pontual (np.ndarray, compilável);
+- rhs_lote(Y, t, *args)     lado direito vetorizado (n, k), como modelos_vetorizados;
+- jacobiano(y, t, *args)    jacobiano analítico J[i, j] = df_i/dy_j;
+- jacobiano_lote(Y, t, *args) jacobianos (n, k, k);
+- taxas_lote(Y, t, *args)   taxas per capita de cada fluxo (n, n_fluxos);
+- forca_lote(Y, t, *args)   (sum(w_k X_k), N - sum(X_d)) da força de infecção;
+- metadados()               ordem dos parâmetros, compartimentos, fluxos, limites.
+
+Os fluxos têm taxa per capita constante (expressão nos parâmetros, ex.
+'(1 - rho) * alpha') ou igual à força de infecção
+lambda = beta * sum(w_k X_k) / (N - sum(X_d)); com isso o jacobiano é
+montado em forma fechada, sem álgebra simbólica. Acumuladores (ex. C) somam
+fluxos escolhidos e entram no fim do estado, como nos modelos *C.
+
+ESPECIFICACOES é a única definição dos modelos: MODELOS_LOTE
+(modelos_vetorizados), o registro de modelos_compilados e as transições do
+motor estocástico (estocastico, metapopulacao, estrutura_etaria) são todos
+gerados a partir dela. registrar() acrescenta um modelo novo a todos esses
+registros, de modo que simular, Trajetoria, resolver_lote, Calibracao e
+simular_estocastico passam a aceitá-lo pelo nome.
+
+O código gerado é gravado em __pycache__/especificacoes (um arquivo por
+versão do modelo) e executado de lá, para que o Numba possa guardar a
+compilação em cache como faz com funções escritas à mão.
+
+Exemplo:
+    SEIRS = Especificacao(
+        'SEIRS', compartimentos=('S', 'E', 'I', 'R'),
+        parametros=('N', 'beta', 'alpha', 'gamma', 'omega'),
+        forca=Forca(infecciosos={'I': '1'}),
+        fluxos=[Fluxo('S', 'E', FORCA), Fluxo('E', 'I', 'alpha'),
+                Fluxo('I', 'R', 'gamma'), Fluxo('R', 'S', 'omega')],
+        acumuladores={'C': [('E', 'I')]})
+    registrar(SEIRS)
+    sol = resolver_lote('SEIRS', Y0, t, params)
+"""
+import ast
+import hashlib
+import importlib.util
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    from numba import njit
+    JIT_DISPONIVEL = True
+except ImportError:  # Numba é opcional
+    JIT_DISPONIVEL = False
+
+FORCA = 'forca'  # taxa per capita igual à força de infecção
+
+DIR_GERADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__',
+                           'especificacoes')
+
+Fluxo = namedtuple('Fluxo', ['origem', 'destino', 'taxa'])
+
+
+class Forca(namedtuple('Forca', ['beta', 'infecciosos', 'populacao', 'descontar'])):
+    """
+    Força de infecção beta * sum(peso_k * X_k) / (populacao - sum(X_d)).
+
+    beta        : nome do parâmetro de transmissão
+    infecciosos : dict {compartimento: peso (expressão nos parâmetros)}
+    populacao   : parâmetro com o tamanho da população
+    descontar   : compartimentos removidos da população (ex. ('D',))
+    """
+    def __new__(cls, beta='beta', infecciosos=None, populacao='N', descontar=()):
+        return super().__new__(cls, beta, dict(infecciosos or {'I': '1'}),
+                               populacao, tuple(descontar))
+
+
+def _nomes(expr):
+    return {n.id for n in ast.walk(ast.parse(expr, mode='eval')) if isinstance(n, ast.Name)}
+
+
+def _executar(nome, fonte):
+    """
+    Carrega o código gerado como módulo a partir de um arquivo (o Numba só
+    guarda em cache funções de módulos com arquivo-fonte); sem permissão de
+    escrita, executa em memória.
+    """
+    chave = hashlib.sha1(fonte.encode()).hexdigest()[:12]
+    modulo = f'_especificacao_{nome}_{chave}'
+    if modulo in sys.modules:
+        return vars(sys.modules[modulo])
+    caminho = os.path.join(DIR_GERADOS, f'{nome}_{chave}.py')
+    try:
+        if not os.path.exists(caminho):
+            os.makedirs(DIR_GERADOS, exist_ok=True)
+            tmp = f'{caminho}.{os.getpid()}.tmp'
+            with open(tmp, 'w') as f:
+                f.write(fonte)
+            os.replace(tmp, caminho)
+    except OSError:
+        ns = {'np': np}
+        exec(compile(fonte, f'<especificacao {nome}>', 'exec'), ns)
+        return ns
+    spec = importlib.util.spec_from_file_location(modulo, caminho)
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules[modulo] = mod  # o cache do Numba reimporta o módulo pelo nome
+    spec.loader.exec_module(mod)
+    return vars(mod)
+
+
+class Especificacao:
+    """
+    Definição declarativa de um modelo compartimentado.
+
+    input:
+    nome           : nome do modelo (chave nos registros)
+    compartimentos : compartimentos dinâmicos, na ordem do estado
+    parametros     : parâmetros, na ordem dos args das funções geradas
+    fluxos         : lista de Fluxo(origem, destino, taxa per capita)
+    forca          : Forca usada pelos fluxos com taxa FORCA
+    acumuladores   : dict {nome: [(origem, destino), ...]} de fluxos somados
+                     (entram no fim do estado)
+    limites        : dict {parametro: (min, max)} (metadado opcional)
+    descricoes     : dict {parametro ou compartimento: texto} (opcional)
+    """
+
+    def __init__(self, nome, compartimentos, parametros, fluxos, forca=None,
+                 acumuladores=None, limites=None, descricoes=None):
+        self.nome = nome
+        self.compartimentos = tuple(compartimentos)
+        self.parametros = tuple(parametros)
+        self.fluxos = [Fluxo(*f) for f in fluxos]
+        self.forca = forca
+        self.acumuladores = {k: [tuple(f) for f in v] for k, v in (acumuladores or {}).items()}
+        self.limites = dict(limites or {})
+        self.descricoes = dict(descricoes or {})
+        self._validar()
+        self.estado = self.compartimentos + tuple(self.acumuladores)
+        self.fonte = self._gerar_fonte()
+        ns = _executar(nome, self.fonte)
+        self.rhs = ns['rhs']
+        self.rhs_lote = ns['rhs_lote']
+        self.jacobiano = ns['jacobiano']
+        self.jacobiano_lote = ns['jacobiano_lote']
+        self.taxas_lote = ns['taxas_lote']
+        self.forca_lote = ns.get('forca_lote')
+
+    def _validar(self):
+        comps, pars = set(self.compartimentos), set(self.parametros)
+        sobrepostos = comps & pars
+        if sobrepostos:
+            raise ValueError(f'{self.nome}: nomes usados como compartimento e parâmetro: {sobrepostos}')
+        for f in self.fluxos:
+            if f.origem not in comps or f.destino not in comps:
+                raise ValueError(f'{self.nome}: fluxo {f.origem}->{f.destino} com compartimento desconhecido')
+            if f.taxa == FORCA:
+                if self.forca is None:
+                    raise ValueError(f'{self.nome}: fluxo {f.origem}->{f.destino} usa a força '
+                                     'de infecção, mas forca não foi definida')
+            elif not _nomes(f.taxa) <= pars:
+                raise ValueError(f'{self.nome}: taxa {f.taxa!r} usa nomes fora de parametros: '
+                                 f'{_nomes(f.taxa) - pars}')
+        if self.forca is not None:
+            fz = self.forca
+            usados = {fz.beta, fz.populacao}.union(*(_nomes(w) for w in fz.infecciosos.values()))
+            if not usados <= pars:
+                raise ValueError(f'{self.nome}: força de infecção usa parâmetros desconhecidos: '
+                                 f'{usados - pars}')
+            if not set(fz.infecciosos) | set(fz.descontar) <= comps:
+                raise ValueError(f'{self.nome}: força de infecção usa compartimentos desconhecidos')
+        pares = {(f.origem, f.destino) for f in self.fluxos}
+        for nome, lista in self.acumuladores.items():
+            if nome in comps or nome in pars:
+                raise ValueError(f'{self.nome}: acumulador {nome!r} repete outro nome')
+            for par in lista:
+                if par not in pares:
+                    raise ValueError(f'{self.nome}: acumulador {nome} soma fluxo inexistente {par}')
+
+    # -------------------------------------------------------------------------
+    # geração de código
+
+    def _termos(self):
+        """
+        Expressões (em nomes de compartimentos/parâmetros) dos fluxos, da
+        força de infecção e das derivadas parciais de cada fluxo.
+        """
+        fz = self.forca
+        linhas = []
+        derivadas = []  # por fluxo: {compartimento: expressão de dF/dX}
+        if fz is not None:
+            soma = ' + '.join(f'({w}) * {c}' for c, w in fz.infecciosos.items())
+            pop = ' - '.join([fz.populacao] + list(fz.descontar))
+            linhas += [f'pop_ = {pop}', f'lam_ = {fz.beta} * ({soma}) / pop_']
+        for i, f in enumerate(self.fluxos):
+            d = {}
+            if f.taxa == FORCA:
+                linhas.append(f'f{i}_ = lam_ * {f.origem}')
+                d[f.origem] = ['lam_']
+                for c, w in fz.infecciosos.items():
+                    d.setdefault(c, []).append(f'{f.origem} * {fz.beta} * ({w}) / pop_')
+                for c in fz.descontar:
+                    d.setdefault(c, []).append(f'{f.origem} * lam_ / pop_')
+            else:
+                linhas.append(f'f{i}_ = ({f.taxa}) * {f.origem}')
+                d[f.origem] = [f'({f.taxa})']
+            derivadas.append(d)
+        return linhas, derivadas
+
+    def _balancos(self):
+        """
+        Para cada variável de estado, lista de (sinal, índice do fluxo).
+        """
+        idx = {(f.origem, f.destino): i for i, f in enumerate(self.fluxos)}
+        bal = {c: [] for c in self.estado}
+        for i, f in enumerate(self.fluxos):
+            bal[f.origem].append((-1, i))
+            bal[f.destino].append((+1, i))
+        for nome, lista in self.acumuladores.items():
+            bal[nome] = [(+1, idx[par]) for par in lista]
+        return bal
+
+    def _gerar_fonte(self):
+        linhas, derivadas = self._termos()
+        bal = self._balancos()
+        k = len(self.estado)
+        args = ', '.join(self.parametros)
+
+        def soma(termos):
+            if not termos:
+                return '0.0'
+            txt = ''.join(f' {"-" if s < 0 else "+"} {t}' for s, t in termos).strip()
+            return txt[2:] if txt.startswith('+ ') else '-' + txt[2:]
+
+        # derivadas parciais por célula do jacobiano
+        celulas = {}
+        for i_var, var in enumerate(self.estado):
+            for sinal, i_f in bal[var]:
+                for c, exprs in derivadas[i_f].items():
+                    celulas.setdefault((i_var, self.estado.index(c)), []).extend(
+                        (sinal, e) for e in exprs)
+
+        def corpo(lote, fluxos=True):
+            ix = (lambda i: f'[:, {i}]') if lote else (lambda i: f'[{i}]')
+            saida = [f'    {c} = y{ix(i)}' for i, c in enumerate(self.compartimentos)]
+            # o jacobiano só precisa da força de infecção, não dos fluxos
+            return saida + [f'    {ln}' for ln in linhas if fluxos or not ln.startswith('f')]
+
+        fonte = [f'# gerado por Especificacao({self.nome!r})', 'import numpy as np', '', '']
+        for lote in (False, True):
+            suf = '_lote' if lote else ''
+            forma = '(y.shape[0], {})' if lote else '({})'
+            ix = (lambda i: f'[:, {i}]') if lote else (lambda i: f'[{i}]')
+            ixj = (lambda i, j: f'[:, {i}, {j}]') if lote else (lambda i, j: f'[{i}, {j}]')
+
+            fonte += [f'def rhs{suf}(y, t, {args}):'] + corpo(lote)
+            fonte.append(f'    dy = np.empty({forma.format(k)})')
+            for i, var in enumerate(self.estado):
+                fonte.append(f'    dy{ix(i)} = {soma([(s, f"f{j}_") for s, j in bal[var]])}')
+            fonte += ['    return dy', '', '']
+
+            fonte += [f'def jacobiano{suf}(y, t, {args}):'] + corpo(lote, fluxos=False)
+            fonte.append(f'    J = np.zeros({forma.format(f"{k}, {k}")})')
+            for (i, j), termos in sorted(celulas.items()):
+                fonte.append(f'    J{ixj(i, j)} = {soma(termos)}')
+            fonte += ['    return J', '', '']
+
+        # taxas per capita (motor estocástico) e força de infecção, em lote
+        fonte += [f'def taxas_lote(y, t, {args}):'] + corpo(True, fluxos=False)
+        fonte.append(f'    tx = np.empty((y.shape[0], {len(self.fluxos)}))')
+        for i, f in enumerate(self.fluxos):
+            fonte.append(f'    tx[:, {i}] = ' + ('lam_' if f.taxa == FORCA else f'{f.taxa}'))
+        fonte += ['    return tx', '', '']
+        if self.forca is not None:
+            fz = self.forca
+            soma = ' + '.join(f'({w}) * {c}' for c, w in fz.infecciosos.items())
+            pop = ' - '.join([fz.populacao] + list(fz.descontar))
+            fonte += [f'def forca_lote(y, t, {args}):'] + corpo(True, fluxos=False)[:len(self.compartimentos)]
+            fonte += [f'    return {soma}, {pop}', '', '']
+        return '\n'.join(fonte)
+
+    # -------------------------------------------------------------------------
+
+    def transicoes(self):
+        """
+        Transições (origem, destino, acumuladores) na ordem dos fluxos, que é
+        a das colunas de taxas_lote().
+        """
+        return [(f.origem, f.destino,
+                 tuple(a for a, lista in self.acumuladores.items()
+                       if (f.origem, f.destino) in lista))
+                for f in self.fluxos]
+
+    def fluxos_forca(self):
+        """
+        Índices dos fluxos cuja taxa é a força de infecção.
+        """
+        return [i for i, f in enumerate(self.fluxos) if f.taxa == FORCA]
+
+    def metadados(self):
+        """
+        Descrição do modelo: estado, parâmetros (ordem dos args), fluxos,
+        acumuladores, limites e descrições.
+        """
+        return {'nome': self.nome, 'estado': self.estado,
+                'compartimentos': self.compartimentos,
+                'acumuladores': dict(self.acumuladores),
+                'parametros': self.parametros,
+                'fluxos': [tuple(f) for f in self.fluxos],
+                'forca': self.forca._asdict() if self.forca else None,
+                'limites': dict(self.limites), 'descricoes': dict(self.descricoes)}
+
+    def compilar(self):
+        """
+        (rhs, jacobiano) pontuais compilados com Numba, ou os originais.
+        """
+        if JIT_DISPONIVEL:
+            return njit(cache=True)(self.rhs), njit(cache=True)(self.jacobiano)
+        return self.rhs, self.jacobiano
+
+
+def especificacao(nome):
+    """
+    Especificação registrada de um modelo (ValueError se não houver).
+    """
+    if nome not in ESPECIFICACOES:
+        raise ValueError(f'Modelo sem especificação: {nome}. '
+                         f'Disponíveis: {list(ESPECIFICACOES)}')
+    return ESPECIFICACOES[nome]
+
+
+def registrar(espec, substituir=False):
+    """
+    Publica o modelo em ESPECIFICACOES, MODELOS_LOTE e modelos_compilados.
+    """
+    # importados aqui: os dois módulos montam seus registros a partir deste
+    import modelos_compilados
+    from modelos_vetorizados import MODELOS_LOTE
+
+    if espec.nome in ESPECIFICACOES and not substituir:
+        raise ValueError(f'Modelo {espec.nome} já registrado (use substituir=True)')
+    ESPECIFICACOES[espec.nome] = espec
+    MODELOS_LOTE[espec.nome] = (espec.rhs_lote, espec.estado, espec.parametros)
+    modelos_compilados.registrar(espec.nome, espec.rhs, espec.jacobiano, substituir=True)
+    return espec
+
+
+# =============================================================================
+# Os modelos de modelos_epidemiologicos.py em forma declarativa
+# =============================================================================
+
+def _familia(nome, assintomaticos=False, latentes=True, obitos=False, acumulado=False):
+    comps = ['S'] + (['E'] if latentes else []) + ['I'] + (['A'] if assintomaticos else []) \
+        + ['R'] + (['D'] if obitos else [])
+    if assintomaticos and obitos:
+        pars = ['N', 'beta', 'kappa', 'alpha', 'rho', 'gamma_I', 'gamma_A', 'delta_I']
+    elif assintomaticos:
+        pars = ['N', 'beta', 'alpha', 'gamma_I', 'gamma_A', 'rho', 'kappa']
+    else:
+        pars = ['N', 'beta'] + (['alpha'] if latentes else []) + ['gamma']
+    gamma = 'gamma_I' if assintomaticos else 'gamma'
+    fluxos = [Fluxo('S', 'E' if latentes else 'I', FORCA)]
+    if latentes and assintomaticos:
+        fluxos += [Fluxo('E', 'I', '(1 - rho) * alpha'), Fluxo('E', 'A', 'rho * alpha')]
+    elif latentes:
+        fluxos += [Fluxo('E', 'I', 'alpha')]
+    fluxos += [Fluxo('I', 'R', gamma)]
+    if assintomaticos:
+        fluxos += [Fluxo('A', 'R', 'gamma_A')]
+    if obitos:
+        fluxos += [Fluxo('I', 'D', 'delta_I')]
+    forca = Forca(infecciosos={'I': '1', 'A': 'kappa'} if assintomaticos else {'I': '1'},
+                  descontar=('D',) if obitos else ())
+    acum = None
+    if acumulado:
+        novos = [(f.origem, f.destino) for f in fluxos if f.origem == ('E' if latentes else 'S')]
+        acum = {'C': novos}
+    limites = {p: lim for p, lim in (('beta', (0.001, 3.0)), ('gamma', (0.001, 2.0))) if p in pars}
+    return Especificacao(nome, comps, pars, fluxos, forca, acum, limites=limites)
+
+
+ESPECIFICACOES = {
+    'SIR': _familia('SIR', latentes=False),
+    'SEIR': _familia('SEIR'),
+    'SEIAR': _familia('SEIAR', assintomaticos=True),
+    'SEIARD': _familia('SEIARD', assintomaticos=True, obitos=True),
+    'SIRC': _familia('SIRC', latentes=False, acumulado=True),
+    'SEIRC': _familia('SEIRC', acumulado=True),
+    'SEIARC': _familia('SEIARC', assintomaticos=True, acumulado=True),
+    'SEIARDC': _familia('SEIARDC', assintomaticos=True, obitos=True, acumulado=True),
+}
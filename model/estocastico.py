@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Simulação estocástica dos modelos compartimentados (Gillespie e tau-leaping).
+
+As transições de cada modelo (S -> E, E -> I, I -> R, ...) são os fluxos da
+sua especificação declarativa (especificacao.py), com as mesmas taxas dos
+modelos determinísticos: a média das transições (deriva()) é o lado direito
+de modelos_vetorizados. Os acumuladores (C) somam os fluxos que os compõem,
+como nos modelos *C. Modelos registrados com registrar() funcionam aqui sem
+mudanças; um modelo sem especificação gera ValueError.
+
+- gillespie_lote: algoritmo direto exato, com todas as réplicas avançando
+  juntas (um evento por réplica por iteração), para N pequeno;
+- tau_leap_lote: passo fixo Euler-multinomial (saídas de cada compartimento
+  binomiais), que nunca gera contagens negativas, para N grande.
+
+simular_estocastico escolhe o método pelo tamanho da população e divide as
+réplicas em lotes de tamanho fixo, cada um com seu fluxo de números
+aleatórios (SeedSequence.spawn): o resultado para uma semente não depende do
+número de processos.
+
+Exemplo:
+    sol = simular_estocastico('SEIRC', [4990, 0, 10, 0, 10], np.arange(181),
+                              {'N': 5000, 'beta': 0.4, 'alpha': 0.2, 'gamma': 0.1},
+                              n_replicas=2000, max_workers=4)
+    final = tamanho_surto(sol, 'SEIRC')
+    probabilidade_extincao(final, limiar=50)
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from especificacao import especificacao
+from modelos_vetorizados import MODELOS_LOTE, args_lote
+
+METODOS = ('auto', 'gillespie', 'tau')
+
+
+# =============================================================================
+# Transições
+# =============================================================================
+
+def transicoes(nome):
+    """
+    Lista de transições do modelo: (origem, destino, acumuladores).
+
+    Vem dos fluxos da especificação do modelo (ValueError se não houver);
+    a ordem é a das colunas de taxas_per_capita().
+    """
+    return especificacao(nome).transicoes()
+
+
+def taxas_per_capita(nome, Y, p):
+    """
+    Taxas por indivíduo do compartimento de origem, array (n, n_transicoes).
+
+    Y : estado (n, k); p : dict {parametro: escalar ou array (n,)}
+    """
+    espec = especificacao(nome)
+    return espec.taxas_lote(Y, 0.0, *(p[k] for k in espec.parametros))
+
+
+def estequiometria(nome):
+    """
+    Matriz (n_transicoes, k) de variação do estado em cada transição.
+    """
+    comps = MODELOS_LOTE[nome][1]
+    V = np.zeros((len(transicoes(nome)), len(comps)), dtype=np.int64)
+    for i, (origem, destino, acumuladores) in enumerate(transicoes(nome)):
+        V[i, comps.index(origem)] -= 1
+        V[i, comps.index(destino)] += 1
+        for c in acumuladores:
+            V[i, comps.index(c)] += 1
+    return V
+
+
+def deriva(nome, Y, params):
+    """
+    Variação média do estado (igual ao lado direito de MODELOS_LOTE).
+    """
+    comps = MODELOS_LOTE[nome][1]
+    Y = np.atleast_2d(np.asarray(Y, dtype=float))
+    origens = [comps.index(o) for o, _, _ in transicoes(nome)]
+    a = taxas_per_capita(nome, Y, params) * Y[:, origens]
+    return a @ estequiometria(nome)
+
+
+def _params(nome, params, n):
+    return dict(zip(MODELOS_LOTE[nome][2], args_lote(nome, params, n)))
+
+
+# =============================================================================
+# Integradores
+# =============================================================================
+
+def gillespie_lote(nome, Y0, t, params, rng):
+    """
+    Algoritmo direto de Gillespie para todas as réplicas de Y0 (n, k).
+
+    Output:
+    sol : array (nt, n, k) de contagens (estado no instante de cada saída)
+    """
+    Y = np.array(Y0, dtype=np.int64, ndmin=2)
+    t = np.asarray(t, dtype=float)
+    n = len(Y)
+    p = _params(nome, params, n)
+    V = estequiometria(nome)
+    origens = [MODELOS_LOTE[nome][1].index(o) for o, _, _ in transicoes(nome)]
+
+    sol = np.empty((t.size, n, Y.shape[1]), dtype=np.int64)
+    sol[0] = Y
+    tc = np.full(n, t[0])
+    proxima = np.ones(n, dtype=np.int64)
+    ativos = np.arange(n)
+    while ativos.size:
+        Ya = Y[ativos]
+        pa = {k: v[ativos] for k, v in p.items()}
+        a = taxas_per_capita(nome, Ya, pa) * Ya[:, origens]
+        a0 = a.sum(axis=1)
+        with np.errstate(divide='ignore'):
+            dt = rng.exponential(size=ativos.size) / a0
+        t_novo = tc[ativos] + dt  # inf quando a0 == 0 (estado absorvente)
+
+        # saídas atravessadas antes do evento guardam o estado atual
+        prox = proxima[ativos]
+        while True:
+            m = (prox < t.size) & (t_novo >= t[np.minimum(prox, t.size - 1)])
+            if not m.any():
+                break
+            sol[prox[m], ativos[m]] = Ya[m]
+            prox[m] += 1
+        proxima[ativos] = prox
+
+        segue = (prox < t.size) & np.isfinite(t_novo)
+        if segue.any():
+            u = rng.random(segue.sum()) * a0[segue]
+            r = (np.cumsum(a[segue], axis=1) < u[:, None]).sum(axis=1)
+            r = np.minimum(r, len(V) - 1)
+            idx = ativos[segue]
+            Y[idx] += V[r]
+            tc[idx] = t_novo[segue]
+        ativos = ativos[segue]
+    return sol
+
+
+def tau_leap_lote(nome, Y0, t, params, rng, tau=0.25):
+    """
+    Tau-leaping Euler-multinomial para todas as réplicas de Y0 (n, k).
+
+    Em cada passo h (<= tau, alinhado às saídas), os indivíduos que deixam
+    cada compartimento são Binomial(X, 1 - exp(-h * soma das taxas)),
+    repartidos entre os destinos por binomiais condicionais.
+
+    Output:
+    sol : array (nt, n, k) de contagens
+    """
+    Y = np.array(Y0, dtype=np.int64, ndmin=2)
+    t = np.asarray(t, dtype=float)
+    comps = MODELOS_LOTE[nome][1]
+    p = _params(nome, params, len(Y))
+    trans = transicoes(nome)
+    grupos = {}
+    for i, (origem, _, _) in enumerate(trans):
+        grupos.setdefault(comps.index(origem), []).append(i)
+    V = estequiometria(nome)
+
+    sol = np.empty((t.size,) + Y.shape, dtype=np.int64)
+    sol[0] = Y
+    for j in range(t.size - 1):
+        n_sub = max(1, int(np.ceil((t[j + 1] - t[j]) / tau - 1e-9)))
+        h = (t[j + 1] - t[j]) / n_sub
+        for _ in range(n_sub):
+            taxas = taxas_per_capita(nome, Y, p)
+            disparos = np.zeros((len(Y), len(trans)), dtype=np.int64)
+            for s, idx in grupos.items():
+                r = taxas[:, idx]
+                total = r.sum(axis=1)
+                restantes = rng.binomial(Y[:, s], -np.expm1(-h * total))
+                r_rest = total.copy()
+                for c, i in enumerate(idx):
+                    if c == len(idx) - 1:
+                        k = restantes
+                    else:
+                        with np.errstate(invalid='ignore', divide='ignore'):
+                            q = np.where(r_rest > 0, r[:, c] / r_rest, 0.0)
+                        k = rng.binomial(restantes, np.clip(q, 0.0, 1.0))
+                    disparos[:, i] = k
+                    restantes = restantes - k
+                    r_rest = r_rest - r[:, c]
+            Y = Y + disparos @ V
+        sol[j + 1] = Y
+    return sol
+
+
+# =============================================================================
+# Interface
+# =============================================================================
+
+def _rodar_lote(tarefa):
+    nome, Y0, t, params, semente, metodo, tau = tarefa
+    rng = np.random.default_rng(semente)
+    if metodo == 'gillespie':
+        return gillespie_lote(nome, Y0, t, params, rng)
+    return tau_leap_lote(nome, Y0, t, params, rng, tau=tau)
+
+
+def simular_estocastico(nome, y0, t, params, n_replicas=1000, metodo='auto',
+                        tau=0.25, seed=0, max_workers=1, tamanho_lote=500,
+                        limite_gillespie=20000):
+    """
+    Réplicas estocásticas de um modelo de MODELOS_LOTE.
+
+    input:
+    nome             : 'SIR', 'SEIR', ..., 'SEIARDC'
+    y0               : estado inicial (contagens inteiras)
+    t                : tempos de saída
+    params           : dict {parametro: escalar}
+    n_replicas       : número de réplicas
+    metodo           : 'gillespie', 'tau' ou 'auto' (Gillespie se
+                       N <= limite_gillespie)
+    tau              : passo máximo do tau-leaping
+    seed             : semente (reprodutível para qualquer max_workers)
+    max_workers      : processos em paralelo
+    tamanho_lote     : réplicas por lote (cada lote tem seu fluxo aleatório)
+
+    Output:
+    sol : array (nt, n_replicas, k) de contagens
+    """
+    if metodo not in METODOS:
+        raise ValueError(f'Método desconhecido: {metodo}. Disponíveis: {METODOS}')
+    if metodo == 'auto':
+        metodo = 'gillespie' if params['N'] <= limite_gillespie else 'tau'
+    y0 = np.rint(np.asarray(y0, dtype=float)).astype(np.int64)
+    t = np.asarray(t, dtype=float)
+
+    tamanhos = [min(tamanho_lote, n_replicas - i) for i in range(0, n_replicas, tamanho_lote)]
+    sementes = np.random.SeedSequence(seed).spawn(len(tamanhos))
+    tarefas = [(nome, np.tile(y0, (m, 1)), t, params, s, metodo, tau)
+               for m, s in zip(tamanhos, sementes)]
+    if max_workers == 1:
+        partes = [_rodar_lote(tarefa) for tarefa in tarefas]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            partes = list(pool.map(_rodar_lote, tarefas))
+    return np.concatenate(partes, axis=1)
+
+
+def tamanho_surto(sol, nome):
+    """
+    Número final de infectados de cada réplica (S inicial - S final).
+    """
+    S = MODELOS_LOTE[nome][1].index('S')
+    return sol[0, :, S] - sol[-1, :, S]
+
+
+def probabilidade_extincao(tamanhos, limiar):
+    """
+    Fração das réplicas em que o surto terminou com menos de 'limiar' infectados.
+    """
+    return float(np.mean(np.asarray(tamanhos) < limiar))
+
+
+def distribuicao_surto(tamanhos, bins=50):
+    """
+    Histograma normalizado do tamanho final dos surtos (densidade, bordas).
+    """
+    return np.histogram(tamanhos, bins=bins, density=True)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SEIARD/SEIARDC estratificados por faixa etária, com matriz de contatos.
+
+O estado é Y (faixas, k), com os compartimentos de SEIARD ou SEIARDC em cada
+faixa. A força de infecção é um produto matriz-vetor por avaliação:
+
+    lambda = K @ ((I + kappa A) / (N - D)),   K = beta * diag(s) * C
+
+com C[g, h] os contatos diários de uma pessoa da faixa g com a faixa h e s a
+suscetibilidade relativa. K é montada uma vez por conjunto de parâmetros
+(e guardada em cache), de modo que cada passo custa O(G^2) com G pequeno, ou
+O(nnz) se C for esparsa. Parâmetros como delta_I (letalidade) e rho
+(fração assintomática) podem ser arrays por faixa; as demais transições são
+as mesmas de estocastico.py / modelos_vetorizados.
+
+letalidade_por_faixa() converte as idades dos óbitos (ex. coluna IDADE de
+obitos_delay_para.csv) em delta_I por faixa, com a média ponderada pela
+população igual ao delta_I agregado do SEIARD.
+
+Exemplo:
+    idades = pd.read_csv('sandbox/obitos_delay_para.csv')['IDADE']
+    delta = letalidade_por_faixa(idades, FAIXAS, pop_faixas, delta_medio=0.01)
+    sol = resolver_etario('SEIARDC', Y0, t, C, dict(params, N=pop_faixas, delta_I=delta))
+    obitos_por_faixa = sol[:, :, 5]
+"""
+from functools import lru_cache
+
+import numpy as np
+from scipy import sparse
+from scipy.integrate import solve_ivp
+
+from especificacao import especificacao
+from estocastico import estequiometria, taxas_per_capita, transicoes
+from modelos_vetorizados import MODELOS_LOTE, args_lote, rkdp_lote
+
+# limites inferiores das faixas (anos): 0-9, 10-19, ..., 80+
+FAIXAS = (0, 10, 20, 30, 40, 50, 60, 70, 80)
+MODELOS = ('SEIARD', 'SEIARDC')
+
+
+# =============================================================================
+# Faixas, contatos e letalidade
+# =============================================================================
+
+def _idades(idades):
+    # aceita a coluna do CSV como texto, com vírgula decimal
+    return np.array([float(str(v).replace(',', '.')) for v in idades], dtype=float)
+
+
+def contar_por_faixa(idades, faixas=FAIXAS):
+    """
+    Número de registros (ex. óbitos) em cada faixa etária.
+    """
+    x = _idades(idades)
+    x = x[np.isfinite(x)]
+    return np.bincount(np.searchsorted(faixas, x, side='right') - 1, minlength=len(faixas))
+
+
+def letalidade_por_faixa(idades_obitos, faixas, populacao, delta_medio):
+    """
+    delta_I por faixa a partir da distribuição etária dos óbitos.
+
+    delta_g é proporcional a obitos_g / populacao_g e escalado para que a
+    média ponderada pela população seja delta_medio (o delta_I do modelo
+    sem estrutura etária).
+    """
+    obitos = contar_por_faixa(idades_obitos, faixas).astype(float)
+    populacao = np.asarray(populacao, dtype=float)
+    risco = obitos / populacao
+    return delta_medio * risco * populacao.sum() / (risco * populacao).sum()
+
+
+def matriz_reciproca(C, populacao):
+    """
+    Simetriza os contatos totais: C[g, h] N_g = C[h, g] N_h (média das duas
+    estimativas), como exigido para que a matriz seja fisicamente coerente.
+    """
+    C = np.asarray(C, dtype=float)
+    N = np.asarray(populacao, dtype=float)
+    total = 0.5 * (C * N[:, None] + (C * N[:, None]).T)
+    return total / N[:, None]
+
+
+@lru_cache(maxsize=64)
+def _matriz_K(C_bytes, forma, beta, suscetibilidade):
+    C = np.frombuffer(C_bytes).reshape(forma)
+    return beta * np.asarray(suscetibilidade)[:, None] * C
+
+
+def matriz_transmissao(C, beta, suscetibilidade=None):
+    """
+    K = beta * diag(s) * C, guardada em cache para a mesma (C, beta, s).
+    Matrizes esparsas não passam pelo cache (o produto é feito em CSR).
+    """
+    G = C.shape[0]
+    s = np.ones(G) if suscetibilidade is None else np.broadcast_to(suscetibilidade, (G,))
+    if sparse.issparse(C):
+        return (sparse.diags(beta * s) @ C).tocsr()
+    C = np.ascontiguousarray(C, dtype=float)
+    return _matriz_K(C.tobytes(), C.shape, float(beta), tuple(map(float, s)))
+
+
+# =============================================================================
+# Lado direito e integração
+# =============================================================================
+
+def rhs_etario(nome, C, params, suscetibilidade=None):
+    """
+    Lado direito f(Y, t) com Y (faixas, k) para SEIARD/SEIARDC.
+
+    input:
+    C      : matriz de contatos (G, G), densa ou esparsa
+    params : dict {parametro: escalar ou array (G,)}; N é a população de
+             cada faixa e beta um escalar (probabilidade por contato)
+    suscetibilidade : array (G,) opcional, multiplica a força por faixa
+    """
+    if nome not in MODELOS:
+        raise ValueError(f'Modelo etário desconhecido: {nome}. Disponíveis: {MODELOS}')
+    comps = MODELOS_LOTE[nome][1]
+    G = C.shape[0]
+    p = dict(zip(MODELOS_LOTE[nome][2], args_lote(nome, params, G)))
+    beta = np.unique(p['beta'])
+    if beta.size != 1:
+        raise ValueError('beta deve ser escalar; use suscetibilidade para variar por faixa')
+    K = matriz_transmissao(C, beta[0], suscetibilidade)
+    espec = especificacao(nome)
+    args = tuple(p[k] for k in espec.parametros)
+    V = estequiometria(nome).astype(float)
+    origens = [comps.index(o) for o, _, _ in transicoes(nome)]
+    i_forca = espec.fluxos_forca()  # S -> E
+
+    def f(Y, t):
+        infecciosos, vivos = espec.forca_lote(Y, t, *args)
+        lam = K @ (infecciosos / vivos)
+        taxas = taxas_per_capita(nome, Y, p)
+        taxas[:, i_forca] = lam[:, None]
+        return (taxas * Y[:, origens]) @ V
+
+    return f
+
+
+def estado_inicial_etario(nome, populacao, infectados):
+    """
+    Y0 (faixas, k): S = N - I0, I = I0 (e C = I0 no SEIARDC) por faixa.
+    """
+    comps = MODELOS_LOTE[nome][1]
+    N = np.asarray(populacao, dtype=float)
+    I0 = np.broadcast_to(np.asarray(infectados, dtype=float), N.shape)
+    Y0 = np.zeros((N.size, len(comps)))
+    Y0[:, 0] = N - I0
+    Y0[:, comps.index('I')] = I0
+    if 'C' in comps:
+        Y0[:, comps.index('C')] = I0
+    return Y0
+
+
+def resolver_etario(nome, Y0, t, C, params, suscetibilidade=None, metodo='rkdp', **kws):
+    """
+    Integra o modelo etário.
+
+    input:
+    nome   : 'SEIARD' ou 'SEIARDC'
+    Y0     : estado inicial (faixas, k)
+    t      : tempos de saída
+    C      : matriz de contatos (G, G)
+    params : dict {parametro: escalar ou array (G,)}
+    metodo : 'rkdp' (rkdp_lote) ou um método do solve_ivp
+    kws    : repassados ao integrador
+
+    Output:
+    sol : array (nt, faixas, k)
+    """
+    Y0 = np.asarray(Y0, dtype=float)
+    f = rhs_etario(nome, C, params, suscetibilidade)
+    if metodo == 'rkdp':
+        return rkdp_lote(f, Y0, t, **kws)
+    forma = Y0.shape
+    sol = solve_ivp(lambda s, y: f(y.reshape(forma), s).ravel(), (t[0], t[-1]),
+                    Y0.ravel(), method=metodo, t_eval=t, **kws)
+    if sol.status != 0:
+        raise RuntimeError(f'resolver_etario({nome}, {metodo}): {sol.message}')
+    return sol.y.T.reshape((len(t),) + forma)
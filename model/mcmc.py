@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Calibração bayesiana (MCMC) dos modelos com verossimilhança vetorizada.
+
+Usa o EnsembleSampler do emcee com vectorize=True: a cada passo o conjunto
+inteiro de walkers é integrado numa única chamada de resolver_lote (um
+cenário por walker), em vez de um odeint por walker. A verossimilhança é de
+Poisson ou binomial negativa sobre os incrementos diários dos compartimentos
+observados (ex.: 'C' casos acumulados, 'D' óbitos no SEIARDC); os priors são
+uniformes em intervalos.
+
+As cadeias são gravadas em disco (pickle, escrita atômica) a cada
+'checkpoint_a_cada' passos; chamar amostrar() de novo com o mesmo arquivo
+continua de onde parou. diagnosticos() reporta tempo de autocorrelação
+integrado, amostras efetivas, taxa de aceitação e R-hat dividido.
+
+O emcee é opcional (pip install emcee); sem ele só amostrar() falha.
+
+Exemplo:
+    cal = Calibracao('SIRC', {'C': y}, priors={'beta': (0.01, 3), 'gamma': (0.01, 2)},
+                     fixos={'N': 2 * K, 'I0': I0})
+    cadeia = cal.amostrar(n_passos=2000, arquivo='sirc_pa.pkl')
+    cal.diagnosticos()
+"""
+import os
+import pickle
+import tempfile
+
+import numpy as np
+from scipy.special import gammaln
+
+from modelos_vetorizados import MODELOS_LOTE, resolver_lote
+
+try:
+    import emcee
+    EMCEE_DISPONIVEL = True
+except ImportError:  # emcee é opcional
+    EMCEE_DISPONIVEL = False
+
+VEROSSIMILHANCAS = ('poisson', 'negbin')
+
+
+def estado_inicial(nome, p):
+    """
+    Estado inicial (n, k) com I = I0, C = I0 e S = N - I0 (demais zerados).
+
+    p : dict {parametro: array (n,)} contendo N e I0
+    """
+    comps = MODELOS_LOTE[nome][1]
+    N, I0 = np.broadcast_arrays(p['N'], p['I0'])
+    Y0 = np.zeros((N.size, len(comps)))
+    Y0[:, 0] = N - I0
+    Y0[:, comps.index('I')] = I0
+    if 'C' in comps:
+        Y0[:, comps.index('C')] = I0
+    return Y0
+
+
+class Calibracao:
+    """
+    Posterior de um modelo de MODELOS_LOTE dadas séries acumuladas.
+
+    input:
+    nome            : 'SIRC', 'SEIARDC', ...
+    observados      : dict {compartimento: série acumulada}, mesmo comprimento
+    priors          : dict {parametro: (min, max)} dos parâmetros amostrados;
+                      'dispersao' (k da binomial negativa) pode ser incluído
+    fixos           : dict com os demais parâmetros (inclusive N e I0 se não
+                      forem amostrados)
+    verossimilhanca : 'poisson' ou 'negbin'
+    dispersao       : k fixo da binomial negativa, se não estiver em priors
+    kws_solver      : repassados a resolver_lote (rtol, atol, metodo, ...)
+    """
+
+    def __init__(self, nome, observados, priors, fixos=None,
+                 verossimilhanca='negbin', dispersao=10.0, kws_solver=None):
+        if verossimilhanca not in VEROSSIMILHANCAS:
+            raise ValueError(f'Verossimilhança desconhecida: {verossimilhanca}. '
+                             f'Disponíveis: {VEROSSIMILHANCAS}')
+        self.nome = nome
+        comps, pnomes = MODELOS_LOTE[nome][1:]
+        self.fixos = dict(fixos or {})
+        self.nomes = list(priors)
+        faltando = [p for p in pnomes + ('I0',) if p not in priors and p not in self.fixos]
+        if faltando:
+            raise ValueError(f'Parâmetros sem prior nem valor fixo: {faltando}')
+        for c in observados:
+            if c not in comps:
+                raise KeyError(f'{nome} não tem o compartimento {c!r}: {comps}')
+        self.limites = np.array([priors[p] for p in self.nomes], dtype=float)
+        self.observados = {c: np.asarray(v, dtype=float) for c, v in observados.items()}
+        self._idx = [comps.index(c) for c in self.observados]
+        self._diarios = np.column_stack([np.diff(v) for v in self.observados.values()])
+        self.t = np.arange(len(next(iter(self.observados.values()))), dtype=float)
+        self.verossimilhanca = verossimilhanca
+        self.dispersao = dispersao
+        self.kws_solver = dict({'rtol': 1e-5, 'atol': 1e-3}, **(kws_solver or {}))
+        self.cadeia = None
+        self.log_prob = None
+        self.sampler = None
+
+    # -------------------------------------------------------------------------
+
+    def _params(self, theta):
+        p = {k: np.full(len(theta), float(v)) for k, v in self.fixos.items()}
+        p.update(zip(self.nomes, theta.T))
+        return p
+
+    def log_posterior(self, theta):
+        """
+        Log-posterior (não normalizada) de um conjunto de walkers.
+
+        input:
+        theta : array (n_walkers, n_parametros) na ordem de self.nomes
+
+        Output:
+        array (n_walkers,), -inf fora dos priors ou onde a integração do walker
+        falhar
+        """
+        theta = np.atleast_2d(theta)
+        lp = np.full(len(theta), -np.inf)
+        dentro = np.all((theta > self.limites[:, 0]) & (theta < self.limites[:, 1]), axis=1)
+        if not dentro.any():
+            return lp
+        try:
+            lp[dentro] = self._log_verossimilhanca(theta[dentro])
+        except RuntimeError:
+            # um walker rígido (max_passos) não derruba o lote: integra um a
+            # um e só o que falhar fica com -inf
+            for i in np.flatnonzero(dentro):
+                try:
+                    lp[i] = self._log_verossimilhanca(theta[i:i + 1])[0]
+                except RuntimeError:
+                    pass
+        return lp
+
+    def _log_verossimilhanca(self, theta):
+        # log-verossimilhança de walkers dentro dos priors, num único lote
+        p = self._params(theta)
+        sol = resolver_lote(self.nome, estado_inicial(self.nome, p), self.t,
+                            {k: v for k, v in p.items() if k in MODELOS_LOTE[self.nome][2]},
+                            **self.kws_solver)
+        # incrementos diários do modelo: (nt - 1, n, n_obs)
+        mu = np.maximum(np.diff(sol[:, :, self._idx], axis=0), 1e-9)
+        x = self._diarios[:, None, :]
+        if self.verossimilhanca == 'poisson':
+            ll = x * np.log(mu) - mu - gammaln(x + 1)
+        else:
+            k = p.get('dispersao', np.full(mu.shape[1], self.dispersao))[None, :, None]
+            ll = (gammaln(x + k) - gammaln(k) - gammaln(x + 1)
+                  + k * np.log(k / (k + mu)) + x * np.log(mu / (k + mu)))
+        total = ll.sum(axis=(0, 2))
+        return np.where(np.isfinite(total), total, -np.inf)
+
+    def walkers_iniciais(self, centro, n_walkers, largura=1e-2, seed=0):
+        """
+        Walkers em uma bola relativa em torno de centro (dict), dentro dos priors.
+        """
+        rng = np.random.default_rng(seed)
+        c = np.array([centro[k] for k in self.nomes], dtype=float)
+        p0 = c * (1 + largura * rng.standard_normal((n_walkers, len(c))))
+        eps = 1e-9 * np.abs(self.limites).max(axis=1)
+        return np.clip(p0, self.limites[:, 0] + eps, self.limites[:, 1] - eps)
+
+    # -------------------------------------------------------------------------
+
+    def amostrar(self, n_passos, p0=None, n_walkers=None, arquivo=None,
+                 checkpoint_a_cada=100, ate_convergir=False, seed=0):
+        """
+        Roda o EnsembleSampler, com checkpoint e retomada em disco.
+
+        input:
+        n_passos          : passos totais desejados na cadeia (contando os já
+                            gravados em 'arquivo')
+        p0                : walkers iniciais (n_walkers, n_parametros) ou dict
+                            com o centro (ver walkers_iniciais); ignorado ao
+                            retomar
+        n_walkers         : padrão 4 * n_parametros
+        arquivo           : checkpoint (.pkl); retoma se existir
+        checkpoint_a_cada : passos entre gravações
+        ate_convergir     : para antes de n_passos quando n > 50 tau e tau
+                            variou menos de 1% desde o último checkpoint
+        seed              : semente do sampler
+
+        Output:
+        cadeia : array (passos, n_walkers, n_parametros)
+        """
+        if not EMCEE_DISPONIVEL:
+            raise ImportError('amostrar() requer o emcee (pip install emcee)')
+        ndim = len(self.nomes)
+        salvo = _ler_checkpoint(arquivo)
+        if salvo is not None:
+            if salvo['nomes'] != self.nomes:
+                raise ValueError(f'{arquivo}: parâmetros {salvo["nomes"]} != {self.nomes}')
+            cadeias, log_probs = [salvo['cadeia']], [salvo['log_prob']]
+            estado = emcee.State(salvo['cadeia'][-1], log_prob=salvo['log_prob'][-1],
+                                 random_state=salvo['random_state'])
+            n_walkers = salvo['cadeia'].shape[1]
+        else:
+            n_walkers = n_walkers or 4 * ndim
+            if p0 is None or isinstance(p0, dict):
+                centro = p0 or {k: np.mean(self.limites[i]) for i, k in enumerate(self.nomes)}
+                p0 = self.walkers_iniciais(centro, n_walkers, seed=seed)
+            cadeias, log_probs = [], []
+            estado = emcee.State(np.asarray(p0, dtype=float))
+            n_walkers = len(p0)
+
+        self.sampler = emcee.EnsembleSampler(n_walkers, ndim, self.log_posterior,
+                                             vectorize=True)
+        if salvo is None:
+            self.sampler.random_state = np.random.RandomState(seed).get_state()
+        feitos = sum(len(c) for c in cadeias)
+        tau_anterior = np.inf
+        while feitos < n_passos:
+            bloco = min(checkpoint_a_cada, n_passos - feitos)
+            self.sampler.reset()
+            estado = self.sampler.run_mcmc(estado, bloco, progress=False)
+            cadeias.append(self.sampler.get_chain())
+            log_probs.append(self.sampler.get_log_prob())
+            feitos += bloco
+            self.cadeia = np.concatenate(cadeias)
+            self.log_prob = np.concatenate(log_probs)
+            _gravar_checkpoint(arquivo, {'nomes': self.nomes, 'cadeia': self.cadeia,
+                                         'log_prob': self.log_prob,
+                                         'random_state': estado.random_state})
+            if ate_convergir:
+                tau = tempo_autocorrelacao(self.cadeia).max()
+                if feitos > 50 * tau and abs(tau_anterior - tau) < 0.01 * tau:
+                    break
+                tau_anterior = tau
+        if salvo is not None and self.cadeia is None:
+            self.cadeia = np.concatenate(cadeias)
+            self.log_prob = np.concatenate(log_probs)
+        return self.cadeia
+
+    def amostras(self, descarte=None, afinar=1):
+        """
+        Amostras achatadas {parametro: array}, descartando o aquecimento
+        (padrão: 2 tau) e afinando a cada 'afinar' passos.
+        """
+        if descarte is None:
+            descarte = int(2 * np.nanmax(tempo_autocorrelacao(self.cadeia)))
+        plano = self.cadeia[descarte::afinar].reshape(-1, len(self.nomes))
+        saida = dict(zip(self.nomes, plano.T))
+        if 'beta' in saida and 'gamma' in saida:
+            saida['R0'] = saida['beta'] / saida['gamma']
+        return saida
+
+    def diagnosticos(self, descarte=0):
+        """
+        Diagnósticos de convergência por parâmetro.
+
+        Output:
+        dict {parametro: {'tau', 'n_efetivo', 'rhat'}} e 'aceitacao' (média
+        da taxa de aceitação dos walkers no último bloco) e 'passos'
+        """
+        cadeia = self.cadeia[descarte:]
+        tau = tempo_autocorrelacao(cadeia)
+        rhat = rhat_dividido(cadeia)
+        n_total = cadeia.shape[0] * cadeia.shape[1]
+        saida = {k: {'tau': float(tau[i]), 'n_efetivo': float(n_total / tau[i]),
+                     'rhat': float(rhat[i])} for i, k in enumerate(self.nomes)}
+        if self.sampler is not None:
+            saida['aceitacao'] = float(np.mean(self.sampler.acceptance_fraction))
+        saida['passos'] = int(cadeia.shape[0])
+        return saida
+
+
+# =============================================================================
+# Diagnósticos
+# =============================================================================
+
+def tempo_autocorrelacao(cadeia, c=5.0):
+    """
+    Tempo de autocorrelação integrado por parâmetro (estimador de Goodman &
+    Weare com janela automática, média das autocorrelações dos walkers).
+
+    cadeia : array (passos, n_walkers, n_parametros)
+    """
+    n = cadeia.shape[0]
+    x = cadeia - cadeia.mean(axis=0)
+    m = 1 << (2 * n - 1).bit_length()
+    f = np.fft.rfft(x, n=m, axis=0)
+    acf = np.fft.irfft(f * np.conj(f), axis=0)[:n].mean(axis=1)
+    acf /= np.where(acf[0] > 0, acf[0], 1.0)
+    taus = 2.0 * np.cumsum(acf, axis=0) - 1.0
+    tau = np.empty(cadeia.shape[2])
+    for i in range(cadeia.shape[2]):
+        janela = np.arange(n) < c * taus[:, i]
+        w = np.argmin(janela) if not janela.all() else n - 1
+        tau[i] = max(taus[w, i], 1.0)
+    return tau
+
+
+def rhat_dividido(cadeia):
+    """
+    R-hat de Gelman-Rubin com as cadeias (walkers) divididas ao meio.
+    """
+    n = cadeia.shape[0] // 2
+    if n < 2:
+        return np.full(cadeia.shape[2], np.nan)
+    partes = np.concatenate([cadeia[:n], cadeia[n:2 * n]], axis=1)
+    W = partes.var(axis=0, ddof=1).mean(axis=0)
+    B = n * partes.mean(axis=0).var(axis=0, ddof=1)
+    var = (n - 1) / n * W + B / n
+    return np.sqrt(var / np.where(W > 0, W, np.nan))
+
+
+# =============================================================================
+# Checkpoint
+# =============================================================================
+
+def _ler_checkpoint(arquivo):
+    if arquivo is None or not os.path.exists(arquivo):
+        return None
+    with open(arquivo, 'rb') as f:
+        return pickle.load(f)
+
+
+def _gravar_checkpoint(arquivo, dados):
+    if arquivo is None:
+        return
+    diretorio = os.path.dirname(os.path.abspath(arquivo))
+    fd, tmp = tempfile.mkstemp(dir=diretorio)
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(dados, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, arquivo)
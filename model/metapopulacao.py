@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modelos metapopulacionais: vários municípios (patches) acoplados por mobilidade.
+
+Cada patch tem seus compartimentos (qualquer modelo de MODELOS_LOTE, ex.
+SEIR, SEIARD, SEIARDC) e os patches se acoplam pela matriz de mobilidade
+esparsa M (CSR), com M[i, j] a fração do tempo dos residentes de i passada
+em j (linhas somam 1, diagonal = fração que fica). A força de infecção é a
+do modelo de deslocamento diário, com os infecciosos e a população da
+força de infecção da especificação do modelo (ex. I + kappa A e N - D):
+
+    I_ef = M^T (I + kappa A)          infecciosos presentes em cada destino
+    N_ef = M^T (N - D)                população presente em cada destino
+    lambda = M (beta * I_ef / N_ef)   exposição dos residentes de cada patch
+
+São três produtos esparsos por avaliação, custo O(nnz) e não O(patches^2);
+as demais transições são as mesmas do motor estocástico (estocastico.py),
+cuja média é o lado direito de modelos_vetorizados. Com M = identidade os
+patches evoluem como modelos independentes.
+
+O estado é Y (patches, k), como em modelos_vetorizados, e rkdp_lote integra
+todos os patches juntos; métodos do solve_ivp também são aceitos (BDF e
+Radau recebem a esparsidade do jacobiano).
+
+Exemplo:
+    M = mobilidade_gravitacional(pop, coords, vizinhos=10, fracao=0.05)
+    sol = resolver_metapopulacao('SEIARDC', Y0, np.arange(366), M, params)
+    sol[:, :, -1]   # casos acumulados por município (nt, patches)
+"""
+import numpy as np
+from scipy import sparse
+from scipy.integrate import solve_ivp
+from scipy.spatial import cKDTree
+
+from especificacao import especificacao
+from estocastico import estequiometria, taxas_per_capita, transicoes
+from modelos_vetorizados import MODELOS_LOTE, args_lote, rkdp_lote
+
+
+# =============================================================================
+# Matrizes de mobilidade
+# =============================================================================
+
+def matriz_mobilidade(origens, destinos, fluxos, populacao):
+    """
+    Matriz de mobilidade (CSR) a partir de uma lista de deslocamentos diários.
+
+    input:
+    origens, destinos : índices dos patches de cada deslocamento
+    fluxos            : pessoas por dia de origem para destino
+    populacao         : população de cada patch (define o número de patches)
+
+    Output:
+    M : csr_matrix (P, P), linhas somando 1 (diagonal = quem fica)
+    """
+    populacao = np.asarray(populacao, dtype=float)
+    P = populacao.size
+    fora = np.asarray(origens) != np.asarray(destinos)
+    F = sparse.csr_matrix((np.asarray(fluxos, dtype=float)[fora],
+                           (np.asarray(origens)[fora], np.asarray(destinos)[fora])),
+                          shape=(P, P))
+    F = sparse.diags(1.0 / populacao) @ F
+    saida = np.asarray(F.sum(axis=1)).ravel()
+    if np.any(saida > 1):
+        # mais viagens que moradores: normaliza a linha para ninguém "ficar" negativo
+        F = sparse.diags(np.where(saida > 1, 1.0 / saida, 1.0)) @ F
+        saida = np.minimum(saida, 1.0)
+    return (F + sparse.diags(1.0 - saida)).tocsr()
+
+
+def mobilidade_gravitacional(populacao, coordenadas, vizinhos=10, fracao=0.05, expoente=2.0):
+    """
+    Matriz de mobilidade sintética: cada patch liga-se aos 'vizinhos' mais
+    próximos com pesos de gravidade pop_j / d^expoente, e uma 'fracao' da
+    população se desloca.
+
+    Útil quando não há matriz origem-destino; custo O(P log P) (árvore KD).
+    """
+    populacao = np.asarray(populacao, dtype=float)
+    P = populacao.size
+    k = min(vizinhos + 1, P)
+    dist, idx = cKDTree(np.asarray(coordenadas, dtype=float)).query(coordenadas, k=k)
+    dist, idx = dist[:, 1:], idx[:, 1:]
+    w = populacao[idx] / np.maximum(dist, 1e-9) ** expoente
+    w = fracao * w / w.sum(axis=1, keepdims=True)
+    origens = np.repeat(np.arange(P), k - 1)
+    return matriz_mobilidade(origens, idx.ravel(), (w * populacao[:, None]).ravel(),
+                             populacao)
+
+
+def _validar(M, P):
+    M = sparse.csr_matrix(M)
+    if M.shape != (P, P):
+        raise ValueError(f'Matriz de mobilidade {M.shape} incompatível com {P} patches')
+    if M.nnz and M.data.min() < 0:
+        raise ValueError('Matriz de mobilidade com entradas negativas')
+    soma = np.asarray(M.sum(axis=1)).ravel()
+    if not np.allclose(soma, 1.0, atol=1e-8):
+        raise ValueError('As linhas da matriz de mobilidade devem somar 1 '
+                         f'(desvio máximo {np.abs(soma - 1).max():.2e})')
+    return M
+
+
+# =============================================================================
+# Lado direito acoplado
+# =============================================================================
+
+def rhs_metapopulacao(nome, M, params):
+    """
+    Lado direito acoplado f(Y, t) com Y (patches, k).
+
+    input:
+    nome   : modelo de MODELOS_LOTE
+    M      : matriz de mobilidade (P, P) esparsa
+    params : dict {parametro: escalar ou array (P,)}; N é a população de
+             cada patch e beta a transmissão no local do contato
+    """
+    espec = especificacao(nome)
+    comps = MODELOS_LOTE[nome][1]
+    P = M.shape[0]
+    M = _validar(M, P)
+    MT = M.T.tocsr()
+    p = dict(zip(MODELOS_LOTE[nome][2], args_lote(nome, params, P)))
+    args = tuple(p[k] for k in espec.parametros)
+    beta = p[espec.forca.beta]
+    V = estequiometria(nome).astype(float)
+    origens = [comps.index(o) for o, _, _ in transicoes(nome)]
+    i_forca = espec.fluxos_forca()
+
+    def f(Y, t):
+        infecciosos, vivos = espec.forca_lote(Y, t, *args)
+        N_ef = MT @ np.broadcast_to(vivos, (P,))
+        lam = M @ (beta * (MT @ infecciosos) / np.where(N_ef > 0, N_ef, 1.0))
+        taxas = taxas_per_capita(nome, Y, p)
+        taxas[:, i_forca] = lam[:, None]
+        return (taxas * Y[:, origens]) @ V
+
+    return f
+
+
+def esparsidade_jacobiano(nome, M):
+    """
+    Padrão de não-zeros do jacobiano do sistema achatado (P * k, P * k).
+
+    Blocos cheios k x k em cada patch, mais o acoplamento M M^T das linhas
+    que recebem a força de infecção às colunas I, A e D dos outros patches.
+    """
+    espec = especificacao(nome)
+    comps = MODELOS_LOTE[nome][1]
+    k = len(comps)
+    P = M.shape[0]
+    alcance = (abs(M) @ abs(M).T).astype(bool).astype(float)
+    E = np.zeros((k, k))
+    trans = transicoes(nome)
+    linhas = set()
+    for i in espec.fluxos_forca():
+        origem, destino, acumuladores = trans[i]
+        linhas |= {comps.index(c) for c in (origem, destino) + acumuladores}
+    colunas = [comps.index(c) for c in list(espec.forca.infecciosos) + list(espec.forca.descontar)]
+    for i in linhas:
+        E[i, colunas] = 1.0
+    padrao = sparse.kron(sparse.identity(P), np.ones((k, k))) + sparse.kron(alcance, E)
+    return padrao.astype(bool).tocsr()
+
+
+def resolver_metapopulacao(nome, Y0, t, M, params, metodo='rkdp', **kws):
+    """
+    Integra o modelo metapopulacional.
+
+    input:
+    nome   : modelo de MODELOS_LOTE (SEIR, SEIARD, SEIARDC, ...)
+    Y0     : estado inicial (patches, k)
+    t      : tempos de saída
+    M      : matriz de mobilidade esparsa (P, P)
+    params : dict {parametro: escalar ou array (P,)}
+    metodo : 'rkdp' (rkdp_lote) ou um método do solve_ivp
+    kws    : repassados ao integrador (rtol, atol, ...)
+
+    Output:
+    sol : array (nt, patches, k)
+    """
+    Y0 = np.asarray(Y0, dtype=float)
+    comps = MODELOS_LOTE[nome][1]
+    if Y0.ndim != 2 or Y0.shape[1] != len(comps):
+        raise ValueError(f'{nome} espera Y0 (patches, {len(comps)}), recebeu {Y0.shape}')
+    f = rhs_metapopulacao(nome, M, params)
+    if metodo == 'rkdp':
+        return rkdp_lote(f, Y0, t, **kws)
+
+    forma = Y0.shape
+    if metodo in ('BDF', 'Radau') and 'jac_sparsity' not in kws:
+        kws['jac_sparsity'] = esparsidade_jacobiano(nome, sparse.csr_matrix(M))
+    sol = solve_ivp(lambda s, y: f(y.reshape(forma), s).ravel(), (t[0], t[-1]),
+                    Y0.ravel(), method=metodo, t_eval=t, **kws)
+    if sol.status != 0:
+        raise RuntimeError(f'resolver_metapopulacao({nome}, {metodo}): {sol.message}')
+    return sol.y.T.reshape((len(t),) + forma)
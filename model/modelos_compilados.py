@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lados direitos e jacobianos analíticos compilados (Numba) dos modelos.
+
+Os lados direitos (retornando np.ndarray) e os jacobianos J[i, j] = df_i/dy_j
+são os gerados pelas especificações declarativas (especificacao.py), com as
+mesmas equações de modelos_epidemiologicos.py. Se o Numba estiver instalado,
+rhs() e jacobiano() devolvem versões compiladas; sem Numba, as funções
+NumPy geradas, de forma transparente.
+
+Exemplo:
+    f, J = rhs('SIRC'), jacobiano('SIRC')
+    sol = odeint(f, y0, t, args=(N, beta, gamma), Dfun=J)
+"""
+from scipy.integrate import odeint, solve_ivp
+
+from especificacao import ESPECIFICACOES
+
+try:
+    from numba import njit
+    JIT_DISPONIVEL = True
+except ImportError:  # Numba é opcional
+    JIT_DISPONIVEL = False
+
+
+# =============================================================================
+# Registro (compilado quando possível)
+# =============================================================================
+
+# nome: (lado direito f(y, t, *args), jacobiano J(y, t, *args)), gerados das
+# especificações declarativas; modelos novos entram por registrar()
+_FONTES = {nome: (e.rhs, e.jacobiano) for nome, e in ESPECIFICACOES.items()}
+
+_COMPILADOS = {}
+
+
+def registrar(nome, f, J, substituir=False):
+    """
+    Registra o lado direito f(y, t, *args) -> np.ndarray e o jacobiano
+    J(y, t, *args) de um modelo; a compilação acontece no primeiro uso.
+
+    Funções definidas em arquivo (como as de Especificacao) são compiladas
+    com o cache em disco do Numba.
+    """
+    if nome in _FONTES and not substituir:
+        raise ValueError(f'Modelo {nome} já registrado (use substituir=True)')
+    _FONTES[nome] = (f, J)
+    _COMPILADOS.pop(nome, None)
+
+
+def _obter(nome):
+    if nome not in _FONTES:
+        raise ValueError(f'Modelo desconhecido: {nome}. '
+                         f'Disponíveis: {list(_FONTES)}')
+    if nome not in _COMPILADOS:
+        f, J = _FONTES[nome]
+        if JIT_DISPONIVEL:
+            _COMPILADOS[nome] = (njit(cache=True)(f), njit(cache=True)(J))
+        else:
+            _COMPILADOS[nome] = (f, J)
+    return _COMPILADOS[nome]
+
+
+def rhs(nome):
+    """
+    Lado direito f(y, t, *args) do modelo, compilado se o Numba existir.
+    """
+    return _obter(nome)[0]
+
+
+def jacobiano(nome):
+    """
+    Jacobiano analítico J(y, t, *args) do modelo, compilado se possível.
+    """
+    return _obter(nome)[1]
+
+
+def resolver(nome, y0, t, args, **kws):
+    """
+    Integra o modelo com odeint usando o jacobiano analítico (Dfun).
+
+    input:
+    nome : 'SIR', 'SEIR', ..., 'SEIARDC'
+    y0   : condição inicial
+    t    : tempos de saída
+    args : parâmetros do modelo (mesma ordem de modelos_epidemiologicos)
+    kws  : repassados ao odeint (rtol, atol, full_output, ...)
+
+    Output:
+    sol : array (nt, k) (ou (sol, infodict) se full_output=True)
+    """
+    f, J = _obter(nome)
+    return odeint(f, y0, t, args=tuple(args), Dfun=J, **kws)
+
+
+def resolver_ivp(nome, y0, t_span, args, method='LSODA', **kws):
+    """
+    Integra o modelo com solve_ivp passando o jacobiano analítico.
+
+    Útil para métodos implícitos (LSODA, BDF, Radau), que deixam de estimar
+    o jacobiano por diferenças finitas.
+    """
+    f, J = _obter(nome)
+    args = tuple(args)
+    return solve_ivp(lambda t, y: f(y, t, *args), t_span, y0, method=method,
+                     jac=lambda t, y: J(y, t, *args), **kws)
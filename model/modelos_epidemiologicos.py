@@ -158,55 +158,104 @@ def initial_SIRC(C):
     """
     Estima os parâmetros iniciais da curva logística usando 3 pontos dos dados C.
 
+    Devolve o primeiro trio viável (menor k1), como a busca original; a
+    avaliação de todos os trios é vetorizada em estimativas_SIRC.
+
     input:
     C : array-like
 
     Output:
     [K, r, A] ou None
     """
-    C = np.array(C)
-    n = len(C)
-    if n <= 5:
+    cand, _ = _trios_logisticos(np.asarray(C, dtype=float)[None, :])
+    viaveis = np.flatnonzero(np.isfinite(cand[0, :, 0]))
+    if viaveis.size == 0:
         return None
+    return list(cand[0, viaveis[0]])
 
-    for i in range(n - 5):
-        k1 = i
-        k3 = n - 1
-        k2 = (k1 + k3) // 2
-        m = k2 - k1
-
-        if m < 1 or any(np.isnan(C[[k1, k2, k3]])):
-            continue
+def _trios_logisticos(C):
+    """
+    [K, r, A] de todos os trios (k1, (k1 + n - 1)//2, n - 1), k1 = 0..n-6,
+    para cada linha de C (m, n). Trios inviáveis ficam com NaN.
 
-        C1, C2, C3 = C[k1], C[k2], C[k3]
+    Output:
+    cand : array (m, n - 5, 3)
+    k1   : array (n - 5,)
+    """
+    m_series, n = C.shape
+    if n <= 5:
+        return np.full((m_series, 0, 3), np.nan), np.arange(0)
+    k1 = np.arange(n - 5)
+    k3 = n - 1
+    k2 = (k1 + k3) // 2
+    m = k2 - k1
+    C1, C2, C3 = C[:, k1], C[:, k2], C[:, k3][:, None]
 
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
         q = C2**2 - C3 * C1
-        if q <= 0:
-            continue
         p = C1 * C2 - 2 * C1 * C3 + C2 * C3
-        if p <= 0:
-            continue
-
         K = C2 * p / q
+        razao = (C3 * (C2 - C1)) / (C1 * (C3 - C2))
+        r = np.log(razao) / m
+        A = ((C3 - C2)*(C2 - C1)/q) * razao**((k3 - m)/m)
 
-        try:
-            r = np.log((C3 * (C2 - C1)) / (C1 * (C3 - C2))) / m
-        except (ZeroDivisionError, ValueError):
-            continue
-        if r < 0:
-            continue
+    ok = (m >= 1) & (q > 0) & (p > 0) & np.isfinite(r) & (r >= 0) & (A > 0) & np.isfinite(K)
+    cand = np.stack([K, r, A], axis=-1)
+    cand[~ok] = np.nan
+    return cand, k1
 
-        try:
-            A = ((C3 - C2)*(C2 - C1)/q) * \
-                ((C3 * (C2 - C1)) / (C1 * (C3 - C2)))**((k3 - m)/m)
-        except (ZeroDivisionError, ValueError):
-            continue
-        if A <= 0:
-            continue
+def estimativas_SIRC(C, max_candidatos=None, bloco=None):
+    """
+    Todos os trios logísticos viáveis, ordenados pela qualidade do ajuste.
+
+    Avalia de uma vez todos os trios de initial_SIRC e ordena cada série pelo
+    erro relativo da logística K / (1 + A exp(-r t)) em toda a série. Aceita
+    uma série (n,) ou várias regiões de mesmo comprimento (m, n).
+
+    input:
+    C              : array (n,) ou (m, n) de casos acumulados
+    max_candidatos : quantos candidatos manter por série (None = todos)
+    bloco          : séries avaliadas por vez (padrão: ~4M pontos por bloco,
+                     limita a memória m*n^2)
+
+    Output:
+    cand : array (k, 3) ou (m, k, 3) com [K, r, A], melhor primeiro; NaN
+           onde a série tem menos de k trios viáveis
+    erro : array (k,) ou (m, k), raiz do erro quadrático médio / max(C)
+    """
+    C = np.asarray(C, dtype=float)
+    uma = C.ndim == 1
+    C = np.atleast_2d(C)
+    n = C.shape[1]
+    t = np.arange(n)
+    cand, _ = _trios_logisticos(C)
+    erro = np.full(cand.shape[:2], np.inf)
+    bloco = bloco or max(1, 2**22 // max(n * n, 1))
 
-        return [K, r, A]
+    for i in range(0, len(C), bloco):
+        c = cand[i:i + bloco]
+        K, r, A = c[..., 0:1], c[..., 1:2], c[..., 2:3]
+        with np.errstate(over='ignore', invalid='ignore'):
+            L = K / (1 + A * np.exp(-r * t))
+        # NaN nos dados fica fora da média; NaN no candidato propaga (erro inf)
+        dados = C[i:i + bloco, None, :]
+        validos = np.isfinite(dados)
+        quad = np.where(validos, (L - np.where(validos, dados, 0.0))**2, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            e = np.sqrt(quad.sum(axis=-1) / validos.sum(axis=-1))
+        escala = np.nanmax(np.abs(C[i:i + bloco]), axis=1, keepdims=True)
+        e = e / np.where(escala > 0, escala, 1.0)
+        erro[i:i + bloco] = np.where(np.isfinite(e), e, np.inf)
 
-    return None
+    ordem = np.argsort(erro, axis=1, kind='stable')
+    if max_candidatos is not None:
+        ordem = ordem[:, :max_candidatos]
+    cand = np.take_along_axis(cand, ordem[..., None], axis=1)
+    erro = np.take_along_axis(erro, ordem, axis=1)
+    cand[~np.isfinite(erro)] = np.nan
+    if uma:
+        return cand[0], erro[0]
+    return cand, erro
 
 def SIR2(y, t, params):
     S, I, R = y
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modelos epidemiologicos compartimentados em modo "lote" (vetorizado).
+
+Cada modelo recebe o estado Y com formato (n_cenarios, n_compartimentos) e
+um array (ou escalar) por parâmetro, avaliando todos os cenários de uma vez.
+Os lados direitos vêm das especificações declarativas (especificacao.py).
+Os integradores rk4_lote (passo fixo) e rkdp_lote (Dormand-Prince adaptativo)
+avançam todos os cenários juntos, sem callbacks Python por cenário.
+
+Exemplo:
+    beta = np.linspace(0.2, 0.6, 10000)
+    Y0 = np.tile([N - 1, 1, 0], (beta.size, 1))
+    SIR_lote = MODELOS_LOTE['SIR'][0]
+    sol = rkdp_lote(SIR_lote, Y0, t, args=(N, beta, gamma))  # (nt, n, 3)
+"""
+import numpy as np
+
+from especificacao import ESPECIFICACOES
+
+
+# nome: (função, compartimentos, parâmetros na ordem dos args), gerado das
+# especificações declarativas (especificacao.ESPECIFICACOES)
+MODELOS_LOTE = {nome: (e.rhs_lote, e.estado, e.parametros)
+                for nome, e in ESPECIFICACOES.items()}
+
+
+def args_lote(nome, params, n=None):
+    """
+    Monta a tupla args de um modelo a partir de um dicionário de parâmetros.
+
+    input:
+    nome   : chave em MODELOS_LOTE
+    params : dict {parametro: escalar ou array (n,)}
+    n      : número de cenários (opcional, para expandir escalares)
+
+    Output:
+    tupla de arrays na ordem esperada pela função do modelo
+    """
+    nomes = MODELOS_LOTE[nome][2]
+    faltando = [p for p in nomes if p not in params]
+    if faltando:
+        raise ValueError(f'Parâmetros ausentes para {nome}: {faltando}')
+    args = []
+    for p in nomes:
+        v = np.asarray(params[p], dtype=float)
+        if n is not None:
+            v = np.broadcast_to(v, (n,))
+        args.append(v)
+    return tuple(args)
+
+
+# =============================================================================
+# Integradores
+# =============================================================================
+
+def rk4_lote(f, Y0, t, args=(), passos=1):
+    """
+    Runge-Kutta de 4a ordem com passo fixo para todos os cenários.
+
+    input:
+    f      : modelo vetorizado f(Y, t, *args) -> dY (n, k)
+    Y0     : estado inicial (n, k)
+    t      : tempos de saída (nt,)
+    args   : parâmetros do modelo (escalares ou arrays (n,))
+    passos : subpassos RK4 entre dois tempos de saída consecutivos
+
+    Output:
+    sol : array (nt, n, k)
+    """
+    Y = np.array(Y0, dtype=float, ndmin=2)
+    t = np.asarray(t, dtype=float)
+    sol = np.empty((t.size,) + Y.shape)
+    sol[0] = Y
+    for j in range(t.size - 1):
+        h = (t[j + 1] - t[j]) / passos
+        tj = t[j]
+        for _ in range(passos):
+            k1 = f(Y, tj, *args)
+            k2 = f(Y + 0.5 * h * k1, tj + 0.5 * h, *args)
+            k3 = f(Y + 0.5 * h * k2, tj + 0.5 * h, *args)
+            k4 = f(Y + h * k3, tj + h, *args)
+            Y = Y + (h / 6.0) * (k1 + 2 * k2 + 2 * k3 + k4)
+            tj += h
+        sol[j + 1] = Y
+    return sol
+
+
+# Tabela de Butcher de Dormand-Prince 5(4)
+_DP_C = np.array([0, 1/5, 3/10, 4/5, 8/9, 1, 1])
+_DP_A = [
+    [],
+    [1/5],
+    [3/40, 9/40],
+    [44/45, -56/15, 32/9],
+    [19372/6561, -25360/2187, 64448/6561, -212/729],
+    [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+    [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84],
+]
+_DP_B = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0])
+_DP_E = _DP_B - np.array([5179/57600, 0, 7571/16695, 393/640,
+                          -92097/339200, 187/2100, 1/40])
+
+
+def rkdp_lote(f, Y0, t, args=(), rtol=1e-6, atol=1e-6, h0=None,
+              max_passos=100000, full_output=False):
+    """
+    Runge-Kutta adaptativo de Dormand-Prince 5(4) para todos os cenários.
+
+    O passo é comum ao lote e controlado pelo pior cenário (norma RMS do erro
+    local de cada linha). Os tempos de saída em t são atingidos exatamente.
+
+    input:
+    f, Y0, t, args : como em rk4_lote
+    rtol, atol     : tolerâncias relativa e absoluta
+    h0             : passo inicial (None = estimado a partir de t)
+    max_passos     : limite de passos tentados
+    full_output    : se True retorna também um dict de estatísticas
+
+    Output:
+    sol : array (nt, n, k)
+    info (opcional) : {'nfev', 'naccept', 'nreject'}
+    """
+    Y = np.array(Y0, dtype=float, ndmin=2)
+    t = np.asarray(t, dtype=float)
+    sol = np.empty((t.size,) + Y.shape)
+    sol[0] = Y
+
+    tf = t[-1]
+    h = h0 if h0 is not None else max((tf - t[0]) * 1e-3, 1e-6)
+    tc = t[0]
+    K = np.empty((7,) + Y.shape)
+    K[0] = f(Y, tc, *args)
+    nfev, naccept, nreject = 1, 0, 0
+    j = 1
+
+    while j < t.size:
+        if naccept + nreject >= max_passos:
+            raise RuntimeError(f'rkdp_lote: max_passos={max_passos} atingido '
+                               f'em t={tc:g}')
+        h = min(h, t[j] - tc)
+        for s in range(1, 7):
+            Ys = Y + h * np.tensordot(_DP_A[s], K[:s], axes=1)
+            K[s] = f(Ys, tc + _DP_C[s] * h, *args)
+        nfev += 6
+        Ynovo = Y + h * np.tensordot(_DP_B, K, axes=1)
+        erro = h * np.tensordot(_DP_E, K, axes=1)
+        escala = atol + rtol * np.maximum(np.abs(Y), np.abs(Ynovo))
+        err = np.sqrt(np.mean((erro / escala) ** 2, axis=1)).max()
+
+        if err <= 1.0:
+            tc += h
+            Y = Ynovo
+            K[0] = K[6]  # FSAL
+            naccept += 1
+            if np.isclose(tc, t[j], rtol=0, atol=1e-12 * max(1, abs(tc))):
+                tc = t[j]
+                sol[j] = Y
+                j += 1
+        else:
+            nreject += 1
+        if not np.isfinite(err):
+            fator = 0.2
+        else:
+            fator = 0.9 * err ** -0.2 if err > 0 else 5.0
+        h *= min(5.0, max(0.2, fator))
+
+    if full_output:
+        return sol, {'nfev': nfev, 'naccept': naccept, 'nreject': nreject}
+    return sol
+
+
+def resolver_lote(nome, Y0, t, params, metodo='rkdp', **kws):
+    """
+    Integra um modelo de MODELOS_LOTE para todos os cenários.
+
+    input:
+    nome   : 'SIR', 'SEIR', ..., 'SEIARDC'
+    Y0     : estado inicial (n, k) ou (k,) (replicado para n cenários)
+    t      : tempos de saída
+    params : dict {parametro: escalar ou array (n,)}
+    metodo : 'rkdp' (adaptativo) ou 'rk4' (passo fixo)
+    kws    : repassados ao integrador (rtol, atol, passos, ...)
+
+    Output:
+    sol : array (nt, n, k)
+    """
+    f, comps, _ = MODELOS_LOTE[nome]
+    n = max([np.size(v) for v in params.values()] + [1])
+    Y0 = np.asarray(Y0, dtype=float)
+    if Y0.ndim == 1:
+        Y0 = np.tile(Y0, (n, 1))
+    if Y0.shape[1] != len(comps):
+        raise ValueError(f'{nome} espera {len(comps)} compartimentos, '
+                         f'recebeu {Y0.shape[1]}')
+    args = args_lote(nome, params, Y0.shape[0])
+    if metodo == 'rk4':
+        return rk4_lote(f, Y0, t, args, **kws)
+    if metodo == 'rkdp':
+        return rkdp_lote(f, Y0, t, args, **kws)
+    raise ValueError(f'Método desconhecido: {metodo}')
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Avaliação rápida do modelo SIRC2 (casos acumulados C(t)) por quadratura.
+
+O SIRC2 é uma EDO autônoma em C:
+
+    dc/dt = (1 - c) * phi(c),   phi(c) = beta*c + gamma*log((1 - c)/(1 - c0))
+
+com c = C/N e c0 = Io/N. Logo t(c) = int dc / ((1 - c) phi(c)) pode ser
+calculado uma única vez por quadratura e invertido por interpolação,
+dando C(t) para todo o vetor de tempos em uma passada NumPy, sem odeint.
+
+A integral é feita na variável s da logística
+
+    c(s) = c_inf / (1 + A exp(-s)),   A = (c_inf - c0)/c0,
+
+onde c_inf é a raiz de phi (tamanho final da epidemia). Nessa variável o
+integrando dt/ds é suave e limitado tanto na fase exponencial (c ~ c0)
+quanto perto do platô (c ~ c_inf), e a cauda tem forma fechada. A raiz é
+obtida em x = 1 - c_inf na escala log, o que mantém R0 alto estável.
+
+As sensibilidades dC/dp saem da mesma tabela, derivando t(c) em relação
+a p com c fixo (ver sens_SIRC2): bastam mais três integrais acumuladas nos
+mesmos nós, sem odeint e sem tabelas perturbadas.
+
+Reaproveitamento entre parâmetros: o que é comum a todos os conjuntos é a
+malha u em [0, 1] (_malha_u), escalada para cada tabela. As tabelas em si
+ficam num LRU com chave nos parâmetros exatos, que só acerta em
+reavaliações do mesmo ponto (objetivo e gradiente, previsão após o ajuste).
+Parâmetros vizinhos não compartilham tabela de propósito: arredondar a
+chave tornaria C(t) constante por partes nos parâmetros e quebraria a
+consistência entre objetivo e gradiente nos otimizadores.
+"""
+from functools import lru_cache
+
+import numpy as np
+from scipy.integrate import cumulative_simpson
+from scipy.optimize import brentq
+
+# quando (c_inf - c)/c_inf fica abaixo deste valor o integrando é trocado
+# pelo seu limite (evita cancelamento numérico em phi(c) perto da raiz)
+_EPS_LIMITE = 1e-8
+
+
+@lru_cache(maxsize=8)
+def _malha_u(n):
+    """
+    Malha uniforme em [0, 1] (independente dos parâmetros, reaproveitada).
+    """
+    u = np.linspace(0.0, 1.0, n)
+    u.flags.writeable = False
+    return u
+
+
+@lru_cache(maxsize=256)
+def tabela_SIRC2(N, beta, gamma, Io, n=2001, cauda=30.0):
+    """
+    Tabela t(s) do SIRC2 para um conjunto de parâmetros (com cache LRU na
+    chave exata dos parâmetros; conjuntos vizinhos não a compartilham).
+
+    Output:
+    s_nos : nós da malha em s (0 ... log(A) + cauda)
+    t_nos : tempos t(s) nesses nós
+    c_inf : fração final de casos acumulados (raiz de phi)
+    A     : (c_inf - c0)/c0
+    x_inf : 1 - c_inf (calculado sem cancelamento)
+    h_inf : dt/ds assintótico (usado para extrapolar além de t_nos[-1])
+    """
+    c0 = Io / N
+    l0 = np.log1p(-c0)
+    # phi em y = log(1 - c): F(y) = beta (1 - e^y) + gamma (y - log(1 - c0))
+    F = lambda y: beta * (1 - np.exp(y)) + gamma * (y - l0)
+    y_inf = brentq(F, l0 - beta / gamma - 1.0, l0, xtol=1e-14)
+    x_inf = np.exp(y_inf)
+    c_inf = -np.expm1(y_inf)
+    A = max((c_inf - c0) / c0, 1e-300)
+    h_inf = 1.0 / (gamma - beta * x_inf)
+
+    s = _malha_u(n) * (max(np.log(A), 0.0) + cauda)
+    a = A * np.exp(-s)
+    c = c_inf / (1 + a)
+    um_c = (x_inf + a) / (1 + a)          # 1 - c
+    phi = beta * c + gamma * (np.log(um_c) - l0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        h = c * a / ((1 + a) * um_c * phi)
+    h = np.where(a / (1 + a) > _EPS_LIMITE, h, h_inf)
+    t_nos = cumulative_simpson(h, x=s, initial=0.0)
+    s.flags.writeable = False
+    t_nos.flags.writeable = False
+    return s, t_nos, c_inf, A, x_inf, h_inf
+
+
+def C_SIRC2(t, N, beta, gamma, Io, n=2001):
+    """
+    Casos acumulados C(t) do SIRC2 sem integração passo a passo.
+
+    Equivalente a odeint(SIRC2, Io, t, args=(N, beta, gamma, Io)) para t >= 0.
+
+    input:
+    t                   : tempos (array-like, t >= 0)
+    N, beta, gamma, Io  : parâmetros do modelo (mesma ordem do SIRC2)
+    n                   : número de nós da malha de quadratura
+
+    Output:
+    C : array com o mesmo formato de t
+    """
+    s_nos, t_nos, c_inf, A, _, h_inf = tabela_SIRC2(
+        float(N), float(beta), float(gamma), float(Io), n)
+    t = np.asarray(t, dtype=float)
+    s = np.interp(t, t_nos, s_nos)
+    # cauda em forma fechada: ds/dt -> 1/h_inf
+    s = np.where(t > t_nos[-1], s_nos[-1] + (t - t_nos[-1]) / h_inf, s)
+    return N * c_inf / (1 + A * np.exp(-s))
+
+
+
+def sens_SIRC2(t, N, beta, gamma, Io, n=2001):
+    """
+    C(t) do SIRC2 e as sensibilidades dC/dp, p = (N, beta, gamma, Io).
+
+    Derivando t = int_{c0}^{c} dc / ((1 - c) phi) com t fixo:
+
+        dc/dq  = c'(t) * int phi_q / phi dt,        q = beta, gamma
+        dc/dc0 = c'(t) * (1/((1 - c0) beta c0) + gamma/(1 - c0) int dt / phi)
+
+    com phi_beta = c e phi_gamma = log((1 - c)/(1 - c0)). As integrais são
+    acumuladas nos nós da tabela; dt/phi = h^2 (1 + a)(1 - c)/(c a) em s
+    continua finito perto do platô, onde phi -> 0.
+
+    input:
+    t                   : tempos (array-like, t >= 0)
+    N, beta, gamma, Io  : parâmetros do modelo (mesma ordem do SIRC2)
+    n                   : número de nós da malha de quadratura
+
+    Output:
+    C : array com o mesmo formato de t (igual a C_SIRC2)
+    S : array (..., 4) com dC/dN, dC/dbeta, dC/dgamma, dC/dIo
+    """
+    N, beta, gamma, Io = float(N), float(beta), float(gamma), float(Io)
+    s_nos, t_nos, c_inf, A, x_inf, h_inf = tabela_SIRC2(N, beta, gamma, Io, n)
+    c0 = Io / N
+    l0 = np.log1p(-c0)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        a = A * np.exp(-s_nos)
+        c = c_inf / (1 + a)
+        um_c = (x_inf + a) / (1 + a)
+        L = np.log(um_c) - l0
+        h = c * a / ((1 + a) * um_c * (beta * c + gamma * L))
+        h = np.where(a / (1 + a) > _EPS_LIMITE, h, h_inf)
+        q = h * h * (1 + a) * um_c / (c * a)          # dt/ds / phi
+        K0 = cumulative_simpson(q, x=s_nos, initial=0.0)
+        K1 = cumulative_simpson(c * q, x=s_nos, initial=0.0)
+        K2 = cumulative_simpson(L * q, x=s_nos, initial=0.0)
+
+        C = C_SIRC2(t, N, beta, gamma, Io, n)
+        t = np.asarray(t, dtype=float)
+        # além da tabela as sensibilidades já estão no valor do platô
+        s = np.interp(t, t_nos, s_nos)
+        a = A * np.exp(-s)
+        c = c_inf / (1 + a)
+        dcdt = c * a / ((1 + a) * np.interp(s, s_nos, h))
+        dc0 = dcdt * (1 / ((1 - c0) * beta * c0) + gamma / (1 - c0) * np.interp(s, s_nos, K0))
+        S = np.stack([c - c0 * dc0,
+                      N * dcdt * np.interp(s, s_nos, K1),
+                      N * dcdt * np.interp(s, s_nos, K2),
+                      dc0], axis=-1)
+    return C, S
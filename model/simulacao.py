@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Camada única de simulação dos modelos, com perfis de tolerância e
+detecção de rigidez.
+
+simular() escolhe método e tolerâncias a partir de um perfil nomeado
+('fit-fast', 'report-accurate', ...). Antes de integrar, estima a rigidez
+pelo espectro do jacobiano analítico no estado inicial (sem integração
+prévia): se for rígido, usa direto o método implícito do perfil. A rigidez
+que só aparece adiante na trajetória é pega pelo orçamento: o método
+explícito é interrompido assim que passa de max_nfev avaliações (ou se
+falhar) e a integração é refeita com o método implícito. Um método pedido
+explicitamente é sempre respeitado. O info retornado traz a contagem de
+passos e avaliações de cada chamada.
+
+Exemplo:
+    Y, info = simular('SIRC', [N - I0, I0, 0, I0], t,
+                      {'N': N, 'beta': 0.5, 'gamma': 0.1}, perfil='fit-fast')
+    info['metodo'], info['n_passos'], info['nfev']
+"""
+import numpy as np
+from scipy.integrate import solve_ivp
+
+from modelos_compilados import rhs, jacobiano
+from modelos_vetorizados import MODELOS_LOTE
+
+# atol_rel é relativo à população N (atol = atol_rel * N); max_nfev é o
+# orçamento de avaliações do método explícito antes da troca pelo implícito
+PERFIS = {
+    'fit-fast': {'metodo': 'RK45', 'metodo_rigido': 'LSODA',
+                 'rtol': 1e-4, 'atol_rel': 1e-9, 'max_nfev': 20000},
+    'fit-robusto': {'metodo': 'LSODA', 'metodo_rigido': 'BDF',
+                    'rtol': 1e-6, 'atol_rel': 1e-10, 'max_nfev': 50000},
+    'report-accurate': {'metodo': 'DOP853', 'metodo_rigido': 'LSODA',
+                        'rtol': 1e-9, 'atol_rel': 1e-12, 'max_nfev': 200000},
+}
+
+METODOS_IMPLICITOS = ('Radau', 'BDF', 'LSODA')
+
+# razão rigidez * horizonte acima da qual o explícito é evitado
+LIMITE_RIGIDEZ = 2000.0
+
+
+class _OrcamentoEsgotado(Exception):
+    pass
+
+
+def indice_rigidez(nome, y0, t_span, args, n_amostras=1):
+    """
+    Estimativa da rigidez do problema.
+
+    Usa max |Re(lambda)| do jacobiano analítico vezes o horizonte, avaliado
+    em y0 e, com n_amostras > 1, em pontos de uma integração grosseira (uma
+    integração extra; simular() usa só y0). Valores altos indicam que um
+    método explícito ficaria limitado pela estabilidade e não pela precisão
+    (ex.: N grande com I0 pequeno e taxas altas).
+    """
+    f, J = rhs(nome), jacobiano(nome)
+    horizonte = t_span[1] - t_span[0]
+    pontos = [np.asarray(y0, dtype=float)]
+    if n_amostras > 1:
+        grosso = solve_ivp(lambda s, y: f(y, s, *args), t_span, y0, method='LSODA',
+                           rtol=1e-3, t_eval=np.linspace(*t_span, n_amostras))
+        pontos += list(grosso.y.T[1:])
+    lam = max(np.abs(np.linalg.eigvals(J(y, t_span[0], *args)).real).max()
+              for y in pontos)
+    return lam * horizonte
+
+
+def simular(nome, y0, t, params, perfil='fit-fast', metodo=None, **kws):
+    """
+    Integra um modelo escolhendo método e tolerâncias pelo perfil.
+
+    input:
+    nome   : 'SIR', 'SEIR', ..., 'SEIARDC'
+    y0     : condição inicial
+    t      : tempos de saída
+    params : dict {parametro: valor}
+    perfil : chave de PERFIS
+    metodo : força um método do solve_ivp (sem detecção de rigidez, sem
+             orçamento e sem troca de método; falhas viram RuntimeError)
+    kws    : sobrescrevem rtol/atol/max_step do perfil
+
+    Output:
+    Y    : array (nt, k), como o odeint
+    info : dict com metodo, rigido, indice_rigidez, n_passos, nfev, njev, nlu,
+           trocou_metodo (True se o explícito falhou ou estourou max_nfev
+           e foi refeito com o implícito)
+    """
+    if perfil not in PERFIS:
+        raise ValueError(f'Perfil desconhecido: {perfil}. Disponíveis: {list(PERFIS)}')
+    cfg = PERFIS[perfil]
+    _, _, pnomes = MODELOS_LOTE[nome]
+    args = tuple(float(params[p]) for p in pnomes)
+    t = np.asarray(t, dtype=float)
+    t_span = (t[0], t[-1])
+    y0 = np.asarray(y0, dtype=float)
+
+    opcoes = {'rtol': cfg['rtol'], 'atol': cfg['atol_rel'] * params['N']}
+    opcoes.update(kws)
+
+    rigidez = None
+    automatico = metodo is None
+    if automatico:
+        rigidez = indice_rigidez(nome, y0, t_span, args)
+        rigido = rigidez > LIMITE_RIGIDEZ
+        metodo = cfg['metodo_rigido'] if rigido else cfg['metodo']
+    else:
+        rigido = metodo in METODOS_IMPLICITOS
+
+    trocou = False
+    if automatico and not rigido:
+        sol = _integrar(nome, y0, t, t_span, args, metodo, opcoes, cfg['max_nfev'])
+        if sol is None or sol.status != 0:
+            metodo, trocou = cfg['metodo_rigido'], True
+    if not automatico or rigido or trocou:
+        sol = _integrar(nome, y0, t, t_span, args, metodo, opcoes)
+    if sol.status != 0:
+        raise RuntimeError(f'simular({nome}, {metodo}): {sol.message}')
+
+    info = {'metodo': metodo, 'perfil': perfil, 'rigido': rigido or trocou,
+            'indice_rigidez': rigidez, 'trocou_metodo': trocou,
+            'n_passos': len(sol.sol.ts) - 1, 'nfev': int(sol.nfev),
+            'njev': int(sol.njev), 'nlu': int(sol.nlu), 'solucao': sol}
+    return sol.y.T, info
+
+
+def _integrar(nome, y0, t, t_span, args, metodo, opcoes, max_nfev=None):
+    """
+    solve_ivp com o RHS compilado; com max_nfev, interrompe a integração na
+    avaliação que estoura o orçamento e devolve None.
+    """
+    f = rhs(nome)
+    kws = dict(opcoes)
+    if metodo in METODOS_IMPLICITOS:
+        J = jacobiano(nome)
+        kws['jac'] = lambda s, y: J(y, s, *args)
+    if max_nfev is None:
+        fun = lambda s, y: f(y, s, *args)
+    else:
+        nfev = [0]
+
+        def fun(s, y):
+            nfev[0] += 1
+            if nfev[0] > max_nfev:
+                raise _OrcamentoEsgotado
+            return f(y, s, *args)
+    try:
+        return solve_ivp(fun, t_span, y0, method=metodo, t_eval=t, dense_output=True, **kws)
+    except _OrcamentoEsgotado:
+        return None
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Trajetórias com saída densa: integra uma vez, amostra em qualquer malha.
+
+Trajetoria guarda o interpolante contínuo (dense_output do solve_ivp) de
+uma integração feita por simular(). Ajuste, previsão e gráficos amostram a
+mesma solução em malhas diferentes, sem reintegrar e sem descasamento
+entre as malhas. Compartimentos são materializados só quando pedidos (e
+guardados por malha); a derivada vem do lado direito do modelo aplicado ao
+estado interpolado. Pedir tempos além do fim estende a integração a partir
+do último estado, em vez de refazer tudo.
+
+Exemplo:
+    traj = Trajetoria('SIRC', [N - I0, I0, 0, I0],
+                      {'N': N, 'beta': 0.5, 'gamma': 0.1}, t_fim=len(y) + 60)
+    ajuste = traj['C', np.arange(len(y))]
+    diarios = traj.incidencia(np.arange(1, len(y) + 60))
+    taxa = traj.derivada(np.linspace(0, 100, 1000), 'C')
+"""
+import numpy as np
+
+from modelos_compilados import rhs
+from modelos_vetorizados import MODELOS_LOTE
+from simulacao import simular
+
+
+class Trajetoria:
+    """
+    Solução contínua de um modelo em [t_ini, t_fim].
+
+    input:
+    nome   : 'SIR', 'SEIR', ..., 'SEIARDC'
+    y0     : condição inicial em t_ini
+    params : dict {parametro: valor}
+    t_fim  : fim do intervalo integrado
+    t_ini  : início do intervalo
+    perfil : perfil de simular() (padrão 'report-accurate': a mesma
+             trajetória serve ao ajuste e à previsão)
+    kws    : repassados a simular()
+    """
+
+    def __init__(self, nome, y0, params, t_fim, t_ini=0.0, perfil='report-accurate', **kws):
+        _, comps, pnomes = MODELOS_LOTE[nome]
+        self.nome = nome
+        self.compartimentos = comps
+        self.params = dict(params)
+        self.perfil = perfil
+        self._kws = kws
+        self._args = tuple(float(params[p]) for p in pnomes)
+        self._segmentos = []  # (t_ini, t_fim, OdeSolution) em ordem
+        self._cache = {}
+        self.info = []
+        self._integrar(np.asarray(y0, dtype=float), float(t_ini), float(t_fim))
+
+    @property
+    def t_ini(self):
+        return self._segmentos[0][0]
+
+    @property
+    def t_fim(self):
+        return self._segmentos[-1][1]
+
+    def _integrar(self, y0, t_ini, t_fim):
+        _, info = simular(self.nome, y0, [t_ini, t_fim], self.params,
+                          perfil=self.perfil, **self._kws)
+        self._segmentos.append((t_ini, t_fim, info.pop('solucao').sol))
+        self.info.append(info)
+
+    def estender(self, t_fim):
+        """
+        Continua a integração do último estado até t_fim.
+        """
+        if t_fim > self.t_fim:
+            self._integrar(self(self.t_fim)[0], self.t_fim, float(t_fim))
+            self._cache.clear()
+
+    def __call__(self, t):
+        """
+        Estado interpolado nos tempos t.
+
+        Output:
+        array (nt, k), como o odeint
+        """
+        t = np.atleast_1d(np.asarray(t, dtype=float))
+        if t.min() < self.t_ini:
+            raise ValueError(f'Trajetoria começa em t={self.t_ini}; pedido t={t.min()}')
+        self.estender(t.max())
+        Y = np.empty((len(t), len(self.compartimentos)))
+        fins = np.array([fim for _, fim, _ in self._segmentos])
+        idx = np.minimum(np.searchsorted(fins, t), len(fins) - 1)
+        for i in np.unique(idx):
+            m = idx == i
+            Y[m] = self._segmentos[i][2](t[m]).T
+        return Y
+
+    def compartimento(self, c, t):
+        """
+        Um compartimento ('S', 'I', 'C', ...) nos tempos t, guardado por malha.
+        """
+        t = np.atleast_1d(np.asarray(t, dtype=float))
+        if c not in self.compartimentos:
+            raise KeyError(f'{self.nome} não tem o compartimento {c!r}: {self.compartimentos}')
+        chave = (c, t.tobytes())
+        if chave not in self._cache:
+            self._cache[chave] = self(t)[:, self.compartimentos.index(c)]
+        return self._cache[chave]
+
+    def __getitem__(self, chave):
+        c, t = chave
+        return self.compartimento(c, t)
+
+    def derivada(self, t, c=None):
+        """
+        Derivada temporal exata (lado direito do modelo no estado interpolado).
+
+        Com c, só a coluna do compartimento; em 'C' é a incidência instantânea.
+        """
+        f = rhs(self.nome)
+        t = np.atleast_1d(np.asarray(t, dtype=float))
+        dY = np.array([f(y, s, *self._args) for s, y in zip(t, self(t))])
+        return dY if c is None else dY[:, self.compartimentos.index(c)]
+
+    def incidencia(self, t, c='C'):
+        """
+        Incidência no dia que termina em t: c(t) - c(t - 1).
+        """
+        t = np.atleast_1d(np.asarray(t, dtype=float))
+        return self.compartimento(c, t) - self.compartimento(c, t - 1)
+
+    @property
+    def n_passos(self):
+        return sum(info['n_passos'] for info in self.info)
+
+
+def trajetoria_SIRC(N, beta, gamma, I0, t_fim, **kws):
+    """
+    Trajetoria do SIRC com S0 = N - I0, R0 = 0 e C0 = I0 (como solve_sirc).
+    """
+    return Trajetoria('SIRC', [N - I0, I0, 0.0, I0],
+                      {'N': N, 'beta': beta, 'gamma': gamma}, t_fim, **kws)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Varredura de cenários: grades de parâmetros resolvidas em lote, com o
+resultado num cubo (cenário x tempo x compartimento) mapeado em memória.
+
+varrer() divide os cenários em blocos; cada processo resolve um bloco com
+resolver_lote (todos os cenários do bloco de uma vez) e escreve direto na
+sua fatia do cubo, um np.memmap em formato .npy. Nenhum array volta pelo
+pool: os processos devolvem só contadores. Sem 'arquivo', o cubo fica num
+arquivo temporário em /dev/shm (memória compartilhada) quando disponível.
+
+O cubo pode passar da memória RAM; as métricas (final, pico, dia do pico)
+são calculadas em blocos. Os parâmetros de cada cenário são gravados ao
+lado do cubo (<arquivo>.params.npz) e abrir_varredura() reabre os dois.
+
+Exemplo:
+    g = grade(beta=np.linspace(0.2, 0.8, 100), kappa=[0.25, 0.5, 0.75],
+              rho=np.linspace(0.1, 0.6, 50), delta_I=[0.005, 0.01, 0.02])
+    with varrer('SEIARDC', None, np.arange(366), fixos, g, max_workers=8) as res:
+        obitos = res.metrica('D', 'final')
+"""
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.stats import qmc
+
+from modelos_vetorizados import MODELOS_LOTE, resolver_lote
+
+
+# =============================================================================
+# Grades
+# =============================================================================
+
+def grade(**faixas):
+    """
+    Produto cartesiano dos valores de cada parâmetro.
+
+    Output:
+    dict {parametro: array (n_cenarios,)}
+    """
+    nomes = list(faixas)
+    valores = [np.atleast_1d(np.asarray(faixas[k], dtype=float)) for k in nomes]
+    malha = np.meshgrid(*valores, indexing='ij')
+    return {k: m.ravel() for k, m in zip(nomes, malha)}
+
+
+def amostra_lhs(limites, n, seed=0, log=()):
+    """
+    n cenários por hipercubo latino dentro de limites {parametro: (min, max)};
+    os parâmetros em 'log' são amostrados em escala logarítmica.
+    """
+    nomes = list(limites)
+    lo = np.array([limites[k][0] for k in nomes], dtype=float)
+    hi = np.array([limites[k][1] for k in nomes], dtype=float)
+    em_log = np.array([k in log for k in nomes])
+    lo[em_log], hi[em_log] = np.log(lo[em_log]), np.log(hi[em_log])
+    x = qmc.scale(qmc.LatinHypercube(d=len(nomes), seed=seed).random(n), lo, hi)
+    x[:, em_log] = np.exp(x[:, em_log])
+    return dict(zip(nomes, x.T))
+
+
+# =============================================================================
+# Resultado
+# =============================================================================
+
+class ResultadoVarredura:
+    """
+    Cubo de uma varredura e os parâmetros de cada cenário.
+
+    cubo           : np.memmap (n_cenarios, nt, k)
+    params         : dict {parametro: array (n_cenarios,)}
+    t              : tempos
+    compartimentos : nomes das colunas
+    """
+
+    def __init__(self, arquivo, cubo, params, t, compartimentos, temporario=False):
+        self.arquivo = arquivo
+        self.cubo = cubo
+        self.params = params
+        self.t = t
+        self.compartimentos = tuple(compartimentos)
+        self.temporario = temporario
+
+    def __len__(self):
+        return self.cubo.shape[0]
+
+    def serie(self, comp):
+        """
+        Vista (n_cenarios, nt) de um compartimento (sem copiar).
+        """
+        return self.cubo[:, :, self.compartimentos.index(comp)]
+
+    def metrica(self, comp, tipo='final', bloco=4096):
+        """
+        'final', 'pico' ou 'dia_pico' de um compartimento, por cenário,
+        calculado em blocos de cenários.
+        """
+        funcoes = {'final': lambda x: x[:, -1],
+                   'pico': lambda x: x.max(axis=1),
+                   'dia_pico': lambda x: self.t[np.argmax(x, axis=1)]}
+        if tipo not in funcoes:
+            raise ValueError(f'Métrica desconhecida: {tipo}. Disponíveis: {list(funcoes)}')
+        c = self.compartimentos.index(comp)
+        saida = np.empty(len(self))
+        for i in range(0, len(self), bloco):
+            saida[i:i + bloco] = funcoes[tipo](np.asarray(self.cubo[i:i + bloco, :, c]))
+        return saida
+
+    def fechar(self):
+        """
+        Fecha o mapeamento e apaga o cubo se ele for temporário.
+        """
+        mm = getattr(self.cubo, '_mmap', None)
+        self.cubo = None
+        if mm is not None:
+            mm.close()
+        if self.temporario:
+            for caminho in (self.arquivo, self.arquivo + '.params.npz'):
+                try:
+                    os.remove(caminho)
+                except OSError:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def abrir_varredura(arquivo, modo='r'):
+    """
+    Reabre um cubo gravado por varrer(arquivo=...) sem carregá-lo na memória.
+    """
+    cubo = np.load(arquivo, mmap_mode=modo)
+    meta = np.load(arquivo + '.params.npz', allow_pickle=False)
+    params = {k[2:]: meta[k] for k in meta.files if k.startswith('p_')}
+    return ResultadoVarredura(arquivo, cubo, params, meta['t'], meta['compartimentos'].tolist())
+
+
+# =============================================================================
+# Varredura
+# =============================================================================
+
+def _estado_inicial(nome, y0, p, n):
+    if y0 is not None:
+        y0 = np.asarray(y0, dtype=float)
+        return np.broadcast_to(y0, (n, y0.shape[-1]))
+    comps = MODELOS_LOTE[nome][1]
+    N, I0 = np.broadcast_to(p['N'], (n,)), np.broadcast_to(p['I0'], (n,))
+    Y0 = np.zeros((n, len(comps)))
+    Y0[:, 0] = N - I0
+    Y0[:, comps.index('I')] = I0
+    if 'C' in comps:
+        Y0[:, comps.index('C')] = I0
+    return Y0
+
+
+def _resolver_bloco(tarefa):
+    """
+    Resolve os cenários [ini, fim) e escreve na fatia do cubo em disco.
+    """
+    nome, y0, t, fixos, fatia, ini, fim, arquivo, metodo, kws = tarefa
+    p = dict(fixos)
+    p.update(fatia)
+    n = fim - ini
+    pm = {k: v for k, v in p.items() if k in MODELOS_LOTE[nome][2]}
+    cubo = np.load(arquivo, mmap_mode='r+')
+    try:
+        sol = resolver_lote(nome, _estado_inicial(nome, y0, p, n), t, pm, metodo=metodo, **kws)
+        cubo[ini:fim] = np.transpose(sol, (1, 0, 2))
+        erro = None
+    except (RuntimeError, FloatingPointError) as e:
+        cubo[ini:fim] = np.nan
+        erro = f'{type(e).__name__}: {e}'
+    cubo.flush()
+    del cubo
+    return ini, fim, erro
+
+
+def varrer(nome, y0, t, fixos, params, arquivo=None, max_workers=None,
+           tamanho_bloco=1024, metodo='rkdp', dtype=np.float32, **kws):
+    """
+    Resolve todos os cenários de uma grade e grava o cubo em disco/memória.
+
+    input:
+    nome          : modelo de MODELOS_LOTE
+    y0            : estado inicial comum (k,), ou None para S = N - I0,
+                    I = C = I0 com N e I0 de fixos/params
+    t             : tempos de saída
+    fixos         : dict de parâmetros comuns a todos os cenários
+    params        : dict {parametro: array (n_cenarios,)} (ver grade/amostra_lhs)
+    arquivo       : caminho .npy do cubo (None = temporário em /dev/shm)
+    max_workers   : processos (None = os.cpu_count(); 1 = no processo atual)
+    tamanho_bloco : cenários resolvidos juntos por tarefa
+    metodo, kws   : repassados a resolver_lote
+    dtype         : tipo do cubo (float32 reduz o cubo à metade)
+
+    Output:
+    ResultadoVarredura (use fechar() ou 'with' para liberar temporários);
+    o atributo erros lista os blocos que falharam (preenchidos com NaN)
+    """
+    params = {k: np.asarray(v, dtype=float) for k, v in params.items()}
+    tamanhos = {v.size for v in params.values()}
+    if len(tamanhos) != 1:
+        raise ValueError(f'Os arrays de params têm tamanhos diferentes: {sorted(tamanhos)}')
+    n = tamanhos.pop()
+    comps = MODELOS_LOTE[nome][1]
+    t = np.asarray(t, dtype=float)
+
+    temporario = arquivo is None
+    if temporario:
+        base = '/dev/shm' if os.path.isdir('/dev/shm') else None
+        fd, arquivo = tempfile.mkstemp(prefix=f'varredura_{nome}_', suffix='.npy', dir=base)
+        os.close(fd)
+    cubo = np.lib.format.open_memmap(arquivo, mode='w+', dtype=dtype,
+                                     shape=(n, t.size, len(comps)))
+    np.savez(arquivo + '.params.npz', t=t, compartimentos=np.array(comps),
+             **{f'p_{k}': v for k, v in params.items()})
+    del cubo
+
+    # cada tarefa leva só a sua fatia dos parâmetros
+    tarefas = [(nome, y0, t, fixos, {k: v[i:i + tamanho_bloco] for k, v in params.items()},
+                i, min(i + tamanho_bloco, n), arquivo, metodo, kws)
+               for i in range(0, n, tamanho_bloco)]
+    if max_workers == 1:
+        feitos = [_resolver_bloco(tarefa) for tarefa in tarefas]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+            feitos = list(pool.map(_resolver_bloco, tarefas))
+
+    res = ResultadoVarredura(arquivo, np.load(arquivo, mmap_mode='r'), params, t, comps,
+                             temporario=temporario)
+    res.erros = [(ini, fim, erro) for ini, fim, erro in feitos if erro]
+    return res
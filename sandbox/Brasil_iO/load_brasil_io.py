@@ -4,39 +4,164 @@
 Created on Mon Jun  8 17:11:59 2020
 função para leitura dos dados covid19 disponibilizado pelo
 portal Brasil IO para uma cidade ou estado.
-Para
+
+A leitura segue a paginação da API ('next'), reaproveita uma sessão HTTP
+com pool de conexões e decodifica cada página direto para arrays colunares
+pré-alocados. Com cache_dir, a série fica salva localmente (com o ETag da
+resposta): execuções seguintes mandam If-None-Match e, havendo dados novos,
+baixam só as páginas até a última data já conhecida menos uma janela de
+revisão (revisao dias), que substitui a cauda do cache: correções que a API
+publica para dias recentes entram na série.
+
+base_url pode apontar para um servidor HTTP local (testes).
 
 @author: akel
 
 """
-import requests
+import hashlib
+import os
+
 import numpy as np
+import requests
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+URL_BASE = 'https://brasil.io/api/dataset/covid19/caso_full/data'
+CAMPOS = ['last_available_confirmed', 'last_available_deaths', 'new_confirmed',
+          'new_deaths', 'last_available_confirmed_per_100k_inhabitants']
+
+_sessao = None
+
+
+def sessao():
+    """
+    Sessão HTTP compartilhada (pool de conexões + novas tentativas).
+    """
+    global _sessao
+    if _sessao is None:
+        _sessao = requests.Session()
+        retry = Retry(total=5, backoff_factor=0.5,
+                      status_forcelist=(429, 500, 502, 503, 504))
+        adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=16,
+                                max_retries=retry)
+        _sessao.mount('http://', adaptador)
+        _sessao.mount('https://', adaptador)
+    return _sessao
+
+
+def _arquivo_cache(cache_dir, cidade, estado, base_url):
+    nome = 'estado' if cidade == 0 else str(cidade).replace(os.sep, '_')
+    origem = hashlib.sha256(base_url.encode()).hexdigest()[:8]
+    return os.path.join(cache_dir, f'covid19.{nome}.{estado}.{origem}.npz')
+
+
+def _ler_cache(arquivo):
+    try:
+        with np.load(arquivo, allow_pickle=False) as f:
+            colunas = [f[c] for c in CAMPOS]
+            return colunas, f['date'], str(f['etag'])
+    except (OSError, KeyError, ValueError):
+        return None
+
 
+def _salvar_cache(arquivo, colunas, date, etag):
+    os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+    np.savez(arquivo, date=date, etag=np.array(etag or ''),
+             **dict(zip(CAMPOS, colunas)))
 
-def read_city(cidade,estado):
+
+def _baixar(url, params, headers, ultima_data=None, etag=None):
+    """
+    Percorre as páginas (ordem decrescente de data) para arrays pré-alocados.
+
+    Para ao encontrar uma data <= ultima_data (mantida do cache). O ETag do
+    cache vai como If-None-Match só na primeira página.
+    Retorna (colunas, datas, etag) ou None se o servidor responder 304.
+    """
+    s = sessao()
+    condicional = dict(headers, **{'If-None-Match': etag}) if etag else headers
+    r = s.get(url, params=params, headers=condicional)
+    if r.status_code == 304:
+        return None
+    r.raise_for_status()
+    etag = r.headers.get('ETag')
+    data = r.json()
+
+    total = data.get('count') or len(data['results'])
+    colunas = [np.empty(total) for _ in CAMPOS]
+    date = np.empty(total, dtype='datetime64[D]')
+    n = 0
+    while True:
+        res = data['results']
+        datas = np.array([x['last_available_date'] for x in res],
+                         dtype='datetime64[D]')
+        k = len(res)
+        if ultima_data is not None:
+            k = int(np.count_nonzero(datas > ultima_data))
+        if n + k > len(date):  # count desatualizado: cresce os arrays
+            extra = n + k - len(date)
+            colunas = [np.concatenate([c, np.empty(extra)]) for c in colunas]
+            date = np.concatenate([date, np.empty(extra, dtype=date.dtype)])
+        for c, campo in zip(colunas, CAMPOS):
+            c[n:n + k] = np.array([x[campo] for x in res[:k]], dtype=float)
+        date[n:n + k] = datas[:k]
+        n += k
+        if k < len(res) or not data.get('next'):
+            break
+        r = s.get(data['next'], headers=headers)
+        r.raise_for_status()
+        data = r.json()
+    return [c[:n] for c in colunas], date[:n], etag
+
+
+def read_city(cidade, estado, base_url=URL_BASE, cache_dir=None, token=None,
+              revisao=14):
+    """
+    Série completa de uma cidade (ou do estado, com cidade=0).
+
+    input:
+    cidade    : nome da cidade (primeira letra maiúscula, com acento) ou 0
+    estado    : sigla do estado
+    base_url  : endpoint caso_full da API (ou servidor local)
+    cache_dir : diretório do cache local (opcional)
+    token     : token da API Brasil.io (opcional)
+    revisao   : dias finais do cache baixados de novo quando há dados novos
+
+    Output:
+    C, D, NC, ND, C100, date em ordem crescente de data
+    """
     if cidade == 0:
-        url='https://brasil.io/api/dataset/covid19/caso_full/data?city=&city_ibge_code=&date=&format=json&is_last=&place_type=state&search=&state='+ estado
+        params = {'place_type': 'state', 'state': estado}
     else:
-        url='https://brasil.io/api/dataset/covid19/caso_full/data?city='+cidade+'&city_ibge_code=&date=&format=json&is_last=&place_type=city&search=&state='+ estado
+        params = {'place_type': 'city', 'city': cidade, 'state': estado}
+    params['format'] = 'json'
+    headers = {'Authorization': f'Token {token}'} if token else {}
 
-#    url_state='https://brasil.io/api/dataset/covid19/caso_full/data?city=&city_ibge_code=&date=&format=json&is_last=&place_type=state&search=&state='+ estado
-    r = requests.get(url)
-    data = r.json()
-    
-    NL=len(data['results'])
-    C=np.zeros(NL); 
-    D=np.zeros(NL);
-    NC=np.zeros(NL);
-    ND=np.zeros(NL);
-    C100=np.zeros(NL);
-    date=np.zeros(NL,dtype=datetime);
-    for i in range(NL):
-        C[i]=data['results'][i]['last_available_confirmed'] 
-        D[i]=data['results'][i]['last_available_deaths']   
-        NC[i]=data['results'][i]['new_confirmed']
-        ND[i]=data['results'][i]['new_deaths']
-        C100[i]=data['results'][i]['last_available_confirmed_per_100k_inhabitants']
-        data_str=data['results'][i]['last_available_date']
-        date[i]=datetime.strptime(data_str,'%Y-%m-%d')
-    return np.flipud(C),np.flipud(D),np.flipud(NC),np.flipud(ND),np.flipud(C100),np.flipud(date)
+    cache = arquivo = None
+    if cache_dir:
+        arquivo = _arquivo_cache(cache_dir, cidade, estado, base_url)
+        cache = _ler_cache(arquivo)
+
+    if cache is None:
+        colunas, date, etag = _baixar(base_url, params, headers)
+    else:
+        colunas_c, date_c, etag_c = cache
+        corte = date_c[0] - np.timedelta64(revisao, 'D') if len(date_c) else None
+        novo = _baixar(base_url, params, headers, ultima_data=corte, etag=etag_c)
+        if novo is None:
+            colunas, date, etag = colunas_c, date_c, etag_c
+        else:
+            # a janela baixada de novo substitui a cauda do cache
+            manter = slice(None) if corte is None else date_c <= corte
+            colunas = [np.concatenate([a, b[manter]])
+                       for a, b in zip(novo[0], colunas_c)]
+            date = np.concatenate([novo[1], date_c[manter]])
+            etag = novo[2]
+
+    if arquivo and (cache is None or novo is not None):
+        _salvar_cache(arquivo, colunas, date, etag)
+
+    C, D, NC, ND, C100 = (np.flipud(c) for c in colunas)
+    date = np.flipud(date).astype('datetime64[us]').astype(datetime)
+    return C, D, NC, ND, C100, date
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes de load_brasil_io.read_city contra um servidor HTTP local que imita
+o endpoint caso_full da API Brasil.io (paginação por 'next', ETag e 304).
+
+    pytest sandbox/Brasil_iO/test_load_brasil_io.py
+"""
+import json
+import os
+import sys
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from load_brasil_io import CAMPOS, read_city
+
+
+# =============================================================================
+# Servidor local
+# =============================================================================
+
+class _API:
+    """
+    Estado do servidor: registros em ordem decrescente de data, tamanho da
+    página, versão (ETag) e log das requisições recebidas.
+    """
+
+    def __init__(self, n_dias, pagina=4):
+        self.pagina = pagina
+        self.versao = 0
+        self.requisicoes = []
+        self.registros = [self._registro(date(2020, 3, 1) + timedelta(days=d), d)
+                          for d in range(n_dias)][::-1]
+
+    @staticmethod
+    def _registro(dia, d):
+        reg = {campo: float(d * (i + 1)) for i, campo in enumerate(CAMPOS)}
+        reg['last_available_date'] = dia.isoformat()
+        return reg
+
+    def novo_dia(self):
+        ultimo = date.fromisoformat(self.registros[0]['last_available_date'])
+        self.registros.insert(0, self._registro(ultimo + timedelta(days=1),
+                                                len(self.registros)))
+        self.versao += 1
+
+    def revisar(self, dias_atras, campo, valor):
+        self.registros[dias_atras][campo] = valor
+        self.versao += 1
+
+
+def _handler(api):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            pagina = int(parse_qs(url.query).get('page', ['1'])[0])
+            etag = f'"v{api.versao}"'
+            api.requisicoes.append((pagina, self.headers.get('If-None-Match')))
+            if pagina == 1 and self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            i = (pagina - 1) * api.pagina
+            corpo = {'count': len(api.registros),
+                     'results': api.registros[i:i + api.pagina],
+                     'next': None}
+            if i + api.pagina < len(api.registros):
+                host, porta = self.server.server_address
+                corpo['next'] = f'http://{host}:{porta}{url.path}?page={pagina + 1}'
+            dados = json.dumps(corpo).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(dados)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+@pytest.fixture
+def servidor():
+    api = _API(n_dias=30)
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _handler(api))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    host, porta = httpd.server_address
+    yield api, f'http://{host}:{porta}/api/dataset/covid19/caso_full/data'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _serie(api):
+    """
+    Série esperada (ordem crescente), na ordem de saída de read_city.
+    """
+    regs = api.registros[::-1]
+    return [np.array([r[c] for r in regs]) for c in CAMPOS]
+
+
+# =============================================================================
+# Testes
+# =============================================================================
+
+def test_paginacao(servidor):
+    api, url = servidor
+    *colunas, datas = read_city(0, 'PA', base_url=url)
+    assert [p for p, _ in api.requisicoes] == list(range(1, 9))
+    assert len(datas) == 30
+    assert datas[0].date() == date(2020, 3, 1)
+    assert all(np.diff(np.array(datas, dtype='datetime64[D]')).astype(int) == 1)
+    for obtida, esperada in zip(colunas, _serie(api)):
+        np.testing.assert_array_equal(obtida, esperada)
+
+
+def test_cache_304(servidor, tmp_path):
+    api, url = servidor
+    primeira = read_city(0, 'PA', base_url=url, cache_dir=tmp_path)
+    api.requisicoes.clear()
+    segunda = read_city(0, 'PA', base_url=url, cache_dir=tmp_path)
+    # uma única requisição condicional, respondida com 304
+    assert api.requisicoes == [(1, f'"v{api.versao}"')]
+    for a, b in zip(primeira, segunda):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_incremental_com_revisao(servidor, tmp_path):
+    api, url = servidor
+    read_city(0, 'PA', base_url=url, cache_dir=tmp_path, revisao=5)
+    api.novo_dia()
+    api.revisar(3, 'new_confirmed', -1.0)     # dentro da janela de revisão
+    api.revisar(20, 'new_confirmed', -2.0)    # fora da janela: fica o cache
+    api.requisicoes.clear()
+    *colunas, datas = read_city(0, 'PA', base_url=url, cache_dir=tmp_path,
+                                revisao=5)
+    # 31 registros, mas só as páginas até a janela de revisão são baixadas;
+    # o If-None-Match vai só na primeira
+    assert api.requisicoes == [(1, '"v0"'), (2, None)]
+    assert len(datas) == 31
+    assert all(np.diff(np.array(datas, dtype='datetime64[D]')).astype(int) == 1)
+    NC = colunas[CAMPOS.index('new_confirmed')]
+    assert NC[-1] == 90.0
+    assert NC[-4] == -1.0
+    assert NC[-21] == 30.0
+
+    # a série mesclada foi gravada: a próxima leitura é um 304
+    api.requisicoes.clear()
+    *colunas2, _ = read_city(0, 'PA', base_url=url, cache_dir=tmp_path,
+                             revisao=5)
+    assert len(api.requisicoes) == 1
+    np.testing.assert_array_equal(colunas2[CAMPOS.index('new_confirmed')], NC)
+
+
+def test_cache_por_base_url(servidor, tmp_path):
+    api, url = servidor
+    read_city(0, 'PA', base_url=url, cache_dir=tmp_path)
+    api.requisicoes.clear()
+    # outro endpoint com o mesmo estado não reaproveita o cache (nem o ETag)
+    read_city(0, 'PA', base_url=url + '?origem=espelho', cache_dir=tmp_path)
+    assert api.requisicoes[0] == (1, None)
+    assert len(list(tmp_path.glob('covid19.estado.PA.*.npz'))) == 2
@@ -0,0 +1,179 @@
+"""
+Reajuste incremental do SIRC à medida que chegam novos dias.
+
+Depois de um ajuste completo (ajustar_modelo), o objeto guarda os
+parâmetros, a covariância e o estado do SIRC aumentado com as
+sensibilidades (SIRC_sens) no último dia. A cada novo lote de observações:
+
+1. integra o sistema aumentado só do último dia até os novos dias;
+2. atualiza os parâmetros livres por mínimos quadrados recursivos (passo de Kalman
+   linearizado pelas sensibilidades), usando a covariância anterior; o passo
+   é iterado (Kalman iterado / Gauss-Newton) com busca linear, para lotes
+   de vários dias;
+3. o estado de partida é corrigido em primeira ordem (y + S dp) e o trecho
+   novo reintegrado com os parâmetros finais, sem reintegrar o histórico.
+
+Um reajuste completo (partindo dos parâmetros anteriores ao lote) é feito a cada
+'reajustar_a_cada' atualizações ou quando a inovação normalizada passa de
+'limite_inovacao', já que a linearização perde validade.
+
+Exemplo:
+    inc = AjusteIncremental(y[:180])
+    for dia in range(180, len(y)):
+        inc.atualizar(y[dia])
+    inc.params['beta'], inc.covar
+"""
+import numpy as np
+from scipy.integrate import odeint
+
+from fit_model import ajustar_modelo, CONFIG_SIRC
+from sirc_model import SIRC_sens
+
+PARAMS_SENS = ['beta', 'gamma', 'N', 'I0']  # linhas das sensibilidades
+
+
+class AjusteIncremental:
+    """
+    Estado de um ajuste SIRC atualizável com novas observações.
+
+    input:
+    y                : casos acumulados iniciais
+    reajustar_a_cada : atualizações entre reajustes completos (None = nunca)
+    limite_inovacao  : inovação normalizada (chi2 por observação) que força
+                       um reajuste completo
+    livres           : parâmetros atualizados entre reajustes. N entra por
+                       padrão: ajustar_modelo o fixa pela logística da série
+                       inicial e a série nova pode ultrapassá-lo
+    escala_prior     : desvio relativo a priori dos parâmetros que o ajuste
+                       completo mantém fixos (N, I0)
+    """
+
+    def __init__(self, y, reajustar_a_cada=14, limite_inovacao=25.0,
+                 livres=('beta', 'gamma', 'N'), escala_prior=0.5):
+        self.reajustar_a_cada = reajustar_a_cada
+        self.limite_inovacao = limite_inovacao
+        self.livres = list(livres)
+        self.escala_prior = escala_prior
+        self.y = np.asarray(y, dtype=float)
+        self.n_reajustes = 0
+        self._ajuste_completo()
+
+    def _ajuste_completo(self, p_ini=None):
+        result, t = ajustar_modelo(self.y, verbose=False, p_ini=p_ini)
+        self.result = result
+        self.params = result.params.valuesdict()
+        self.sigma2 = max(result.redchi, 1e-12)
+        # covariância do ajuste para os parâmetros livres do lmfit e prior
+        # diagonal para os que ele mantém fixos
+        self.covar = np.diag([(self.escala_prior * self.params[k]) ** 2
+                              for k in self.livres])
+        if result.covar is not None:
+            idx = [self.livres.index(k) for k in result.var_names if k in self.livres]
+            src = [i for i, k in enumerate(result.var_names) if k in self.livres]
+            self.covar[np.ix_(idx, idx)] = np.array(result.covar)[np.ix_(src, src)]
+        self._desde_reajuste = 0
+        self.n_reajustes += 1
+
+        # estado aumentado no último dia observado (integra o histórico uma vez)
+        p = self.params
+        N, I0 = p['N'], p['I0']
+        z0 = [N - I0, I0, 0, I0,
+              0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, -1, 1, 0, 1]
+        z = odeint(SIRC_sens, z0, t, args=(N, p['beta'], p['gamma']))
+        self.t_ultimo = float(t[-1])
+        self.z_ultimo = z[-1]
+
+    def _colunas(self):
+        return [PARAMS_SENS.index(k) for k in self.livres]
+
+    def _prever(self, x, x0, t_novos):
+        """
+        Integra o trecho novo com os parâmetros livres x, partindo do estado
+        guardado corrigido em primeira ordem de x0 para x.
+        """
+        p = dict(self.params, **dict(zip(self.livres, x)))
+        z0 = self.z_ultimo.copy()
+        z0[:4] += (x - x0) @ z0[4:].reshape(4, 4)[self._colunas()]
+        z = odeint(SIRC_sens, z0, t_novos, args=(p['N'], p['beta'], p['gamma']))[1:]
+        J = z[:, 4:].reshape(-1, 4, 4)[:, self._colunas(), 3]
+        return z[:, 3], J, z[-1]
+
+    def atualizar(self, novos, max_iter=20, tol=1e-6):
+        """
+        Incorpora uma ou mais novas observações (casos acumulados).
+
+        O passo de Kalman é iterado (Gauss-Newton no custo a posteriori,
+        relinearizando as sensibilidades em cada iterado) com busca linear,
+        de modo que lotes de vários dias não extrapolam a linearização.
+
+        Output:
+        dict com os parâmetros atualizados
+        """
+        novos = np.atleast_1d(np.asarray(novos, dtype=float))
+        self.y = np.concatenate([self.y, novos])
+        anteriores = dict(self.params)
+        t_novos = self.t_ultimo + np.arange(len(novos) + 1)
+        x0 = np.array([anteriores[k] for k in self.livres])
+        P0 = self.covar
+        P0_inv = np.linalg.inv(P0)
+        R = self.sigma2 * np.eye(len(novos))
+        lim = dict(CONFIG_SIRC['limites'], N=(self.y.max(), np.inf), I0=(1e-3, np.inf))
+        baixo, alto = np.array([lim[k] for k in self.livres]).T
+
+        def custo(x, C):
+            r = novos - C
+            return (x - x0) @ P0_inv @ (x - x0) + r @ r / self.sigma2
+
+        # 1. integra apenas o trecho novo
+        x = x0
+        C, J, z_fim = self._prever(x, x0, t_novos)
+        inovacao = novos - C
+        Sk = J @ P0 @ J.T + R
+        chi2 = float(inovacao @ np.linalg.solve(Sk, inovacao)) / len(novos)
+        f = custo(x, C)
+
+        # 2. passo de Kalman iterado, amortecido pela busca linear
+        for _ in range(max_iter):
+            Sk = J @ P0 @ J.T + R
+            K = np.linalg.solve(Sk, J @ P0).T
+            passo = x0 + K @ (novos - C + J @ (x - x0)) - x
+            alfa = 1.0
+            while alfa > 1e-3:
+                x_novo = np.clip(x + alfa * passo, baixo, alto)
+                C_novo, J_novo, z_novo = self._prever(x_novo, x0, t_novos)
+                f_novo = custo(x_novo, C_novo)
+                if np.isfinite(f_novo) and f_novo <= f:
+                    break
+                alfa /= 2
+            else:
+                break  # nenhum passo reduz o custo: fica no iterado atual
+            dx = x_novo - x
+            x, C, J, z_fim, f = x_novo, C_novo, J_novo, z_novo, f_novo
+            if np.all(np.abs(dx) <= tol * np.maximum(np.abs(x), 1.0)):
+                break
+
+        Sk = J @ P0 @ J.T + R
+        K = np.linalg.solve(Sk, J @ P0).T
+        self.covar = (np.eye(len(self.livres)) - K @ J) @ P0
+        self.params.update(zip(self.livres, map(float, x)))
+
+        # 3. estado no novo horizonte: integrado com os parâmetros finais
+        self.z_ultimo = z_fim
+        self.t_ultimo = float(t_novos[-1])
+        self._desde_reajuste += 1
+
+        if chi2 > self.limite_inovacao or (
+                self.reajustar_a_cada and self._desde_reajuste >= self.reajustar_a_cada):
+            # parte dos parâmetros anteriores ao lote, não do passo que falhou
+            self._ajuste_completo(p_ini={k: anteriores[k] for k in ('beta', 'gamma')})
+        return dict(self.params)
+
+    def previsao(self, dias):
+        """
+        Casos acumulados previstos para os próximos 'dias', a partir do estado
+        guardado (sem reintegrar o histórico).
+        """
+        p = self.params
+        t = self.t_ultimo + np.arange(dias + 1)
+        z = odeint(SIRC_sens, self.z_ultimo, t, args=(p['N'], p['beta'], p['gamma']))
+        return z[1:, 3]
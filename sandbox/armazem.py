@@ -0,0 +1,382 @@
+"""
+Armazém binário de séries temporais por região e data.
+
+Substitui a leitura dos arquivos legados (out.dat, out.belem.dat,
+covid19_nodate.dat, covidpara*.mat, globalsave.pkl e o caso_full) a cada
+execução. Esses arquivos são importados uma vez para um diretório com:
+
+    indice.json   região -> variável -> (início, n, tipo, offset) e metadados
+    int32.bin     colunas inteiras (casos, óbitos, ...) em blocos contíguos
+    float32.bin   colunas reais (taxas, curvas de modelo, ...)
+
+Cada série é um bloco contíguo de um dos arquivos de coluna, lido por
+np.memmap. serie() devolve uma fatia do mapa, sem cópia nem parsing, que
+pode ir direto para ajustar_modelo, ajustar_multistart, etc. Regravar uma
+série acrescenta um bloco novo (o antigo vira espaço morto até compactar()).
+
+Uso:
+    python armazem.py series/ --legado .            # importa os arquivos do sandbox
+    python armazem.py series/ --caso-full caso_full.parquet
+
+    arm = Armazem('series')
+    y = arm.serie('PA', 'casos', '2020-03-18', '2020-06-08')   # memmap, sem cópia
+    result, t = ajustar_modelo(y)
+"""
+import argparse
+import datetime
+import importlib
+import json
+import os
+import pickle
+import types
+
+import numpy as np
+import pandas as pd
+import scipy.io as spio
+
+TIPOS = ('int32', 'float32')
+INDICE = 'indice.json'
+COLUNAS_DAT = ['casos', 'novos_casos', 'obitos', 'novos_obitos', 'casos_100k']
+
+
+class Armazem:
+    """
+    Séries diárias indexadas por (região, variável), mapeadas em memória.
+
+    input:
+    diretorio : pasta do armazém (criada se não existir)
+    """
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        os.makedirs(diretorio, exist_ok=True)
+        try:
+            with open(os.path.join(diretorio, INDICE)) as f:
+                self.indice = json.load(f)
+        except FileNotFoundError:
+            self.indice = {}
+        self._mapas = {}
+
+    # -------------------------------------------------------------------------
+    # Escrita
+    # -------------------------------------------------------------------------
+
+    def _arquivo(self, tipo):
+        return os.path.join(self.diretorio, f'{tipo}.bin')
+
+    def _salvar_indice(self):
+        caminho = os.path.join(self.diretorio, INDICE)
+        with open(caminho + '.tmp', 'w') as f:
+            json.dump(self.indice, f, ensure_ascii=False)
+        os.replace(caminho + '.tmp', caminho)
+
+    def gravar(self, regiao, variavel, inicio, valores, tipo=None, salvar=True):
+        """
+        Grava (ou substitui) a série diária de uma região a partir da data inicio.
+
+        input:
+        regiao, variavel : chaves da série (ex. 'PA', 'casos')
+        inicio           : data do primeiro valor ('AAAA-MM-DD' ou date)
+        valores          : valores diários consecutivos
+        tipo             : 'int32' ou 'float32' (None = int32 se forem inteiros)
+        salvar           : grava o índice (False ao importar muitas séries;
+                           chame salvar_indice() no fim)
+        """
+        valores = np.asarray(valores)
+        if tipo is None:
+            inteiro = np.issubdtype(valores.dtype, np.integer) or (
+                valores.size and np.all(np.isfinite(valores)) and np.all(valores == np.round(valores))
+                and np.abs(valores).max() < 2**31)
+            tipo = 'int32' if inteiro else 'float32'
+        if tipo not in TIPOS:
+            raise ValueError(f'Tipo desconhecido: {tipo}. Disponíveis: {TIPOS}')
+        dados = np.ascontiguousarray(valores, dtype=tipo)
+        arquivo = self._arquivo(tipo)
+        with open(arquivo, 'ab') as f:
+            offset = f.tell() // dados.itemsize
+            f.write(dados.tobytes())
+        self.indice.setdefault(regiao, {'series': {}, 'meta': {}})['series'][variavel] = {
+            'inicio': str(pd.Timestamp(inicio).date()), 'n': int(dados.size),
+            'tipo': tipo, 'offset': int(offset)}
+        if salvar:
+            self._salvar_indice()
+
+    def gravar_meta(self, regiao, salvar=True, **meta):
+        """
+        Metadados escalares de uma região (parâmetros de ajuste, origem, ...).
+        """
+        self.indice.setdefault(regiao, {'series': {}, 'meta': {}})['meta'].update(meta)
+        if salvar:
+            self._salvar_indice()
+
+    def salvar_indice(self):
+        self._salvar_indice()
+
+    def compactar(self):
+        """
+        Reescreve os arquivos de coluna só com os blocos em uso.
+        """
+        for tipo in TIPOS:
+            entradas = [e for r in self.indice.values() for e in r['series'].values()
+                        if e['tipo'] == tipo]
+            if not entradas:
+                continue
+            antigo = self._mapa(tipo, max(e['offset'] + e['n'] for e in entradas))
+            novo = self._arquivo(tipo) + '.tmp'
+            with open(novo, 'wb') as f:
+                for e in sorted(entradas, key=lambda e: e['offset']):
+                    bloco = np.array(antigo[e['offset']:e['offset'] + e['n']])
+                    e['offset'] = f.tell() // bloco.itemsize
+                    f.write(bloco.tobytes())
+            del antigo
+            self._mapas.pop(tipo, None)
+            os.replace(novo, self._arquivo(tipo))
+        self._salvar_indice()
+
+    # -------------------------------------------------------------------------
+    # Leitura
+    # -------------------------------------------------------------------------
+
+    def _mapa(self, tipo, minimo=0):
+        mapa = self._mapas.get(tipo)
+        if mapa is None or mapa.size < minimo:
+            # o arquivo cresceu desde que foi mapeado
+            mapa = np.memmap(self._arquivo(tipo), dtype=tipo, mode='r')
+            self._mapas[tipo] = mapa
+        return mapa
+
+    def regioes(self):
+        return list(self.indice)
+
+    def variaveis(self, regiao):
+        return list(self.indice[regiao]['series'])
+
+    def meta(self, regiao):
+        return dict(self.indice[regiao]['meta'])
+
+    def __contains__(self, regiao):
+        return regiao in self.indice
+
+    def _entrada(self, regiao, variavel):
+        try:
+            return self.indice[regiao]['series'][variavel]
+        except KeyError:
+            raise KeyError(f'Série inexistente: {regiao}/{variavel}') from None
+
+    def _intervalo(self, e, inicio, fim):
+        i0 = np.datetime64(e['inicio'], 'D')
+        a = 0 if inicio is None else int((np.datetime64(pd.Timestamp(inicio).date(), 'D') - i0).astype(int))
+        b = e['n'] if fim is None else int((np.datetime64(pd.Timestamp(fim).date(), 'D') - i0).astype(int)) + 1
+        return min(max(a, 0), e['n']), min(max(b, 0), e['n'])
+
+    def serie(self, regiao, variavel='casos', inicio=None, fim=None):
+        """
+        Valores da série entre as datas inicio e fim (inclusive), como fatia
+        somente-leitura do arquivo mapeado (sem cópia).
+        """
+        e = self._entrada(regiao, variavel)
+        a, b = self._intervalo(e, inicio, fim)
+        mapa = self._mapa(e['tipo'], e['offset'] + e['n'])
+        return mapa[e['offset'] + a:e['offset'] + b]
+
+    def datas(self, regiao, variavel='casos', inicio=None, fim=None):
+        """
+        Datas (datetime64[D]) dos valores devolvidos por serie().
+        """
+        e = self._entrada(regiao, variavel)
+        a, b = self._intervalo(e, inicio, fim)
+        return np.datetime64(e['inicio'], 'D') + np.arange(a, b)
+
+    def matriz(self, regioes, variavel, inicio, fim, preencher=0):
+        """
+        Matriz (regiões, dias) de uma variável num intervalo de datas comum;
+        dias fora da série de uma região recebem 'preencher'.
+        """
+        d0 = np.datetime64(pd.Timestamp(inicio).date(), 'D')
+        n = int((np.datetime64(pd.Timestamp(fim).date(), 'D') - d0).astype(int)) + 1
+        saida = np.full((len(regioes), n), preencher, dtype=float)
+        for i, regiao in enumerate(regioes):
+            if variavel not in self.indice.get(regiao, {}).get('series', {}):
+                continue
+            v = self.serie(regiao, variavel, inicio, fim)
+            if v.size:
+                j = int((self.datas(regiao, variavel, inicio, fim)[0] - d0).astype(int))
+                saida[i, j:j + v.size] = v
+        return saida
+
+    def tabela(self):
+        """
+        DataFrame com uma linha por série (região, variável, início, n, tipo).
+        """
+        return pd.DataFrame([{'regiao': r, 'variavel': v, **e}
+                             for r, d in self.indice.items() for v, e in d['series'].items()])
+
+
+# =============================================================================
+# Importadores dos formatos legados
+# =============================================================================
+
+def _diario(datas, df, acumuladas):
+    # uma linha por dia: duplicatas ficam com a última, dias faltantes
+    # repetem os acumulados
+    df = df.set_index(pd.DatetimeIndex(datas)).sort_index()
+    df = df[~df.index.duplicated(keep='last')]
+    df = df.reindex(pd.date_range(df.index[0], df.index[-1], freq='D'))
+    df[acumuladas] = df[acumuladas].ffill()
+    return df.ffill()
+
+
+def importar_dat(armazem, caminho, regiao):
+    """
+    out.dat / out.belem.dat: data (dd-mm-aaaa), casos, novos casos, óbitos,
+    novos óbitos, casos por 100 mil. Os novos são recalculados dos acumulados
+    depois de remover datas repetidas e preencher as faltantes.
+    """
+    df = pd.read_csv(caminho, sep=r'\s+', header=None, names=['data'] + COLUNAS_DAT)
+    df = _diario(pd.to_datetime(df.pop('data'), format='%d-%m-%Y'), df, ['casos', 'obitos'])
+    for acum, novos in (('casos', 'novos_casos'), ('obitos', 'novos_obitos')):
+        df[novos] = np.diff(df[acum].to_numpy(), prepend=df[acum].iloc[0] - df[novos].iloc[0])
+    for col in COLUNAS_DAT:
+        armazem.gravar(regiao, col, df.index[0], df[col].to_numpy(),
+                       tipo='float32' if col == 'casos_100k' else 'int32', salvar=False)
+    armazem.gravar_meta(regiao, origem=os.path.basename(caminho))
+
+
+def importar_dat_sem_data(armazem, caminho, regiao, inicio):
+    """
+    covid19_nodate.dat: dia, casos acumulados, novos casos (sem datas; o dia
+    1 corresponde a inicio).
+    """
+    dia, casos, novos = np.loadtxt(caminho, unpack=True)
+    inicio = pd.Timestamp(inicio) + pd.Timedelta(days=int(dia[0]) - 1)
+    armazem.gravar(regiao, 'casos', inicio, casos, tipo='int32', salvar=False)
+    armazem.gravar(regiao, 'novos_casos', inicio, novos, tipo='int32', salvar=False)
+    armazem.gravar_meta(regiao, origem=os.path.basename(caminho))
+
+
+def _datenum(d):
+    # datenum do MATLAB (dias desde 00/01/0000) -> date
+    return datetime.date.fromordinal(int(d) - 366)
+
+
+def importar_mat(armazem, caminho, regiao=None):
+    """
+    covidpara*.mat (struct 'res' do fit_virus em MATLAB): casos observados C e
+    estimados Ce a partir de date0; os escalares do ajuste (beta, gamma, N,
+    R0, ...) vão para os metadados.
+    """
+    res = spio.loadmat(caminho)['res'][0, 0]
+    regiao = regiao or str(res['country'][0])
+    inicio = _datenum(res['date0'].ravel()[0])
+    armazem.gravar(regiao, 'casos', inicio, res['C'].ravel(), tipo='int32', salvar=False)
+    armazem.gravar(regiao, 'casos_modelo', inicio, res['Ce'].ravel(), tipo='float32', salvar=False)
+    meta = {k: float(res[k].ravel()[0]) for k in res.dtype.names
+            if res[k].dtype.kind in 'fiu' and res[k].size == 1}
+    armazem.gravar_meta(regiao, origem=os.path.basename(caminho), **meta)
+
+
+class _SessaoDill(pickle.Unpickler):
+    # sessões do dill (dump_session) restauram o __main__; aqui o estado vai
+    # para um módulo à parte em vez de sobrescrever o __main__ atual
+    def find_class(self, modulo, nome):
+        if (modulo, nome) == ('dill._dill', '_import_module'):
+            return lambda m, safe=False: types.ModuleType(m) if m == '__main__' else importlib.import_module(m)
+        return super().find_class(modulo, nome)
+
+
+def importar_pkl(armazem, caminho, regiao, inicio):
+    """
+    globalsave.pkl e afins: grava cada array numérico 1-D do pickle (dict,
+    DataFrame ou sessão do dill) como uma série diária a partir de inicio.
+    Só para arquivos confiáveis (pickle executa código ao carregar).
+    """
+    with open(caminho, 'rb') as f:
+        obj = _SessaoDill(f).load()
+    if isinstance(obj, types.ModuleType):
+        obj = vars(obj)
+    if isinstance(obj, pd.DataFrame):
+        obj = {c: obj[c].to_numpy() for c in obj.columns}
+    gravadas = 0
+    for nome, v in dict(obj).items():
+        if isinstance(v, np.ndarray) and v.ndim == 1 and v.dtype.kind in 'fiu' and v.size:
+            armazem.gravar(regiao, str(nome), inicio, v, salvar=False)
+            gravadas += 1
+    armazem.gravar_meta(regiao, origem=os.path.basename(caminho))
+    return gravadas
+
+
+def importar_caso_full(armazem, path, municipios=True):
+    """
+    caso_full.parquet (Brasil.io): casos acumulados e novos por estado
+    ('UF') e município ('UF/cidade'), um bloco por região.
+    """
+    colunas = ['date', 'state', 'city', 'place_type', 'new_confirmed']
+    df = pd.read_parquet(path, columns=colunas)
+    if not municipios:
+        df = df[df['place_type'] == 'state']
+    df['date'] = pd.to_datetime(df['date'])
+    df['regiao'] = np.where(df['place_type'] == 'city', df['state'] + '/' + df['city'].fillna(''),
+                            df['state'])
+    for regiao, g in df.groupby('regiao', sort=True):
+        novos = g.groupby('date')['new_confirmed'].sum()
+        novos = novos.reindex(pd.date_range(novos.index[0], novos.index[-1], freq='D'), fill_value=0)
+        armazem.gravar(regiao, 'novos_casos', novos.index[0], novos.to_numpy(), tipo='int32',
+                       salvar=False)
+        armazem.gravar(regiao, 'casos', novos.index[0], np.cumsum(novos.to_numpy()), tipo='int32',
+                       salvar=False)
+    armazem.salvar_indice()
+
+
+def importar_legado(armazem, diretorio, inicio_sem_data=None, inicio_pkl=None):
+    """
+    Importa os arquivos legados encontrados em diretorio (o sandbox/ ou data/).
+
+    covid19_nodate.dat e globalsave.pkl não têm datas e só são importados
+    se inicio_sem_data / inicio_pkl forem dados.
+    """
+    arquivos = {
+        'out.dat': lambda c: importar_dat(armazem, c, 'PA'),
+        'out.belem.dat': lambda c: importar_dat(armazem, c, 'PA/Belem'),
+        'covidpara.mat': lambda c: importar_mat(armazem, c, 'Para/covidpara'),
+        'covidpara2.mat': lambda c: importar_mat(armazem, c, 'Para/covidpara2'),
+        'covidpara24.mat': lambda c: importar_mat(armazem, c, 'Para/covidpara24'),
+    }
+    if inicio_sem_data:
+        arquivos['covid19_nodate.dat'] = lambda c: importar_dat_sem_data(
+            armazem, c, 'Para/nodate', inicio_sem_data)
+    if inicio_pkl:
+        arquivos['globalsave.pkl'] = lambda c: importar_pkl(armazem, c, 'globalsave', inicio_pkl)
+    importados = []
+    for nome, importar in arquivos.items():
+        caminho = os.path.join(diretorio, nome)
+        if os.path.exists(caminho):
+            importar(caminho)
+            importados.append(nome)
+    armazem.salvar_indice()
+    return importados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('armazem')
+    parser.add_argument('--legado', help='diretório com out.dat, covidpara*.mat, ...')
+    parser.add_argument('--inicio-sem-data', help='data do dia 1 de covid19_nodate.dat')
+    parser.add_argument('--inicio-pkl', help='data do primeiro valor das séries de globalsave.pkl')
+    parser.add_argument('--caso-full', help='caso_full.parquet do Brasil.io')
+    parser.add_argument('--so-estados', action='store_true')
+    parser.add_argument('--compactar', action='store_true')
+    args = parser.parse_args()
+
+    arm = Armazem(args.armazem)
+    if args.legado:
+        print('importados:', importar_legado(arm, args.legado, args.inicio_sem_data,
+                                             args.inicio_pkl))
+    if args.caso_full:
+        importar_caso_full(arm, args.caso_full, municipios=not args.so_estados)
+    if args.compactar:
+        arm.compactar()
+    print(f'{len(arm.regioes())} regiões, {len(arm.tabela())} séries em {args.armazem}')
+
+
+if __name__ == '__main__':
+    main()
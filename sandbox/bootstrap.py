@@ -0,0 +1,150 @@
+"""
+Incerteza do ajuste SIRC por bootstrap paramétrico em paralelo.
+
+A partir do ajuste pontual (ajustar_modelo), gera séries sintéticas
+perturbando os casos diários do modelo ajustado: reamostrando os resíduos
+de Pearson ('residuos'), ou com ruído de Poisson ('poisson') ou binomial
+negativo ('negbin', dispersão estimada dos resíduos). Cada série é
+reajustada partindo do ajuste pontual (least_squares em log(parâmetro),
+jacobiano de solve_sirc_sens), em lotes distribuídos num pool de processos.
+
+Devolve amostras e percentis dos parâmetros, R0, dia do pico e das curvas
+de casos acumulados até o horizonte de previsão.
+
+Exemplo:
+    boot = bootstrap_SIRC(y, n_amostras=200, horizonte=60)
+    lo, mediana, hi = boot['bandas']
+    boot['intervalos']['R0']
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fit_model import ajustar_modelo
+from multistart import rodar_reinicio, limites_padrao
+from sirc_model import solve_sirc
+
+RUIDOS = ('residuos', 'poisson', 'negbin')
+
+
+def incidencia(C):
+    """
+    Casos diários a partir dos acumulados (o primeiro dia é C[0]).
+    """
+    return np.diff(np.asarray(C, dtype=float), prepend=0.0)
+
+
+def series_sinteticas(y, C_ajuste, n, ruido='residuos', rng=None):
+    """
+    n séries de casos acumulados geradas em torno do ajuste.
+
+    input:
+    y        : casos acumulados observados
+    C_ajuste : acumulados do modelo ajustado nos mesmos dias
+    ruido    : 'residuos' (resíduos de Pearson reamostrados), 'poisson'
+               ou 'negbin'
+
+    Output:
+    array (n, len(y)), não decrescente
+    """
+    if ruido not in RUIDOS:
+        raise ValueError(f'Ruído desconhecido: {ruido}. Disponíveis: {RUIDOS}')
+    rng = rng or np.random.default_rng()
+    mu = np.maximum(incidencia(C_ajuste), 1e-9)
+    pearson = (incidencia(y) - mu) / np.sqrt(mu)
+
+    if ruido == 'residuos':
+        d = mu + np.sqrt(mu) * rng.choice(pearson, size=(n, len(y)))
+    elif ruido == 'poisson':
+        d = rng.poisson(mu, size=(n, len(y)))
+    else:
+        # var = mu + mu^2 / k, com k pelo método dos momentos dos resíduos
+        excesso = max(np.mean(pearson**2) - 1.0, 1e-6)
+        k = np.mean(mu) / excesso
+        d = rng.negative_binomial(k, k / (k + mu), size=(n, len(y)))
+    return np.cumsum(np.maximum(d, 0), axis=1)
+
+
+def _ajustar_lote(tarefa):
+    """
+    Reajusta um lote de séries sintéticas e calcula curva e pico de cada uma.
+    """
+    series, x0, livres, fixos, lim, t_prev = tarefa
+    t = np.arange(series.shape[1])
+    saida = []
+    for y in series:
+        sol = rodar_reinicio((x0, y, t, livres, fixos, lim, 'least_squares'))
+        if sol['params'] is None:
+            saida.append(None)
+            continue
+        p = sol['params']
+        curva = solve_sirc(t_prev, p['N'], p['beta'], p['gamma'], p['I0'])
+        saida.append((p, curva, int(np.argmax(np.diff(curva))) + 1))
+    return saida
+
+
+def bootstrap_SIRC(y, n_amostras=200, ruido='residuos', horizonte=60,
+                   livres=('beta', 'gamma'), percentis=(2.5, 50, 97.5),
+                   max_workers=None, tamanho_lote=None, seed=0, result=None):
+    """
+    Bootstrap paramétrico do ajuste SIRC.
+
+    input:
+    y            : casos acumulados
+    n_amostras   : número de séries sintéticas reajustadas
+    ruido        : 'residuos', 'poisson' ou 'negbin'
+    horizonte    : dias de previsão além da série
+    livres       : parâmetros reajustados (os demais ficam no ajuste pontual)
+    percentis    : percentis das bandas e intervalos
+    max_workers  : processos em paralelo (None = os.cpu_count())
+    tamanho_lote : séries por tarefa (padrão: divide igualmente entre os processos)
+    seed         : semente do gerador
+    result       : ajuste pontual já feito (ModelResult de ajustar_modelo)
+
+    Output:
+    dict com estimativa (parâmetros pontuais), amostras ({parametro: array},
+    incluindo R0 e pico_dia), intervalos ({parametro: percentis}), t, curvas
+    (n, nt), bandas (len(percentis), nt) e falhas (reajustes sem solução)
+    """
+    y = np.asarray(y, dtype=float)
+    t = np.arange(len(y))
+    if result is None:
+        result, _ = ajustar_modelo(y, verbose=False)
+    p0 = result.params.valuesdict()
+    C_ajuste = solve_sirc(t, p0['N'], p0['beta'], p0['gamma'], p0['I0'])
+
+    rng = np.random.default_rng(seed)
+    series = series_sinteticas(y, C_ajuste, n_amostras, ruido, rng)
+
+    livres = list(livres)
+    fixos = {k: v for k, v in p0.items() if k not in livres}
+    lim = np.log([limites_padrao(y, p0)[k] for k in livres])
+    x0 = np.clip(np.log([p0[k] for k in livres]), lim[:, 0], lim[:, 1])
+    t_prev = np.arange(len(y) + horizonte)
+
+    max_workers = max_workers or os.cpu_count()
+    tamanho_lote = tamanho_lote or max(1, -(-n_amostras // max_workers))
+    tarefas = [(series[i:i + tamanho_lote], x0, livres, fixos, lim, t_prev)
+               for i in range(0, n_amostras, tamanho_lote)]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        resultados = [r for lote in pool.map(_ajustar_lote, tarefas) for r in lote]
+
+    validos = [r for r in resultados if r is not None]
+    if not validos:
+        raise RuntimeError('bootstrap_SIRC: nenhum reajuste convergiu')
+    amostras = {k: np.array([p[k] for p, _, _ in validos]) for k in p0}
+    amostras['R0'] = amostras['beta'] / amostras['gamma']
+    amostras['pico_dia'] = np.array([pico for _, _, pico in validos])
+    curvas = np.array([c for _, c, _ in validos])
+
+    return {
+        'estimativa': dict(p0, R0=p0['beta'] / p0['gamma']),
+        'amostras': amostras,
+        'intervalos': {k: np.percentile(v, percentis) for k, v in amostras.items()},
+        'percentis': tuple(percentis),
+        't': t_prev,
+        'curvas': curvas,
+        'bandas': np.percentile(curvas, percentis, axis=0),
+        'falhas': len(resultados) - len(validos),
+    }
@@ -0,0 +1,192 @@
+"""
+Cache persistente de resultados de ajuste.
+
+A chave é o hash da série de entrada junto com a configuração do ajuste
+(modelo, limites, método, ...). Cada entrada é um arquivo .pkl no diretório
+do cache; o índice (indice.json) guarda tamanho e último acesso de cada
+entrada para a remoção LRU quando o cache passa de max_bytes/max_entradas.
+
+Várias execuções podem dividir o diretório: toda escrita do índice é feita
+sob uma trava (indice.lock), relendo o índice do disco antes de alterá-lo.
+Uma leitura não regrava o índice; o acesso fica na data de modificação do
+.pkl e só é levado ao índice na remoção LRU.
+
+Quando a série não está no cache, mais_proximo() devolve os parâmetros da
+maior série já ajustada (mesma configuração) da qual a nova é extensão,
+para partir o otimizador de perto da solução (refit diário).
+
+Exemplo:
+    cache = CacheAjustes('~/.cache/endemic_ajustes')
+    result, t = ajustar_modelo(y, cache=cache)
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # sem flock (Windows): trava vira no-op
+    fcntl = None
+
+
+def _hash_serie(y):
+    return hashlib.sha256(np.ascontiguousarray(y, dtype=np.float64).tobytes()).hexdigest()
+
+
+def _hash_config(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str)
+                          .encode()).hexdigest()[:16]
+
+
+class CacheAjustes:
+    """
+    Cache em disco de ajustes, com remoção LRU e limite de tamanho.
+
+    input:
+    diretorio    : onde ficam as entradas e o índice
+    max_bytes    : tamanho máximo somado das entradas
+    max_entradas : número máximo de entradas
+    """
+
+    def __init__(self, diretorio, max_bytes=256 * 2**20, max_entradas=10000):
+        self.diretorio = os.path.expanduser(diretorio)
+        self.max_bytes = max_bytes
+        self.max_entradas = max_entradas
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._arquivo_indice = os.path.join(self.diretorio, 'indice.json')
+        self.indice = self._ler_indice()
+
+    # -------------------------------------------------------------------------
+    # índice (gravado de forma atômica: várias execuções podem dividir o cache)
+
+    @contextmanager
+    def _trava(self):
+        with open(os.path.join(self.diretorio, 'indice.lock'), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _ler_indice(self):
+        try:
+            with open(self._arquivo_indice) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _gravar_atomico(self, caminho, dados, modo='w'):
+        fd, tmp = tempfile.mkstemp(dir=self.diretorio)
+        with os.fdopen(fd, modo) as f:
+            if modo == 'w':
+                json.dump(dados, f)
+            else:
+                f.write(dados)
+        os.replace(tmp, caminho)
+
+    def _arquivo(self, chave):
+        return os.path.join(self.diretorio, chave + '.pkl')
+
+    # -------------------------------------------------------------------------
+
+    def chave(self, y, config):
+        """
+        Chave da entrada: hash da configuração + hash da série.
+        """
+        return f'{_hash_config(config)}-{_hash_serie(y)}'
+
+    def obter(self, chave):
+        """
+        Entrada salva ({'y', 'config', 'params', 'payload'}) ou None.
+        """
+        if chave not in self.indice:
+            self.indice = self._ler_indice()  # outra execução pode tê-la gravado
+            if chave not in self.indice:
+                return None
+        try:
+            with open(self._arquivo(chave), 'rb') as f:
+                entrada = pickle.load(f)
+            os.utime(self._arquivo(chave))  # último acesso, lido na remoção LRU
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self.indice.pop(chave, None)
+            return None
+        return entrada
+
+    def guardar(self, chave, y, config, params, payload):
+        """
+        Salva um ajuste (params: dict de parâmetros; payload: resultado).
+        """
+        entrada = {'y': np.asarray(y, dtype=float), 'config': config,
+                   'params': dict(params), 'payload': payload}
+        dados = pickle.dumps(entrada, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._trava():
+            self._gravar_atomico(self._arquivo(chave), dados, modo='wb')
+            self.indice = self._ler_indice()
+            self.indice[chave] = {'config': chave.split('-')[0], 'n': len(entrada['y']),
+                                  'bytes': len(dados), 'acesso': time.time()}
+            self._remover_excesso()
+            self._gravar_atomico(self._arquivo_indice, self.indice)
+
+    def mais_proximo(self, y, config):
+        """
+        Parâmetros do ajuste salvo mais próximo da série y.
+
+        Procura, entre as entradas com a mesma configuração, a maior série
+        que é prefixo de y (y estende a série salva com dias novos).
+
+        Output:
+        dict de parâmetros ou None
+        """
+        cfg = _hash_config(config)
+        y = np.asarray(y, dtype=float)
+        self.indice = self._ler_indice()
+        candidatas = sorted(((v['n'], k) for k, v in self.indice.items()
+                             if v['config'] == cfg and v['n'] <= len(y)),
+                            reverse=True)
+        for n, chave in candidatas:
+            if chave == f'{cfg}-{_hash_serie(y[:n])}':
+                entrada = self.obter(chave)
+                if entrada is not None:
+                    return entrada['params']
+        return None
+
+    def _remover_excesso(self):
+        # chamada sob a trava, com o índice recém-lido do disco: traz os
+        # acessos gravados nos .pkl e descarta entradas sem arquivo
+        for chave in list(self.indice):
+            try:
+                acesso = os.path.getmtime(self._arquivo(chave))
+            except OSError:
+                self.indice.pop(chave)
+                continue
+            self.indice[chave]['acesso'] = max(self.indice[chave]['acesso'], acesso)
+        ordem = sorted(self.indice, key=lambda k: self.indice[k]['acesso'])
+        total = sum(v['bytes'] for v in self.indice.values())
+        while ordem and (total > self.max_bytes or len(self.indice) > self.max_entradas):
+            chave = ordem.pop(0)
+            total -= self.indice.pop(chave)['bytes']
+            try:
+                os.remove(self._arquivo(chave))
+            except OSError:
+                pass
+
+    def limpar(self):
+        """
+        Remove todas as entradas.
+        """
+        with self._trava():
+            for chave in list(self._ler_indice()):
+                try:
+                    os.remove(self._arquivo(chave))
+                except OSError:
+                    pass
+            self.indice = {}
+            self._gravar_atomico(self._arquivo_indice, self.indice)
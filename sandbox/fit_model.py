@@ -1,33 +1,77 @@
 import lmfit
-from sirc_model import solve_sirc, initial_SIRC
+from sirc_model import solve_sirc, solve_sirc_sens, initial_SIRC
 import numpy as np
 
-def ajustar_modelo(y):
+PARAMS_SENS = ['beta', 'gamma', 'N', 'I0']  # ordem das colunas de solve_sirc_sens
+
+def jac_residuo(params, data, weights, t=None, **kws):
+    """
+    Jacobiano do resíduo do lmfit (dados - modelo) nos parâmetros livres,
+    via equações de sensibilidade (Dfun do lmfit/leastsq).
+    """
+    p = params.valuesdict()
+    _, dC = solve_sirc_sens(t, p['N'], p['beta'], p['gamma'], p['I0'])
+    livres = [nome for nome, par in params.items() if par.vary]
+    J = -dC[:, [PARAMS_SENS.index(nome) for nome in livres]]
+    if weights is not None:
+        J = J * np.asarray(weights)[:, None]
+    return J
+
+CONFIG_SIRC = {'modelo': 'SIRC', 'ajuste': 'ajustar_modelo', 'metodo': 'leastsq',
+               'limites': {'beta': (0.001, 3.0), 'gamma': (0.001, 2.0)}}
+
+def ajustar_modelo(y, usar_jacobiano=True, verbose=True, cache=None, p_ini=None):
+    """
+    Ajusta o SIRC (beta, gamma livres; N, I0 da logística) aos acumulados y.
+
+    p_ini (dict com beta/gamma) substitui o chute inicial de beta e gamma.
+    Com cache (CacheAjustes), devolve o ajuste salvo para a mesma série, ou
+    parte beta/gamma do ajuste salvo da qual y é extensão.
+    """
     t = np.arange(len(y))
-    K, r, A = initial_SIRC(y)
+    if cache is not None:
+        config = dict(CONFIG_SIRC, jacobiano=usar_jacobiano)
+        chave = cache.chave(y, config)
+        salvo = cache.obter(chave)
+        if salvo is not None:
+            return salvo['payload'], t
+        if p_ini is None:
+            p_ini = cache.mais_proximo(y, config)
+    b0 = initial_SIRC(y)
+    if b0 is None:
+        raise ValueError('initial_SIRC: sem estimativa inicial para a série')
+    K, r, A = b0
 
     I0 = K / (A + 1)
     N = 2 * K
     gamma_i = 2 * r
     beta_i = 1.5 * gamma_i
+    if p_ini is not None:
+        beta_i, gamma_i = p_ini['beta'], p_ini['gamma']
 
     # ---------------------------
     # PARÂMETROS INICIAIS
     # ---------------------------
-    print('\n' + '=' * 40)
-    print('PARÂMETROS INICIAIS'.center(40))
-    print('=' * 40)
-    print(f'{"I0:":<10}{I0:>30.6f}')
-    print(f'{"N:":<10}{N:>30.6f}')
-    print(f'{"gamma_i:":<10}{gamma_i:>30.6f}')
-    print(f'{"beta_i:":<10}{beta_i:>30.6f}')
+    if verbose:
+        print('\n' + '=' * 40)
+        print('PARÂMETROS INICIAIS'.center(40))
+        print('=' * 40)
+        print(f'{"I0:":<10}{I0:>30.6f}')
+        print(f'{"N:":<10}{N:>30.6f}')
+        print(f'{"gamma_i:":<10}{gamma_i:>30.6f}')
+        print(f'{"beta_i:":<10}{beta_i:>30.6f}')
 
     model = lmfit.Model(solve_sirc, independent_vars=['t'])
     params = model.make_params()
     params['N'].set(value=N, vary=False)
-    params['beta'].set(value=beta_i, min=0.001, max=3.0)
-    params['gamma'].set(value=gamma_i, min=0.001, max=2.0)
+    params['beta'].set(value=beta_i, min=CONFIG_SIRC['limites']['beta'][0],
+                       max=CONFIG_SIRC['limites']['beta'][1])
+    params['gamma'].set(value=gamma_i, min=CONFIG_SIRC['limites']['gamma'][0],
+                        max=CONFIG_SIRC['limites']['gamma'][1])
     params['I0'].set(value=I0, vary=False)
 
-    result = model.fit(y, params, t=t)
+    fit_kws = {'Dfun': jac_residuo} if usar_jacobiano else None
+    result = model.fit(y, params, t=t, fit_kws=fit_kws)
+    if cache is not None:
+        cache.guardar(chave, y, config, result.params.valuesdict(), result)
     return result, t
@@ -1,9 +1,14 @@
+import os
+import sys
 import numpy as np
-from scipy.integrate import odeint
 from scipy.optimize import minimize
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model'))
+from quadratura_sirc2 import C_SIRC2, sens_SIRC2
+from modelos_epidemiologicos import initial_SIRC
+
 # =============================================================================
 # Função principal: ajusta o modelo SIR aos dados
 # =============================================================================
@@ -17,6 +22,7 @@ def fit_virus(get_data, **kwargs):
     day_limit = kwargs.get('day', None)
     w1 = kwargs.get('w1', None)
     w2 = kwargs.get('w2', None)
+    cache = kwargs.get('cache', None)  # CacheAjustes opcional
 
     # -------------------------------------------------------------------------
     # Carrega os dados
@@ -69,42 +75,70 @@ def fit_virus(get_data, **kwargs):
     else:
         weight_options = [(w1 or 1, w2 or 0)]
 
-    best_result = None
-    best_obj = np.inf
-
-    for w1_test, w2_test in weight_options:
-        x0 = [beta, gamma, N, I0]
-        bounds = [(1e-6, None), (1e-6, None), (1e3, Nmax), (1.0, Nmax)]
-
-        result = minimize(
-            objective_function,
-            x0,
-            args=(C, t, w1_test, w2_test),
-            bounds=bounds,
-            method='L-BFGS-B',
-            options={'maxiter': max_iter or 10000, 'disp': False}
-        )
-
-        if result.success and result.fun < best_obj:
-            best_result = result
-            best_obj = result.fun
-            w1_final, w2_final = w1_test, w2_test
-
-    if best_result is None:
-        print(f'Falha na otimização para {country}')
-        return None
-
-    beta, gamma, N, I0 = best_result.x
+    bounds = [(1e-6, None), (1e-6, None), (1e3, Nmax), (1.0, Nmax)]
+    x_ini = [beta, gamma, N, I0]
+    salvo = None
+    if cache is not None:
+        config = {'modelo': 'SIRC2', 'ajuste': 'fit_virus', 'metodo': 'L-BFGS-B',
+                  'limites': bounds, 'pesos': weight_options, 'maxit': max_iter}
+        chave = cache.chave(C, config)
+        salvo = cache.obter(chave)
+        if salvo is None:
+            p_ini = cache.mais_proximo(C, config)
+            if p_ini is not None:
+                x_ini = [p_ini['beta'], p_ini['gamma'], p_ini['N'], p_ini['I0']]
+
+    if salvo is not None:
+        best_x = salvo['payload']['x']
+        best_obj = salvo['payload']['fmin']
+        w1_final, w2_final = salvo['payload']['pesos']
+    else:
+        best_result = None
+        best_obj = np.inf
+
+        for w1_test, w2_test in weight_options:
+            x0 = list(x_ini)
+
+            result = minimize(
+                objective_gradient,
+                x0,
+                args=(C, t, w1_test, w2_test),
+                jac=True,
+                bounds=bounds,
+                method='L-BFGS-B',
+                options={'maxiter': max_iter or 10000, 'disp': False}
+            )
+
+            if result.success and result.fun < best_obj:
+                best_result = result
+                best_obj = result.fun
+                w1_final, w2_final = w1_test, w2_test
+
+        if best_result is None:
+            print(f'Falha na otimização para {country}')
+            return None
+
+        best_x = best_result.x
+        if cache is not None:
+            cache.guardar(chave, C, config,
+                          dict(zip(['beta', 'gamma', 'N', 'I0'], best_x)),
+                          {'x': best_x, 'fmin': best_obj,
+                           'pesos': (w1_final, w2_final)})
+
+    beta, gamma, N, I0 = best_x
     R0 = beta / gamma
 
     # =============================================================================
     # Simulação com os parâmetros otimizados
     # =============================================================================
 
+    # uma tabela de quadratura; ajuste, previsão e gráficos a reamostram
     t_extended = np.linspace(0, len(C) + 60, 500)
-    Ca = odeint(sir_ode, I0, t_extended, args=(beta, gamma, N, I0)).flatten()
-    Ce = odeint(sir_ode, I0, t, args=(beta, gamma, N, I0)).flatten()
-    next_day_forecast = Ca[len(C)]
+    t_daily = np.arange(int(t_extended[-1]) + 1)
+    Ca = C_SIRC2(t_extended, N, beta, gamma, I0)
+    Cd = C_SIRC2(t_daily, N, beta, gamma, I0)
+    Ce = Cd[:len(C)]
+    next_day_forecast = Cd[len(C)]
 
     # =============================================================================
     # Estatísticas: R², RMSE
@@ -122,14 +156,14 @@ def fit_virus(get_data, **kwargs):
 
     daily_C = np.diff(C)
     daily_Ce = np.diff(Ce)
-    daily_forecast = np.diff(Ca)
+    daily_forecast = np.diff(Cd)
 
     tm_index = np.argmax(daily_Ce)
     tm_day = t[tm_index]
     tm_date = date0 + timedelta(days=int(tm_day))
 
     tend_index = np.where(daily_forecast < 1)[0]
-    tend_day = int(t_extended[tend_index[0]]) if len(tend_index) > 0 else int(t_extended[-1])
+    tend_day = int(t_daily[tend_index[0] + 1]) if len(tend_index) > 0 else int(t_daily[-1])
     tend_date = date0 + timedelta(days=tend_day)
 
     # =============================================================================
@@ -212,7 +246,7 @@ def sir_ode(C, t, beta, gamma, N, I0):
 def objective_function(params, C, t, w1, w2):
     beta, gamma, N, I0 = params
     try:
-        sol = odeint(sir_ode, I0, t, args=(beta, gamma, N, I0)).flatten()
+        sol = C_SIRC2(t, N, beta, gamma, I0)
     except Exception:
         return np.inf
     if np.any(np.isnan(sol)):
@@ -224,33 +258,30 @@ def objective_function(params, C, t, w1, w2):
     f2 = np.linalg.norm(np.diff(C) - np.diff(sol))
     return c1 * f1 + c2 * f2
 
+def objective_gradient(params, C, t, w1, w2):
+    # Mesmo objetivo de objective_function (quadratura do SIRC2), com o
+    # gradiente analítico das sensibilidades tiradas da mesma tabela
+    beta, gamma, N, I0 = params
+    try:
+        sol, S = sens_SIRC2(t, N, beta, gamma, I0)
+    except Exception:
+        return np.inf, np.zeros(4)
+    if not (np.all(np.isfinite(sol)) and np.all(np.isfinite(S))):
+        return np.inf, np.zeros(4)
+    S = S[:, [1, 2, 0, 3]]  # (N, beta, gamma, I0) -> (beta, gamma, N, I0)
+
+    c1 = w1 / (w1 + w2)
+    c2 = w2 / (w1 + w2)
+    r = C - sol
+    dr = np.diff(C) - np.diff(sol)
+    f1 = np.linalg.norm(r)
+    f2 = np.linalg.norm(dr)
+    grad = np.zeros(4)
+    if c1 > 0 and f1 > 0:
+        grad -= c1 * (r @ S) / f1
+    if c2 > 0 and f2 > 0:
+        grad -= c2 * (dr @ np.diff(S, axis=0)) / f2
+    return c1 * f1 + c2 * f2, grad
+
 def initial_guess(C):
-    n = len(C)
-    if n <= 5:
-        return None
-    for i in range(n - 5):
-        k1 = i
-        k3 = n - 1
-        k2 = (k1 + k3) // 2
-        m = k2 - k1
-        if m < 1 or any(np.isnan(C[[k1, k2, k3]])):
-            continue
-        q = C[k2] ** 2 - C[k3] * C[k1]
-        if q <= 0:
-            continue
-        p = C[k1] * C[k2] - 2 * C[k1] * C[k3] + C[k2] * C[k3]
-        if p <= 0:
-            continue
-        K = C[k2] * p / q
-        try:
-            r = np.log((C[k3] * (C[k2] - C[k1])) / (C[k1] * (C[k3] - C[k2]))) / m
-        except:
-            continue
-        if r < 0:
-            continue
-        A = ((C[k3] - C[k2]) * (C[k2] - C[k1]) / q) * \
-            ((C[k3] * (C[k2] - C[k1])) / (C[k1] * (C[k3] - C[k2]))) ** ((k3 - m) / m)
-        if A <= 0:
-            continue
-        return [K, r, A]
-    return None
+    return initial_SIRC(C)
@@ -1,14 +1,103 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
 import pandas as pd
+import pyarrow.dataset as ds
 
-def carregar_dados(path, estado='PA', cidade=None):
-    df = pd.read_parquet(path)
-    df['date'] = pd.to_datetime(df['date'])
+try:
+    import fcntl
+except ImportError:  # sem flock (Windows): trava vira no-op
+    fcntl = None
+
+COLUNAS_ESTADO = ['date', 'state', 'new_confirmed']
+
+
+@contextmanager
+def _trava(caminho):
+    with open(caminho, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _cache_estados(path, cache_dir):
+    """
+    Diretório do cache particionado por estado (hive, state=UF) do caso_full.
+
+    O cache é montado na primeira chamada a partir do caso_full, em streaming
+    (lote a lote, sem carregar o arquivo inteiro), e refeito quando o
+    arquivo de origem muda (mtime/tamanho): cada versão fica em um
+    subdiretório com o hash da origem. A montagem é feita sob uma trava, em
+    um diretório temporário renomeado no fim (os.replace), de modo que
+    vários processos no mesmo cache_dir nunca leem uma partição incompleta.
+    """
+    info = os.stat(path)
+    origem = json.dumps([os.path.abspath(path), info.st_mtime, info.st_size])
+    versao = os.path.join(cache_dir, hashlib.sha256(origem.encode()).hexdigest()[:16])
+    if os.path.isdir(versao):
+        return versao
 
+    os.makedirs(cache_dir, exist_ok=True)
+    with _trava(os.path.join(cache_dir, '.lock')):
+        if not os.path.isdir(versao):  # outro processo pode ter montado
+            tmp = tempfile.mkdtemp(dir=cache_dir, prefix='.montando-')
+            try:
+                ds.write_dataset(ds.dataset(path, format='parquet'), tmp,
+                                 format='parquet', partitioning=['state'],
+                                 partitioning_flavor='hive')
+                os.replace(tmp, versao)
+            except BaseException:
+                shutil.rmtree(tmp, ignore_errors=True)
+                raise
+        # versões de origens antigas (ninguém mais as monta sob a trava)
+        for nome in os.listdir(cache_dir):
+            antigo = os.path.join(cache_dir, nome)
+            if antigo != versao and not nome.startswith('.') and os.path.isdir(antigo):
+                shutil.rmtree(antigo, ignore_errors=True)
+    return versao
+
+
+def carregar_dados(path, estado='PA', cidade=None, cache_dir=None):
+    """
+    Carrega a série diária de um estado (e opcionalmente de uma cidade).
+
+    Lê apenas as colunas necessárias e empurra o filtro de estado/cidade para
+    o leitor do parquet (row groups descartados pelas estatísticas), em vez de
+    carregar o caso_full inteiro.
+
+    input:
+    path      : caminho do caso_full.parquet
+    estado    : sigla do estado
+    cidade    : nome da cidade (opcional)
+    cache_dir : diretório de um cache particionado por estado (opcional,
+                criado no primeiro uso)
+
+    Output:
+    df_estado, df_cidade (ou None)
+    """
+    # com o cache, o filtro de estado só abre o diretório state=UF (e um
+    # estado sem partição dá o mesmo DataFrame vazio que a leitura direta)
+    fonte = _cache_estados(path, cache_dir) if cache_dir else path
+    filtro_estado = [('state', '==', estado)]
+
+    df = pd.read_parquet(fonte, columns=COLUNAS_ESTADO, filters=filtro_estado)
+    df['state'] = estado
+    df['date'] = pd.to_datetime(df['date'])
     df_estado = df.groupby(['date', 'state'])['new_confirmed'].sum().reset_index()
-    df_estado = df_estado[df_estado['state'] == estado]
 
     if cidade:
-        df_cidade = df[(df['city'] == cidade) & (df['state'] == estado)]
+        filtro_cidade = [('city', '==', cidade)] + filtro_estado
+        df_cidade = pd.read_parquet(fonte, filters=filtro_cidade)
+        df_cidade['state'] = estado
+        df_cidade['date'] = pd.to_datetime(df_cidade['date'])
         return df_estado, df_cidade
 
     return df_estado, None
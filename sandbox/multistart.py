@@ -0,0 +1,221 @@
+"""
+Ajuste multistart do SIRC com reinícios paralelos.
+
+As sementes partem da estimativa logística (initial_SIRC), com a mesma
+conversão de ajustar_modelo, seguida dos melhores trios logísticos de
+estimativas_SIRC e de perturbações por hipercubo latino em escala log.
+Os reinícios rodam em um pool de processos, em rodadas de max_workers,
+e a busca para quando o melhor custo deixa de melhorar.
+As otimizações locais trabalham em log(parâmetro), com o jacobiano
+analítico de solve_sirc_sens.
+
+Exemplo:
+    solucoes = ajustar_multistart(y, n_reinicios=32, max_workers=8)
+    melhor = solucoes[0]['params']
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.optimize import least_squares, minimize
+from scipy.stats import qmc
+
+from sirc_model import solve_sirc_sens, initial_SIRC, estimativas_SIRC
+
+PARAMS = ['beta', 'gamma', 'N', 'I0']  # ordem das colunas de solve_sirc_sens
+METODOS = ('least_squares', 'L-BFGS-B', 'TNC', 'Nelder-Mead')
+
+
+def _converter(K, r, A):
+    gamma = 2 * r
+    return {'beta': 1.5 * gamma, 'gamma': gamma, 'N': 2 * K, 'I0': K / (A + 1)}
+
+
+def chute_inicial(y):
+    """
+    Parâmetros iniciais do SIRC a partir da logística (como em ajustar_modelo).
+    """
+    b0 = initial_SIRC(y)
+    if b0 is None:
+        raise ValueError('initial_SIRC: sem estimativa inicial para a série')
+    return _converter(*b0)
+
+
+def chutes_ranqueados(y, n=8):
+    """
+    Até n parâmetros iniciais, dos trios logísticos de melhor ajuste à série.
+    """
+    cand, _ = estimativas_SIRC(y, max_candidatos=n)
+    return [_converter(*c) for c in cand if np.all(np.isfinite(c))]
+
+
+def limites_padrao(y, p0):
+    """
+    Limites (min, max) de cada parâmetro para a série y.
+    """
+    y_max = float(np.max(y))
+    return {'beta': (1e-3, 3.0), 'gamma': (1e-3, 2.0),
+            'N': (max(y_max, 1.0), max(100 * p0['N'], 10 * y_max)),
+            'I0': (1e-3, max(100 * p0['I0'], float(y[0]) + 1, 1.0))}
+
+
+def _residuo_jac(x, y, t, livres, fixos):
+    p = dict(fixos)
+    p.update(zip(livres, np.exp(x)))
+    C, dC = solve_sirc_sens(t, p['N'], p['beta'], p['gamma'], p['I0'])
+    cols = [PARAMS.index(nome) for nome in livres]
+    # derivada em log(p): dC/dlog(p) = p dC/dp
+    return C - y, dC[:, cols] * np.exp(x)
+
+
+def rodar_reinicio(tarefa):
+    """
+    Uma otimização local do SIRC em log(parâmetro) (um reinício).
+
+    input:
+    tarefa : (x0, y, t, livres, fixos, lim, metodo), com x0 e lim (k, 2) em
+             log dos parâmetros livres, fixos um dict e metodo de METODOS
+
+    Output:
+    dict com x0, metodo, custo, sucesso, nfev, params (None se falhar), R0
+    e erro
+    """
+    x0, y, t, livres, fixos, lim, metodo = tarefa
+    lo, hi = lim[:, 0], lim[:, 1]
+    try:
+        if metodo == 'least_squares':
+            cache = {}
+
+            def fun(x):
+                cache['x'] = x.copy()
+                cache['rj'] = _residuo_jac(x, y, t, livres, fixos)
+                return cache['rj'][0]
+
+            def jac(x):
+                if 'x' not in cache or not np.array_equal(cache['x'], x):
+                    fun(x)
+                return cache['rj'][1]
+
+            res = least_squares(fun, x0, jac=jac, bounds=(lo, hi), method='trf')
+            x, nfev, sucesso = res.x, res.nfev, res.success
+        else:
+            def fun(x):
+                r, J = _residuo_jac(x, y, t, livres, fixos)
+                return 0.5 * r @ r, J.T @ r
+
+            usa_jac = metodo != 'Nelder-Mead'
+            alvo = fun if usa_jac else (lambda x: fun(x)[0])
+            res = minimize(alvo, x0, jac=usa_jac, method=metodo,
+                           bounds=list(zip(lo, hi)))
+            x, nfev, sucesso = res.x, res.nfev, res.success
+        r, _ = _residuo_jac(x, y, t, livres, fixos)
+        custo = float(r @ r)
+        if not np.isfinite(custo):
+            raise FloatingPointError('custo não finito')
+    except Exception as erro:
+        return {'x0': x0, 'metodo': metodo, 'custo': np.inf, 'sucesso': False,
+                'nfev': 0, 'params': None, 'erro': f'{type(erro).__name__}: {erro}'}
+
+    params = dict(fixos)
+    params.update(zip(livres, np.exp(x)))
+    return {'x0': x0, 'metodo': metodo, 'custo': custo, 'sucesso': bool(sucesso),
+            'nfev': int(nfev), 'params': params,
+            'R0': params['beta'] / params['gamma'], 'erro': None}
+
+
+def _sementes(x0, lim, n, largura, seed, extras=()):
+    """
+    x0, as sementes extras (distintas de x0) e pontos de hipercubo latino em
+    torno de x0 (escala log) até completar n.
+    """
+    sementes = [x0]
+    for x in extras:
+        x = np.clip(x, lim[:, 0], lim[:, 1])
+        if len(sementes) < n and not any(np.allclose(x, s, atol=1e-3) for s in sementes):
+            sementes.append(x)
+    if len(sementes) >= n:
+        return np.vstack(sementes[:max(n, 1)])
+    lo = np.maximum(x0 - largura, lim[:, 0])
+    hi = np.minimum(x0 + largura, lim[:, 1])
+    amostra = qmc.LatinHypercube(d=x0.size, seed=seed).random(n - len(sementes))
+    return np.vstack(sementes + [qmc.scale(amostra, lo, hi)])
+
+
+def ajustar_multistart(y, n_reinicios=32, max_workers=None, metodos=('least_squares',),
+                       livres=PARAMS, limites=None, p0=None, largura=np.log(3.0),
+                       paciencia=2, rtol=1e-6, seed=0, n_logisticos=4):
+    """
+    Ajuste multistart do SIRC a uma série de casos acumulados.
+
+    input:
+    y           : casos acumulados
+    n_reinicios : número máximo de otimizações locais
+    max_workers : processos em paralelo (None = os.cpu_count())
+    metodos     : métodos locais usados em rodízio entre os reinícios
+                  ('least_squares', 'L-BFGS-B', 'TNC', 'Nelder-Mead')
+    livres      : parâmetros ajustados; os demais ficam fixos em p0
+    limites     : dict {parametro: (min, max)} (padrão: limites_padrao)
+    p0          : parâmetros iniciais (padrão: chute_inicial(y))
+    largura     : meia-largura das perturbações em log(parâmetro)
+    paciencia   : rodadas seguidas sem melhora relativa > rtol para parar
+    seed        : semente do hipercubo latino
+    n_logisticos: sementes tiradas dos melhores trios de estimativas_SIRC
+
+    Output:
+    lista de soluções (dicts com params, custo, R0, metodo, nfev, sucesso)
+    ordenada pelo custo, sem repetir soluções equivalentes
+    """
+    for m in metodos:
+        if m not in METODOS:
+            raise ValueError(f'Método desconhecido: {m}. Disponíveis: {METODOS}')
+    y = np.asarray(y, dtype=float)
+    t = np.arange(len(y))
+    p0 = p0 or chute_inicial(y)
+    limites = limites or limites_padrao(y, p0)
+    livres = list(livres)
+    fixos = {k: v for k, v in p0.items() if k not in livres}
+
+    lim = np.log([limites[k] for k in livres])
+    x0 = np.clip(np.log([p0[k] for k in livres]), lim[:, 0], lim[:, 1])
+    extras = [np.log([c[k] for k in livres]) for c in chutes_ranqueados(y, n_logisticos)
+              if all(c[k] > 0 for k in livres)] if n_logisticos else []
+    sementes = _sementes(x0, lim, n_reinicios, largura, seed, extras)
+
+    max_workers = max_workers or os.cpu_count()
+    solucoes = []
+    melhor, sem_melhora = np.inf, 0
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        for ini in range(0, len(sementes), max_workers):
+            rodada = [(x, y, t, livres, fixos, lim, metodos[(ini + i) % len(metodos)])
+                      for i, x in enumerate(sementes[ini:ini + max_workers])]
+            solucoes.extend(pool.map(rodar_reinicio, rodada))
+
+            atual = min(s['custo'] for s in solucoes)
+            if np.isfinite(melhor) and melhor - atual <= rtol * abs(melhor):
+                sem_melhora += 1
+            else:
+                sem_melhora = 0
+            melhor = min(melhor, atual)
+            if sem_melhora >= paciencia:
+                break
+
+    return _ordenar(solucoes, livres)
+
+
+def _ordenar(solucoes, livres, tol=1e-3):
+    """
+    Ordena pelo custo e remove soluções equivalentes (mesmo ponto em log).
+    """
+    ordenadas = sorted(solucoes, key=lambda s: s['custo'])
+    distintas = []
+    for s in ordenadas:
+        if s['params'] is None:
+            distintas.append(s)
+            continue
+        x = np.log([s['params'][k] for k in livres])
+        if any(d['params'] is not None and
+               np.allclose(x, np.log([d['params'][k] for k in livres]), atol=tol)
+               for d in distintas):
+            continue
+        distintas.append(s)
+    return distintas
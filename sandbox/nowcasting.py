@@ -0,0 +1,201 @@
+"""
+Nowcasting de óbitos com atraso de notificação (obitos_delay_para.csv).
+
+Cada óbito tem a data do fato (DATA_FATO) e a data da publicação (DATA_POST).
+Na data de corte T, os óbitos dos últimos dias ainda não foram todos
+publicados. Ajustar o SIRC nessa série truncada puxa beta para baixo.
+
+A partir dos registros publicados até T monta-se o triângulo de notificação
+M[local, dia do fato, atraso] com um único np.bincount. A distribuição do
+atraso é estimada no sentido reverso do tempo, para corrigir o truncamento
+à direita: P(D <= d | D <= d + 1) usa só os dias de fato em que os atrasos
+d e d + 1 já seriam observáveis (fato <= T - d - 1). Daí
+
+    F(d) = prod_{k >= d} P(D <= k | D <= k + 1)
+
+Entram só os fatos da janela móvel (T - janela, T], de modo que a
+distribuição acompanha mudanças no fluxo de notificação (no arquivo do
+Pará os atrasos só aparecem nas publicações a partir de 18/05/2020, e
+janelas longas misturam os dois regimes). Por município, F
+é estimada com os registros do município, puxada para a F estadual com
+peso forca_agregada (municípios pequenos ficam próximos da estadual).
+O nowcast de cada dia é observados / F(T - dia), com o fator limitado a
+fator_max.
+
+Exemplo:
+    reg = ler_obitos('obitos_delay_para.csv')
+    nc = nowcast(reg, corte='2020-05-25', janela=21)
+    result, t, y, nc = ajustar_nowcast(reg, corte='2020-05-25')
+"""
+import numpy as np
+import pandas as pd
+
+from fit_model import ajustar_modelo
+
+COLUNAS = ['LOCAL', 'DATA_FATO', 'DATA_POST']
+
+
+def ler_obitos(caminho, local=None):
+    """
+    Lê o registro de óbitos (datas dd/mm/aaaa) com conversão vetorizada.
+
+    Output:
+    DataFrame com local (categoria), fato e post (datetime64)
+    """
+    df = pd.read_csv(caminho, usecols=COLUNAS, dtype={'LOCAL': 'category'})
+    reg = pd.DataFrame({
+        'local': df['LOCAL'],
+        'fato': pd.to_datetime(df['DATA_FATO'], format='%d/%m/%Y', cache=True),
+        'post': pd.to_datetime(df['DATA_POST'], format='%d/%m/%Y', cache=True),
+    })
+    reg = reg[reg['post'] >= reg['fato']]
+    if local is not None:
+        reg = reg[reg['local'] == local]
+    return reg.reset_index(drop=True)
+
+
+# =============================================================================
+# Triângulo de notificação e distribuição do atraso
+# =============================================================================
+
+def triangulo(reg, corte=None, janela=None, max_atraso=None, por_local=True):
+    """
+    Contagens M[local, dia do fato, atraso] dos registros publicados até o corte.
+
+    input:
+    reg        : saída de ler_obitos
+    corte      : data de corte T (None = última publicação)
+    janela     : só fatos em (T - janela, T] (None = todos)
+    max_atraso : maior atraso considerado (atrasos maiores são somados nele)
+    por_local  : se False, um único estrato com o total
+
+    Output:
+    M (locais, dias, max_atraso + 1), datas dos dias (datetime64[D]), locais
+    """
+    T = (reg['post'].max() if corte is None else pd.Timestamp(corte)).to_datetime64()
+    fato = reg['fato'].to_numpy('datetime64[D]')
+    post = reg['post'].to_numpy('datetime64[D]')
+    ok = post <= T
+    if janela is not None:
+        ok &= fato > T - np.timedelta64(janela, 'D')
+    if not ok.any():
+        raise ValueError(f'Nenhum registro publicado até {np.datetime64(T, "D")} na janela')
+    inicio = fato[ok].min()
+    dia = (fato[ok] - inicio).astype(int)
+    atraso = (post[ok] - fato[ok]).astype(int)
+    n_dias = int((np.datetime64(T, 'D') - inicio).astype(int)) + 1
+    if max_atraso is None:
+        max_atraso = int(atraso.max())
+    atraso = np.minimum(atraso, max_atraso)
+    if por_local:
+        codigos, locais = pd.factorize(reg['local'].to_numpy()[ok], sort=True)
+        locais = list(locais)
+    else:
+        codigos, locais = np.zeros(dia.size, dtype=int), ['TOTAL']
+    D = max_atraso + 1
+    M = np.bincount((codigos * n_dias + dia) * D + atraso,
+                    minlength=len(locais) * n_dias * D).reshape(len(locais), n_dias, D)
+    return M, inicio + np.arange(n_dias), locais
+
+
+def distribuicao_atraso(M):
+    """
+    F(d) = P(atraso <= d) por estrato, corrigida do truncamento à direita.
+
+    input:
+    M : triângulo (estratos, dias, D); o último dia é o corte
+
+    Output:
+    F (estratos, D), n (estratos,) registros usados
+    """
+    L, n_dias, D = M.shape
+    # R[l, f, d] = registros com fato <= f e atraso <= d
+    R = np.cumsum(np.cumsum(M, axis=2), axis=1)
+    d = np.arange(D - 1)
+    f = n_dias - 2 - d  # último fato em que d + 1 é observável
+    valido = f >= 0
+    A = np.zeros((L, D - 1))
+    B = np.zeros((L, D - 1))
+    A[:, valido] = R[:, f[valido], d[valido]]
+    B[:, valido] = R[:, f[valido], d[valido] + 1]
+    razao = np.where(B > 0, A / np.where(B > 0, B, 1.0), 1.0)
+    # F(D - 1) = 1; F(d) = F(d + 1) * razao(d)
+    F = np.ones((L, D))
+    F[:, :-1] = np.cumprod(razao[:, ::-1], axis=1)[:, ::-1]
+    return F, M.sum(axis=(1, 2))
+
+
+# =============================================================================
+# Nowcast
+# =============================================================================
+
+def nowcast(reg, corte=None, janela=21, max_atraso=None, por_local=True,
+            forca_agregada=20.0, fator_max=10.0):
+    """
+    Óbitos diários corrigidos do atraso de notificação na data de corte.
+
+    input:
+    reg            : saída de ler_obitos
+    corte          : data de corte (None = última publicação; não pode ser
+                     posterior a ela)
+    janela         : dias de fatos usados para estimar o atraso (janela móvel)
+    max_atraso     : maior atraso (None = maior observado na janela)
+    por_local      : estratifica por município
+    forca_agregada : peso (em registros) da distribuição estadual na de
+                     cada município
+    fator_max      : limite do fator de inflação dos últimos dias
+
+    Output:
+    dict com datas, locais, observados e nowcast (locais, dias), fator
+    (locais, dias), F (locais, D) e F_estadual (D,)
+    """
+    ultima = reg['post'].max()
+    corte = ultima if corte is None else pd.Timestamp(corte)
+    if corte > ultima:
+        # os dias depois da última publicação não foram observados (não são
+        # zeros) e virariam casos nulos no ajuste
+        raise ValueError(f'corte {corte.date()} depois da última publicação '
+                         f'({ultima.date()})')
+    Mj, _, _ = triangulo(reg, corte, janela, max_atraso, por_local=False)
+    F_est = distribuicao_atraso(Mj)[0][0]
+    D = F_est.size
+
+    M, datas, locais = triangulo(reg, corte, None, D - 1, por_local)
+    if por_local:
+        Mjl, _, locais_j = triangulo(reg, corte, janela, D - 1, por_local=True)
+        Fl, n = distribuicao_atraso(Mjl)
+        peso = (n / (n + forca_agregada))[:, None]
+        Fj = peso * Fl + (1 - peso) * F_est
+        F = np.tile(F_est, (len(locais), 1))
+        F[[locais.index(l) for l in locais_j]] = Fj
+    else:
+        F = F_est[None, :]
+
+    observados = M.sum(axis=2).astype(float)
+    # atraso máximo ainda possível para cada dia de fato
+    decorrido = np.minimum(np.arange(len(datas))[::-1], D - 1)
+    fator = np.minimum(1.0 / np.maximum(F[:, decorrido], 1.0 / fator_max), fator_max)
+    return {'datas': datas, 'locais': locais, 'observados': observados,
+            'nowcast': observados * fator, 'fator': fator, 'F': F, 'F_estadual': F_est}
+
+
+def serie_nowcast(nc, local=None, acumulada=True):
+    """
+    Série diária (ou acumulada) do nowcast para um município ou o total.
+    """
+    linhas = slice(None) if local is None else [nc['locais'].index(local)]
+    y = nc['nowcast'][linhas].sum(axis=0)
+    return np.cumsum(y) if acumulada else y
+
+
+def ajustar_nowcast(reg, corte=None, local=None, janela=21, verbose=False, **kws):
+    """
+    ajustar_modelo nos óbitos acumulados corrigidos pelo nowcast.
+
+    Output:
+    result, t, y (série acumulada ajustada), nc (saída de nowcast)
+    """
+    nc = nowcast(reg, corte, janela, por_local=local is not None, **kws)
+    y = serie_nowcast(nc, local)
+    result, t = ajustar_modelo(y, verbose=verbose)
+    return result, t, y, nc
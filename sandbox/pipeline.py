@@ -0,0 +1,129 @@
+"""
+Pipeline de ajuste do SIRC para todas as regiões do caso_full (Brasil.io).
+
+Lê o parquet uma única vez, monta a série acumulada de cada estado e de cada
+município, distribui os ajustes (ajustar_modelo) em um pool de processos com
+número limitado de workers e grava uma tabela única com parâmetros, R0,
+estatísticas do ajuste e falhas.
+
+Uso:
+    python pipeline.py caso_full.parquet resultados.parquet --workers 8
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from fit_model import ajustar_modelo
+
+COLUNAS = ['date', 'state', 'city', 'place_type', 'new_confirmed']
+RESULTADOS = ['estado', 'cidade', 'n_dias', 'casos', 'N', 'beta', 'gamma',
+              'I0', 'R0', 'chisqr', 'redchi', 'aic', 'bic', 'R2', 'RMSE',
+              'nfev', 'sucesso', 'erro']
+
+
+def agrupar_series(path, dias=None, municipios=True):
+    """
+    Lê o caso_full uma vez e separa a série de casos acumulados por região.
+
+    Estados usam as linhas place_type == 'state'; municípios as linhas
+    place_type == 'city' (sem somar as duas, que se sobrepõem).
+
+    input:
+    path       : caminho do caso_full.parquet
+    dias       : número de dias iniciais usados de cada série (None = todos)
+    municipios : se False, gera apenas as séries estaduais
+
+    Output:
+    lista de ((estado, cidade ou None), array de casos acumulados)
+    """
+    df = pd.read_parquet(path, columns=COLUNAS)
+    if not municipios:
+        df = df[df['place_type'] == 'state']
+    df = df.sort_values('date')
+    df['cidade'] = df['city'].where(df['place_type'] == 'city')
+
+    series = []
+    for (estado, cidade), grupo in df.groupby(['state', 'cidade'],
+                                              dropna=False, sort=True):
+        y = np.cumsum(grupo['new_confirmed'].fillna(0).to_numpy(float))
+        if dias is not None:
+            y = y[:dias]
+        cidade = None if pd.isna(cidade) else cidade
+        series.append(((estado, cidade), y))
+    return series
+
+
+def _ajustar_regiao(tarefa):
+    (estado, cidade), y = tarefa
+    linha = {'estado': estado, 'cidade': cidade, 'n_dias': len(y),
+             'casos': float(y[-1]) if len(y) else 0.0}
+    try:
+        result, t = ajustar_modelo(y, verbose=False)
+        p = result.params
+        ss_tot = np.sum((y - y.mean()) ** 2)
+        linha.update({
+            'N': p['N'].value, 'beta': p['beta'].value,
+            'gamma': p['gamma'].value, 'I0': p['I0'].value,
+            'R0': p['beta'].value / p['gamma'].value,
+            'chisqr': result.chisqr, 'redchi': result.redchi,
+            'aic': result.aic, 'bic': result.bic,
+            'R2': 1 - result.chisqr / ss_tot if ss_tot > 0 else np.nan,
+            'RMSE': np.sqrt(result.chisqr / len(y)),
+            'nfev': result.nfev, 'sucesso': bool(result.success), 'erro': None,
+        })
+    except Exception as erro:  # falha de uma região não derruba o lote
+        linha.update({'sucesso': False, 'erro': f'{type(erro).__name__}: {erro}'})
+    return linha
+
+
+def executar_pipeline(path, saida=None, max_workers=None, dias=None,
+                      municipios=True, chunksize=16):
+    """
+    Ajusta o SIRC para todas as regiões em paralelo.
+
+    input:
+    path        : caminho do caso_full.parquet
+    saida       : arquivo de resultados (.parquet ou .csv); None = não grava
+    max_workers : número máximo de processos (None = os.cpu_count())
+    dias        : número de dias iniciais usados de cada série
+    municipios  : incluir os municípios além dos estados
+    chunksize   : regiões enviadas por vez a cada worker
+
+    Output:
+    DataFrame com uma linha por região
+    """
+    series = agrupar_series(path, dias=dias, municipios=municipios)
+    max_workers = max_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        linhas = list(pool.map(_ajustar_regiao, series, chunksize=chunksize))
+
+    resultados = pd.DataFrame(linhas, columns=RESULTADOS)
+    if saida:
+        if str(saida).endswith('.parquet'):
+            resultados.to_parquet(saida, index=False)
+        else:
+            resultados.to_csv(saida, index=False)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('caso_full')
+    parser.add_argument('saida')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--dias', type=int, default=None)
+    parser.add_argument('--so-estados', action='store_true')
+    args = parser.parse_args()
+
+    resultados = executar_pipeline(args.caso_full, args.saida,
+                                   max_workers=args.workers, dias=args.dias,
+                                   municipios=not args.so_estados)
+    falhas = (~resultados['sucesso']).sum()
+    print(f'{len(resultados)} regiões ajustadas, {falhas} falhas -> {args.saida}')
+
+
+if __name__ == '__main__':
+    main()
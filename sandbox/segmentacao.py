@@ -0,0 +1,347 @@
+"""
+Ajuste segmentado do SIRC em séries longas (várias ondas).
+
+Um único SIRC não descreve 2020-2022 inteiro, e por isso main.py e os
+notebooks cortam a série nos primeiros 150-180 dias. Aqui as mudanças de
+regime são detectadas na taxa de crescimento dos casos (diferença do log
+da incidência semanal) por PELT (penalidade) ou por partição ótima (número
+de segmentos fixo). O custo de cada segmento é o resíduo de uma reta, em
+O(1) por somas acumuladas. Dentro de uma onda a taxa cai aos poucos, e o
+PELT também marca mudanças de ritmo. novas_ondas() mantém só as quebras
+em que a taxa salta para cima, ou seja, o início de uma nova onda; na
+partição ótima o mesmo critério restringe de antemão onde cabe uma quebra.
+
+Cada segmento é ajustado como uma onda SIRC própria sobre o acumulado
+observado no seu início:
+
+    C(t) = y[a] - ancora + C_SIRC(t - a),   a <= t < b
+
+com a âncora (e o chute de I0) igual à incidência da última semana antes
+de a. Ancorados nos dados, os segmentos são independentes e são ajustados
+em paralelo. Com encadear=True, uma segunda passada sequencial semeia
+cada segmento com o estado I do ajuste anterior na fronteira e fica com
+o reajuste quando ele tem custo menor.
+
+Exemplo:
+    seg = ajustar_segmentado(y, min_tamanho=28, max_workers=8)
+    seg['quebras'], seg['tabela'][['inicio', 'fim', 'R0']]
+    plot_ajuste(x, y, seg['C_ajuste'], seg['residuo'].std())
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.integrate import odeint
+
+from multistart import rodar_reinicio, chute_inicial, chutes_ranqueados, limites_padrao
+from sirc_model import SIRC, jac_SIRC
+
+COLUNAS = ['inicio', 'fim', 'ancora', 'N', 'beta', 'gamma', 'I0', 'R0', 'custo',
+           'RMSE', 'sucesso', 'erro']
+
+
+# =============================================================================
+# Detecção das mudanças de regime
+# =============================================================================
+
+def taxa_crescimento(y, janela=7):
+    """
+    Taxa de crescimento diária: diferença do log da incidência média móvel.
+
+    input:
+    y      : casos acumulados
+    janela : dias da média móvel da incidência
+
+    Output:
+    array (len(y),), com 0 nos dias iniciais sem janela completa
+    """
+    y = np.maximum.accumulate(np.asarray(y, dtype=float))
+    semanal = y - np.concatenate((np.zeros(janela), y[:-janela]))
+    r = np.diff(np.log1p(semanal / janela), prepend=np.log1p(semanal[0] / janela))
+    r[:janela] = 0.0
+    return r
+
+
+class _CustoLinear:
+    """
+    Resíduo de mínimos quadrados de uma reta em x[a:b], em O(1) por
+    segmento, por somas acumuladas de 1, t, t^2, x, t x e x^2.
+    """
+
+    def __init__(self, x):
+        x = np.asarray(x, dtype=float)
+        t = np.arange(x.size, dtype=float)
+        acum = lambda v: np.concatenate(([0.0], np.cumsum(v)))
+        self.S = [acum(v) for v in (np.ones_like(x), t, t * t, x, t * x, x * x)]
+
+    def __call__(self, a, b):
+        # a, b: inteiros ou arrays (broadcast), segmentos [a, b)
+        n, st, stt, sx, stx, sxx = (s[b] - s[a] for s in self.S)
+        vt = stt - st * st / n
+        vx = sxx - sx * sx / n
+        ctx = stx - st * sx / n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            r = vx - np.where(vt > 0, ctx * ctx / vt, 0.0)
+        return np.maximum(r, 0.0)
+
+
+def _variancia_ruido(x, custo, tamanho):
+    # variância residual típica de uma reta em janelas do menor segmento: mede
+    # o quanto a série se afasta de uma reta dentro de um mesmo regime
+    inicios = np.arange(0, x.size - tamanho + 1, tamanho)
+    return max(np.median(custo(inicios, inicios + tamanho)) / max(tamanho - 2, 1), 1e-12)
+
+
+def pelt(x, penalidade=None, min_tamanho=42):
+    """
+    Mudanças de regime por PELT (Killick et al., 2012) com custo linear.
+
+    input:
+    x           : série (ex. taxa_crescimento)
+    penalidade  : custo de cada quebra (None = 3 log(n) sigma^2, com sigma^2
+                  a variância residual em janelas de min_tamanho dias)
+    min_tamanho : menor segmento, em dias
+
+    Output:
+    lista de índices das quebras (início de cada segmento após o primeiro)
+    """
+    x = np.asarray(x, dtype=float)
+    n = x.size
+    custo = _CustoLinear(x)
+    if penalidade is None:
+        penalidade = 3.0 * np.log(n) * _variancia_ruido(x, custo, min_tamanho)
+    F = np.full(n + 1, np.inf)
+    F[0] = -penalidade
+    anterior = np.zeros(n + 1, dtype=int)
+    candidatos = np.array([0])
+    for b in range(min_tamanho, n + 1):
+        validos = candidatos[b - candidatos >= min_tamanho]
+        if validos.size:
+            total = F[validos] + custo(validos, b) + penalidade
+            k = np.argmin(total)
+            F[b], anterior[b] = total[k], validos[k]
+            # poda: candidatos que nunca serão ótimos
+            manter = F[candidatos] + custo(candidatos, b) <= F[b]
+            manter |= b - candidatos < min_tamanho
+            candidatos = candidatos[manter]
+        if b + 1 - min_tamanho >= min_tamanho:
+            candidatos = np.append(candidatos, b + 1 - min_tamanho)
+    return _recuar(anterior, n)
+
+
+def particao_otima(x, n_segmentos, min_tamanho=42, permitidas=None):
+    """
+    Partição ótima em exatamente n_segmentos por programação dinâmica
+    (O(n_segmentos n^2), vetorizada por linha).
+
+    permitidas : máscara (len(x) + 1,) dos índices em que pode haver quebra
+                 (None = todos)
+    """
+    x = np.asarray(x, dtype=float)
+    n = x.size
+    if n_segmentos * min_tamanho > n:
+        raise ValueError(f'{n_segmentos} segmentos de {min_tamanho} dias não cabem em {n} dias')
+    custo = _CustoLinear(x)
+    a = np.arange(n + 1)
+    bloqueio = np.zeros(n + 1) if permitidas is None else np.where(permitidas, 0.0, np.inf)
+    F = np.full(n + 1, np.inf)
+    F[min_tamanho:] = custo(0, a[min_tamanho:])
+    anteriores = []
+    for _ in range(n_segmentos - 1):
+        novo = np.full(n + 1, np.inf)
+        arg = np.zeros(n + 1, dtype=int)
+        for b in range(2 * min_tamanho, n + 1):
+            ini = a[:b - min_tamanho + 1]
+            total = F[ini] + bloqueio[ini] + custo(ini, b)
+            k = np.argmin(total)
+            novo[b], arg[b] = total[k], ini[k]
+        anteriores.append(arg)
+        F = novo
+    if not np.isfinite(F[n]):
+        raise ValueError(f'Não há {n_segmentos} segmentos de {min_tamanho} dias com '
+                         'quebras nas posições permitidas')
+    quebras, b = [], n
+    for arg in reversed(anteriores):
+        b = arg[b]
+        quebras.append(int(b))
+    return sorted(quebras)
+
+
+def _recuar(anterior, n):
+    quebras, b = [], n
+    while b > 0:
+        b = anterior[b]
+        if b > 0:
+            quebras.append(int(b))
+    return sorted(quebras)
+
+
+def _medias_janelas(x, janela):
+    # médias de x[q - janela:q] e x[q:q + janela] para q = 0..len(x), com as
+    # janelas truncadas nas bordas (NaN onde uma delas fica vazia)
+    x = np.asarray(x, dtype=float)
+    n = x.size
+    S = np.concatenate(([0.0], np.cumsum(x)))
+    q = np.arange(n + 1)
+    fim, ini = np.minimum(q + janela, n), np.maximum(q - janela, 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        antes = np.where(q > ini, (S[q] - S[ini]) / (q - ini), np.nan)
+        depois = np.where(fim > q, (S[fim] - S[q]) / (fim - q), np.nan)
+    return antes, depois
+
+
+def inicios_onda(x, salto_minimo=0.1, janela=21):
+    """
+    Máscara (len(x) + 1,) dos índices q em que começa uma nova onda: a taxa
+    de crescimento média sobe pelo menos salto_minimo (por dia) entre as
+    janelas antes e depois de q e, depois de q, os casos crescem (taxa
+    média de pelo menos salto_minimo / 4). O fim da queda de uma onda, em
+    que a taxa só volta a ~0 (incidência no patamar), não conta como onda
+    nova.
+    """
+    antes, depois = _medias_janelas(x, janela)
+    return (depois - antes >= salto_minimo) & (depois >= salto_minimo / 4)
+
+
+def novas_ondas(x, quebras, salto_minimo=0.1, janela=21):
+    """
+    Mantém só as quebras que marcam o início de uma nova onda (inicios_onda);
+    mudanças de ritmo dentro da mesma onda são descartadas.
+    """
+    inicio = inicios_onda(x, salto_minimo, janela)
+    return [q for q in quebras if inicio[q]]
+
+
+def detectar_quebras(y, n_segmentos=None, penalidade=None, min_tamanho=42, janela=7,
+                     salto_minimo=0.1):
+    """
+    Quebras de regime na série de casos acumulados y.
+
+    Com n_segmentos, partição ótima em exatamente esse número de segmentos,
+    com quebras só nos inícios de onda (inicios_onda); senão PELT seguido
+    de novas_ondas. salto_minimo=None aceita qualquer mudança de inclinação
+    da taxa, nos dois casos.
+    """
+    r = taxa_crescimento(y, janela)
+    if n_segmentos is not None:
+        permitidas = None
+        if salto_minimo is not None:
+            permitidas = inicios_onda(r, salto_minimo, min_tamanho // 2)
+        return particao_otima(r, n_segmentos, min_tamanho, permitidas)
+    quebras = pelt(r, penalidade, min_tamanho)
+    if salto_minimo is not None:
+        quebras = novas_ondas(r, quebras, salto_minimo, min_tamanho // 2)
+    return quebras
+
+
+# =============================================================================
+# Ajuste por segmento
+# =============================================================================
+
+def _estado_sirc(p, t):
+    y0 = [p['N'] - p['I0'], p['I0'], 0.0, p['I0']]
+    return odeint(SIRC, y0, t, args=(p['N'], p['beta'], p['gamma']), Dfun=jac_SIRC)
+
+
+def _chute_segmento(z):
+    # segmentos que começam já em queda não têm estimativa logística
+    try:
+        return chute_inicial(z)
+    except ValueError:
+        return {'beta': 0.2, 'gamma': 0.1, 'N': max(2 * z[-1], 1.0), 'I0': max(z[0], 1.0)}
+
+
+def _ajustar_segmento(tarefa):
+    """
+    Ajusta uma onda SIRC à série local z = y[a:b] - y[a] + ancora.
+    """
+    (a, b), incrementos, ancora, p0, n_sementes = tarefa
+    z = incrementos + ancora
+    livres = ('beta', 'gamma', 'N', 'I0')
+    t = np.arange(z.size)
+    linha = {'inicio': a, 'fim': b, 'ancora': ancora}
+    try:
+        p0 = p0 or _chute_segmento(z)
+        lim = limites_padrao(z, p0)
+        lim_log = np.log([lim[k] for k in livres])
+        sementes = [np.log([p0[k] for k in livres])]
+        if n_sementes:
+            sementes += [np.log([c[k] for k in livres]) for c in chutes_ranqueados(z, n_sementes)
+                         if all(c[k] > 0 for k in livres)]
+        melhor = None
+        for x0 in sementes:
+            x0 = np.clip(x0, lim_log[:, 0], lim_log[:, 1])
+            sol = rodar_reinicio((x0, z, t, list(livres), {}, lim_log, 'least_squares'))
+            if sol['params'] is not None and (melhor is None or sol['custo'] < melhor['custo']):
+                melhor = sol
+        if melhor is None:
+            raise RuntimeError('nenhum reinício convergiu')
+        p = melhor['params']
+        linha.update({k: p[k] for k in ('N', 'beta', 'gamma', 'I0')})
+        linha.update({'R0': p['beta'] / p['gamma'], 'custo': melhor['custo'],
+                      'RMSE': np.sqrt(melhor['custo'] / z.size),
+                      'sucesso': melhor['sucesso'], 'erro': None})
+    except Exception as erro:  # um segmento ruim não derruba os demais
+        linha.update({'sucesso': False, 'erro': f'{type(erro).__name__}: {erro}'})
+    return linha
+
+
+def ajustar_segmentado(y, quebras=None, n_segmentos=None, penalidade=None,
+                       min_tamanho=42, janela=7, salto_minimo=0.1, max_workers=None,
+                       encadear=True, n_sementes=3):
+    """
+    Ajuste SIRC por segmentos de uma série longa de casos acumulados.
+
+    input:
+    y           : casos acumulados (série inteira)
+    quebras     : índices das quebras (None = detectar_quebras)
+    n_segmentos, penalidade, min_tamanho, janela, salto_minimo :
+                  repassados a detectar_quebras
+    max_workers : processos para os segmentos (None = os.cpu_count())
+    encadear    : reajusta cada segmento semeado pelo estado I do ajuste
+                  anterior na fronteira (mantém o de menor custo)
+    n_sementes  : trios logísticos usados como sementes em cada segmento
+
+    Output:
+    dict com quebras, tabela (DataFrame, uma linha por segmento), C_ajuste
+    (curva acumulada costurada, len(y)) e residuo
+    """
+    y = np.maximum.accumulate(np.asarray(y, dtype=float))
+    if quebras is None:
+        quebras = detectar_quebras(y, n_segmentos, penalidade, min_tamanho, janela,
+                                   salto_minimo)
+    limites = list(zip([0] + list(quebras), list(quebras) + [len(y)]))
+
+    # âncora de cada segmento: incidência da última janela antes do início
+    ancoras = [max(y[0], 1.0) if a == 0 else max(y[a] - y[max(a - janela, 0)], 1.0)
+               for a, _ in limites]
+    tarefas = [((a, b), y[a:b] - y[a], ancora, None, n_sementes)
+               for (a, b), ancora in zip(limites, ancoras)]
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        linhas = list(pool.map(_ajustar_segmento, tarefas))
+
+    if encadear:
+        for k in range(1, len(linhas)):
+            ant, atual = linhas[k - 1], linhas[k]
+            if ant.get('N') is None:
+                continue
+            a, b = limites[k]
+            p_ant = {c: ant[c] for c in ('N', 'beta', 'gamma', 'I0')}
+            I_fronteira = max(_estado_sirc(p_ant, [0.0, a - ant['inicio']])[-1, 1], 1e-3)
+            p0 = dict(atual) if atual.get('N') is not None else _chute_segmento(y[a:b] - y[a])
+            p0 = {c: p0[c] for c in ('beta', 'gamma', 'N')}
+            p0['I0'] = I_fronteira
+            nova = _ajustar_segmento(((a, b), y[a:b] - y[a], I_fronteira, p0, 0))
+            if nova.get('N') is not None and nova['custo'] < atual.get('custo', np.inf):
+                linhas[k] = nova
+
+    C = np.full(len(y), np.nan)
+    for linha, (a, b) in zip(linhas, limites):
+        if linha.get('N') is None:
+            continue
+        p = {c: linha[c] for c in ('N', 'beta', 'gamma', 'I0')}
+        C[a:b] = y[a] - linha['ancora'] + _estado_sirc(p, np.arange(b - a, dtype=float))[:, 3]
+
+    return {'quebras': list(quebras), 'tabela': pd.DataFrame(linhas, columns=COLUNAS),
+            'C_ajuste': C, 'residuo': y - C}
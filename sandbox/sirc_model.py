@@ -1,6 +1,12 @@
+import os
+import sys
 from scipy.integrate import odeint
 import numpy as np
 
+# initial_SIRC/estimativas_SIRC (estimativa logística vetorizada) vêm de model/
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model'))
+from modelos_epidemiologicos import initial_SIRC, estimativas_SIRC  # noqa: E402,F401
+
 def SIRC(y, t, N, beta, gamma):
     S, I, R, C = y
     dSdt = -beta * S * I / N
@@ -9,64 +15,53 @@ def SIRC(y, t, N, beta, gamma):
     dCdt = beta * S * I / N
     return [dSdt, dIdt, dRdt, dCdt]
 
+def jac_SIRC(y, t, N, beta, gamma):
+    # Jacobiano analítico J[i, j] = df_i/dy_j (Dfun do odeint)
+    S, I, R, C = y
+    return [[-beta * I / N, -beta * S / N, 0, 0],
+            [beta * I / N, beta * S / N - gamma, 0, 0],
+            [0, gamma, 0, 0],
+            [beta * I / N, beta * S / N, 0, 0]]
+
 def solve_sirc(t, N, beta, gamma, I0):
     R0 = 0
     C0 = I0
     S0 = N - I0 - R0
     y0 = [S0, I0, R0, C0]
-    sol = odeint(SIRC, y0, t, args=(N, beta, gamma))
+    sol = odeint(SIRC, y0, t, args=(N, beta, gamma), Dfun=jac_SIRC)
     return sol[:, 3]
 
-def initial_SIRC(C):
+def SIRC_sens(z, t, N, beta, gamma):
     """
-        Estima os parâmetros iniciais da curva logística usando 3 pontos dos dados C.
-
-        input:
-        C : array-like
-
-        Output:
-        [K, r, A] ou None
-        """
-    C = np.array(C)
-    n = len(C)
-    if n <= 5:
-        return None
-
-    for i in range(n - 5):
-        k1 = i
-        k3 = n - 1
-        k2 = (k1 + k3) // 2
-        m = k2 - k1
-
-        if m < 1 or any(np.isnan(C[[k1, k2, k3]])):
-            continue
+    Sistema SIRC aumentado com as sensibilidades diretas
+    s_p = dy/dp para p = (beta, gamma, N, I0):  ds_p/dt = J s_p + df/dp.
 
-        C1, C2, C3 = C[k1], C[k2], C[k3]
-
-        q = C2 ** 2 - C3 * C1
-        if q <= 0:
-            continue
-        p = C1 * C2 - 2 * C1 * C3 + C2 * C3
-        if p <= 0:
-            continue
-
-        K = C2 * p / q
-
-        try:
-            r = np.log((C3 * (C2 - C1)) / (C1 * (C3 - C2))) / m
-        except (ZeroDivisionError, ValueError):
-            continue
-        if r < 0:
-            continue
-
-        try:
-            A = ((C3 - C2) * (C2 - C1) / q) * \
-                ((C3 * (C2 - C1)) / (C1 * (C3 - C2))) ** ((k3 - m) / m)
-        except (ZeroDivisionError, ValueError):
-            continue
-        if A <= 0:
-            continue
+    z = [S, I, R, C, s_beta(4), s_gamma(4), s_N(4), s_I0(4)]
+    """
+    y = z[:4]
+    s = z[4:].reshape(4, 4)  # linhas: beta, gamma, N, I0
+    S, I = y[0], y[1]
+    inf = beta * S * I / N
+    J = np.array(jac_SIRC(y, t, N, beta, gamma))
+    dfdp = np.array([[-S * I / N, S * I / N, 0, S * I / N],
+                     [0, -I, I, 0],
+                     [inf / N, -inf / N, 0, -inf / N],
+                     [0, 0, 0, 0]])
+    ds = s @ J.T + dfdp
+    return np.concatenate([SIRC(y, t, N, beta, gamma), ds.ravel()])
 
-        return [K, r, A]
+def solve_sirc_sens(t, N, beta, gamma, I0):
+    """
+    Resolve o SIRC junto com as sensibilidades de C(t).
 
-    return None
+    Output:
+    C    : casos acumulados (nt,)
+    dCdp : derivadas dC/d(beta, gamma, N, I0), array (nt, 4)
+    """
+    y0 = [N - I0, I0, 0, I0]
+    s0 = [0, 0, 0, 0,      # beta
+          0, 0, 0, 0,      # gamma
+          1, 0, 0, 0,      # N   (S0 = N - I0)
+          -1, 1, 0, 1]     # I0
+    sol = odeint(SIRC_sens, y0 + s0, t, args=(N, beta, gamma))
+    return sol[:, 3], sol[:, 4:].reshape(-1, 4, 4)[:, :, 3]
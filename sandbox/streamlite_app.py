@@ -1,23 +1,47 @@
+import numpy as np
 import streamlit as st
 import plotly.graph_objects as go
 from load_data import carregar_dados
 from visualize import plot_casos, plot_ajuste
 from fit_model import ajustar_modelo
+from bootstrap import bootstrap_SIRC
+
+ARQUIVO = "/home/akel/PycharmProjects/Endemic_model/data/caso_full.parquet"
+
+
+# O Streamlit reexecuta o script a cada interação; ajuste e bootstrap ficam
+# em cache por estado e só rodam de novo quando o estado muda
+@st.cache_resource
+def ajustar_estado(estado):
+    df_estado, _ = carregar_dados(ARQUIVO, estado=estado)
+    y = np.cumsum(df_estado['new_confirmed'].values)
+    x = df_estado['date'].values
+    result, _ = ajustar_modelo(y, verbose=False)
+    return x, y, result
+
+
+@st.cache_data
+def bootstrap_estado(estado, n_amostras=200):
+    _, y, result = ajustar_estado(estado)
+    return bootstrap_SIRC(y, n_amostras=n_amostras, horizonte=0, result=result)
+
 
 # Título do app
 st.title("Modelagem Epidemiológica - Modelo SIRC")
-
-# Leitura dos dados diretamente no código
-df_estado, _ = carregar_dados("/home/akel/PycharmProjects/Endemic_model/data/caso_full.parquet", estado="PA")
+estado = st.text_input("Estado (UF)", value="PA").strip().upper()
 
 # Ajuste do modelo
-x, y, result = ajustar_modelo(df_estado)
+x, y, result = ajustar_estado(estado)
+
+# Intervalo de 95% por bootstrap paramétrico (no lugar de best_fit +- std)
+boot = bootstrap_estado(estado)
+banda_inf, _, banda_sup = boot['bandas']
 
 # Gráficos com Plotly
 fig_dados = go.Figure()
 fig_dados.add_trace(go.Bar(x=x, y=y, name='Casos acumulados', marker_color='red'))
 fig_dados.update_layout(
-    title="Casos Acumulados de COVID-19 - Estado do MA",
+    title=f"Casos Acumulados de COVID-19 - Estado do {estado}",
     xaxis_title="Data",
     yaxis_title="Casos",
     bargap=0.2,
@@ -29,13 +53,13 @@ fig_ajuste.add_trace(go.Scatter(x=x, y=y, mode='markers', name='Dados'))
 fig_ajuste.add_trace(go.Scatter(x=x, y=result.best_fit, mode='lines', name='Melhor ajuste'))
 fig_ajuste.add_trace(go.Scatter(
     x=list(x) + list(x[::-1]),
-    y=list(result.best_fit + result.residual.std()) + list((result.best_fit - result.residual.std())[::-1]),
+    y=list(banda_sup) + list(banda_inf[::-1]),
     fill='toself',
     fillcolor='rgba(255,165,0,0.2)',
     line=dict(color='rgba(255,255,255,0)'),
     hoverinfo="skip",
     showlegend=True,
-    name='Incerteza'
+    name='Intervalo 95% (bootstrap)'
 ))
 fig_ajuste.update_layout(
     title="Ajuste do Modelo SIRC",
@@ -50,4 +74,6 @@ st.plotly_chart(fig_ajuste, use_container_width=True)
 
 # Exibir o relatório do ajuste
 with st.expander("Ver relatório do ajuste"):
-    st.text(result.fit_report())
\ No newline at end of file
+    st.text(result.fit_report())
+    st.text('\n'.join(f'{k}: {lo:.4g} [{med:.4g}] {hi:.4g}'
+                       for k, (lo, med, hi) in boot['intervalos'].items()))
\ No newline at end of file
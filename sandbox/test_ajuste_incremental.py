@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes de ajuste_incremental.AjusteIncremental com lotes de vários dias
+(série do Pará em out.dat).
+
+    pytest sandbox/test_ajuste_incremental.py
+"""
+import copy
+import os
+import sys
+
+import numpy as np
+import pytest
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, AQUI)
+sys.path.insert(1, os.path.join(AQUI, '..', 'model'))
+from ajuste_incremental import AjusteIncremental
+from fit_model import ajustar_modelo
+
+INICIAL = 60
+
+
+@pytest.fixture(scope='module')
+def y():
+    return np.loadtxt(os.path.join(AQUI, 'out.dat'), usecols=1)
+
+
+@pytest.mark.parametrize('n_lote', [14, 23])
+def test_lote_igual_ao_ajuste_frio(y, n_lote):
+    # lote grande: a inovação força o reajuste, que deve chegar ao mesmo
+    # mínimo do ajuste frio da série inteira
+    inc = AjusteIncremental(y[:INICIAL])
+    p = inc.atualizar(y[INICIAL:INICIAL + n_lote])
+    frio, _ = ajustar_modelo(y[:INICIAL + n_lote], verbose=False)
+    for k in ('beta', 'gamma', 'N'):
+        assert p[k] == pytest.approx(frio.params[k].value, rel=1e-3)
+
+
+@pytest.mark.parametrize('n_lote', [14, 23])
+def test_lote_sem_reajuste(y, n_lote):
+    # só o passo iterado: não pode terminar pior que a previsão anterior
+    inc = AjusteIncremental(y[:INICIAL], reajustar_a_cada=None,
+                            limite_inovacao=np.inf)
+    antes = copy.deepcopy(inc)
+    novos = y[INICIAL:INICIAL + n_lote]
+    t = antes.t_ultimo + np.arange(n_lote + 1)
+    x0 = np.array([antes.params[k] for k in antes.livres])
+
+    p = inc.atualizar(novos)
+    x = np.array([p[k] for k in inc.livres])
+    C0, _, _ = antes._prever(x0, x0, t)
+    C, _, _ = antes._prever(x, x0, t)
+    assert np.all(np.isfinite(x))
+    assert np.sqrt(np.mean((novos - C) ** 2)) < 0.5 * np.sqrt(np.mean((novos - C0) ** 2))
+    assert p['beta'] > 10 * 0.001
+    # o estado guardado continua a curva ajustada do lote
+    assert inc.z_ultimo[3] == pytest.approx(C[-1], rel=1e-6)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes de nowcasting com registros sintéticos de atraso conhecido.
+
+    pytest sandbox/test_nowcasting.py
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, AQUI)
+sys.path.insert(1, os.path.join(AQUI, '..', 'model'))
+from nowcasting import distribuicao_atraso, nowcast, triangulo
+
+INICIO = pd.Timestamp('2020-04-01')
+DIAS = 90
+POR_DIA = 200
+MAX_ATRASO = 12
+P_GEOM = 0.3
+
+
+def _F_verdadeira():
+    d = np.arange(MAX_ATRASO + 1)
+    pmf = P_GEOM * (1 - P_GEOM) ** d
+    return np.cumsum(pmf / pmf.sum())
+
+
+@pytest.fixture(scope='module')
+def registros():
+    """
+    POR_DIA óbitos por dia em dois municípios, com atraso geométrico
+    truncado em MAX_ATRASO; todos os registros, sem corte.
+    """
+    rng = np.random.default_rng(0)
+    pmf = np.diff(np.concatenate(([0.0], _F_verdadeira())))
+    fato = np.repeat(np.arange(DIAS), POR_DIA)
+    atraso = rng.choice(MAX_ATRASO + 1, size=fato.size, p=pmf)
+    local = rng.choice(['BELEM', 'SANTAREM'], size=fato.size)
+    return pd.DataFrame({
+        'local': pd.Categorical(local),
+        'fato': INICIO + pd.to_timedelta(fato, 'D'),
+        'post': INICIO + pd.to_timedelta(fato + atraso, 'D'),
+    })
+
+
+def test_distribuicao_atraso(registros):
+    corte = INICIO + pd.Timedelta(days=DIAS - 1)
+    M, _, _ = triangulo(registros, corte, janela=60, max_atraso=MAX_ATRASO,
+                        por_local=False)
+    F, n = distribuicao_atraso(M)
+    assert F.shape == (1, MAX_ATRASO + 1)
+    assert F[0, -1] == 1.0
+    assert np.all(np.diff(F[0]) >= 0)
+    np.testing.assert_allclose(F[0], _F_verdadeira(), atol=0.02)
+    assert n[0] == M.sum()
+
+
+@pytest.mark.parametrize('por_local', [False, True])
+def test_nowcast_recupera_contagens(registros, por_local):
+    corte = INICIO + pd.Timedelta(days=DIAS - 1)
+    publicados = registros[registros['post'] <= corte]
+    nc = nowcast(publicados, corte, janela=30, max_atraso=MAX_ATRASO,
+                 por_local=por_local)
+    total_obs = nc['observados'].sum(axis=0)
+    total_nc = nc['nowcast'].sum(axis=0)
+    # dias recentes: truncados nos observados, recuperados pelo nowcast
+    assert total_obs[-1] < 0.5 * POR_DIA
+    np.testing.assert_allclose(total_nc[-7:], POR_DIA, rtol=0.25)
+    assert abs(total_nc[-7:].sum() / (7 * POR_DIA) - 1) < 0.08
+    # dias antigos: já completos, fator 1
+    np.testing.assert_array_equal(total_nc[:-MAX_ATRASO - 1], total_obs[:-MAX_ATRASO - 1])
+    np.testing.assert_allclose(nc['F_estadual'], _F_verdadeira(), atol=0.03)
+
+
+def test_corte_depois_da_ultima_publicacao(registros):
+    publicados = registros[registros['post'] <= INICIO + pd.Timedelta(days=60)]
+    with pytest.raises(ValueError, match='última publicação'):
+        nowcast(publicados, INICIO + pd.Timedelta(days=70))
@@ -18,11 +18,15 @@ def plot_casos(x, y, titulo, caminho=None):
         plt.savefig(caminho)
     plt.show()
 
-def plot_ajuste(x, y, ajuste, std=None):
+def plot_ajuste(x, y, ajuste, std=None, banda=None):
+    # banda: (inferior, superior), ex. percentis de bootstrap_SIRC; tem
+    # prioridade sobre o +-std
     plt.figure(figsize=(12, 6))
     plt.plot(x, y, 'o', label='Dados')
     plt.plot(x, ajuste, label='Melhor ajuste')
-    if std is not None:
+    if banda is not None:
+        plt.fill_between(x, banda[0], banda[1], color='orange', alpha=0.2, label='Intervalo (bootstrap)')
+    elif std is not None:
         plt.fill_between(x, ajuste - std, ajuste + std, color='orange', alpha=0.2, label='Incerteza')
     plt.legend()
     plt.grid(True)